@@ -7,6 +7,7 @@ __all__ = [
     "iptools",
     "logging_async",
     "main",
+    "probe",
     "traceroute",
     "ui",
     "viz",
@@ -0,0 +1,250 @@
+"""``lm agent``: scan from this vantage point and report to a collector.
+
+The agent runs the normal scanner with an in-memory working graph that is never
+saved. Its targets come from leases handed out by the collector's coordinator,
+and every finished trace is batched, gzip-compressed and posted to the
+collector's ``/api/collect`` endpoint.
+"""
+
+import asyncio
+import gzip
+import itertools
+import json
+import socket
+import urllib.error
+import urllib.request
+from collections import Counter
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import networkx as nx
+
+from .iptools import LocalPool
+
+
+class AgentLink:
+    """``scan_async`` link that leases targets from and reports to a collector.
+
+    A lease is reported complete only once every target in it has been handed
+    out, has left the scan's pending set, and any trace it produced has been
+    uploaded. Leases whose targets errored, were still running when the agent
+    stopped, or whose traces were dropped from a full buffer are never
+    completed, so the coordinator hands them out again after its timeout.
+    """
+
+    def __init__(
+        self,
+        collector_url: str,
+        vantage: Optional[str] = None,
+        *,
+        batch_size: int = 64,
+        flush_interval: float = 2.0,
+        timeout: float = 10.0,
+        retry_interval: float = 5.0,
+        max_buffer: int = 10_000,
+        logger=None,
+    ) -> None:
+        self.url = collector_url.rstrip("/")
+        self.vantage = vantage or socket.gethostname()
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.timeout = timeout
+        self.retry_interval = retry_interval
+        self.max_buffer = max_buffer
+        self.logger = logger
+        self._buffer: List[List[Any]] = []
+        self._flush_lock = asyncio.Lock()
+        self._flusher: Optional[asyncio.Task] = None
+        self._pending_flushes: set = set()
+        self._stop: Optional[asyncio.Event] = None
+        self._pending_ips = None
+        # Lease id -> targets not yet known to be finished and uploaded.
+        self._leases: Dict[int, Set[str]] = {}
+        self._drawing: Set[int] = set()
+        self._unsent: Counter = Counter()
+        self.stats: Dict[str, int] = {
+            "leases": 0,
+            "completed": 0,
+            "sent": 0,
+            "batches": 0,
+            "dropped": 0,
+            "errors": 0,
+        }
+
+    def _log(self, message: str) -> None:
+        if self.logger is not None:
+            self.logger.warning(message)
+        else:
+            print(message)
+
+    def _post(
+        self, path: str, payload: Dict[str, Any], compress: bool = False
+    ) -> Tuple[int, Any]:
+        data = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+        if compress:
+            data = gzip.compress(data)
+            headers["Content-Encoding"] = "gzip"
+        request = urllib.request.Request(
+            self.url + path, data=data, headers=headers, method="POST"
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            body = response.read()
+            return response.status, json.loads(body) if body else None
+
+    async def _call(self, path: str, payload: Dict[str, Any], compress=False):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._post, path, payload, compress)
+
+    async def _wait_or_stop(self, seconds: float) -> bool:
+        if self._stop is None:
+            await asyncio.sleep(seconds)
+            return False
+        try:
+            await asyncio.wait_for(self._stop.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    # -- scan_async link protocol ------------------------------------------
+
+    def targets(self, _pool):
+        return self._leased_targets()
+
+    async def _leased_targets(self):
+        while True:
+            try:
+                status, lease = await self._call("/api/lease", {"agent": self.vantage})
+            except (OSError, urllib.error.URLError, ValueError) as exc:
+                self.stats["errors"] += 1
+                self._log(f"[agent] lease request failed: {exc}")
+                if await self._wait_or_stop(self.retry_interval):
+                    return
+                continue
+            if status == 204 or not lease:
+                return
+            self.stats["leases"] += 1
+            lease_id = lease["lease"]
+            hosts = self._leases[lease_id] = set()
+            self._drawing.add(lease_id)
+            pool = LocalPool(
+                lease["seeds"],
+                lease["prefix"],
+                lease["max_per_seed"],
+                offset=lease["offset"],
+            )
+            for index, ip in enumerate(itertools.islice(pool, lease["count"]), 1):
+                hosts.add(ip)
+                if index == lease["count"]:
+                    # Drawn in full even if the scan never asks for more.
+                    self._drawing.discard(lease_id)
+                yield ip
+            self._drawing.discard(lease_id)
+
+    async def _complete_leases(self) -> None:
+        """Report every lease whose targets are all finished and uploaded."""
+
+        pending = self._pending_ips if self._pending_ips is not None else ()
+        for lease_id, hosts in list(self._leases.items()):
+            if lease_id in self._drawing:
+                continue
+            hosts.difference_update(
+                [ip for ip in hosts if ip not in pending and not self._unsent[ip]]
+            )
+            if hosts:
+                continue
+            del self._leases[lease_id]
+            try:
+                await self._call(f"/api/lease/{lease_id}/complete", {})
+            except (OSError, urllib.error.URLError, ValueError) as exc:
+                self.stats["errors"] += 1
+                self._log(f"[agent] lease completion failed: {exc}")
+            else:
+                self.stats["completed"] += 1
+
+    def owns(self, _ip: str) -> bool:
+        return True
+
+    def send_trace(self, host: str, hops) -> None:
+        self._buffer.append([host, [[ip, rtt] for ip, rtt in hops]])
+        self._unsent[host] += 1
+        if len(self._buffer) >= self.batch_size:
+            task = asyncio.get_running_loop().create_task(self.flush())
+            self._pending_flushes.add(task)
+            task.add_done_callback(self._pending_flushes.discard)
+
+    def attach(self, queue, seen_ips, pending_ips, stop_event: asyncio.Event):
+        self._stop = stop_event
+        self._pending_ips = pending_ips
+        self._flusher = asyncio.get_running_loop().create_task(self._flush_loop())
+
+    async def close(self) -> None:
+        if self._flusher is not None:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+        if self._pending_flushes:
+            await asyncio.gather(*self._pending_flushes, return_exceptions=True)
+        await self.flush()
+        await self._complete_leases()
+        summary = ", ".join(f"{key}={value}" for key, value in self.stats.items())
+        print(f"[agent] {self.vantage}: {summary}")
+
+    # ----------------------------------------------------------------------
+
+    async def _flush_loop(self) -> None:
+        while not await self._wait_or_stop(self.flush_interval):
+            await self.flush()
+            await self._complete_leases()
+
+    async def flush(self) -> None:
+        """Post everything buffered as one batch; keep it for retry on failure."""
+
+        async with self._flush_lock:
+            if not self._buffer:
+                return
+            batch, self._buffer = self._buffer, []
+            try:
+                await self._call(
+                    "/api/collect",
+                    {"vantage": self.vantage, "traces": batch},
+                    compress=True,
+                )
+            except (OSError, urllib.error.URLError, ValueError) as exc:
+                self.stats["errors"] += 1
+                self._log(f"[agent] upload of {len(batch)} traces failed: {exc}")
+                self._buffer = batch + self._buffer
+                overflow = len(self._buffer) - self.max_buffer
+                if overflow > 0:
+                    dropped = self._buffer[:overflow]
+                    del self._buffer[:overflow]
+                    self.stats["dropped"] += overflow
+                    self._forget(dropped, lost=True)
+                return
+            self._forget(batch)
+            self.stats["sent"] += len(batch)
+            self.stats["batches"] += 1
+
+    def _forget(self, traces: List[List[Any]], lost: bool = False) -> None:
+        for host, _hops in traces:
+            self._unsent[host] -= 1
+            if self._unsent[host] <= 0:
+                del self._unsent[host]
+            if lost:
+                # Never complete a lease that lost a trace; let it expire.
+                for lease_id, hosts in list(self._leases.items()):
+                    if host in hosts:
+                        del self._leases[lease_id]
+
+
+async def run_agent(params, link: Optional[AgentLink] = None) -> None:
+    """Scan with ``params`` and stream the results to ``params.collector``."""
+
+    from .main import scan_async
+
+    params.no_display = True
+    link = link or AgentLink(
+        params.collector,
+        getattr(params, "vantage", None),
+        batch_size=getattr(params, "batch_size", None) or 64,
+        flush_interval=getattr(params, "flush_interval", None) or 2.0,
+    )
+    await scan_async(params, graph=nx.Graph(), link=link)
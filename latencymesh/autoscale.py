@@ -0,0 +1,153 @@
+"""Adaptive worker concurrency driven by an AIMD controller."""
+
+import asyncio
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+class AIMDController:
+    """Additive-increase / multiplicative-decrease target for the worker count.
+
+    Each :meth:`update` receives the traces completed and timed out since the
+    previous call together with the measured event-loop lag. The target shrinks
+    by ``decrease`` when timeouts or lag exceed their thresholds, or when the
+    completion rate fell after the previous increase; otherwise it grows by
+    ``increase``. It stays within ``[min_workers, max_workers]`` and holds when
+    no trace finished during the interval.
+    """
+
+    def __init__(
+        self,
+        min_workers: int,
+        max_workers: int,
+        initial: Optional[int] = None,
+        *,
+        increase: int = 1,
+        decrease: float = 0.5,
+        timeout_threshold: float = 0.5,
+        lag_threshold: float = 0.1,
+        rate_tolerance: float = 0.1,
+    ) -> None:
+        self.min_workers = max(1, int(min_workers))
+        self.max_workers = max(self.min_workers, int(max_workers))
+        start = initial if initial is not None else self.min_workers
+        self.target = min(self.max_workers, max(self.min_workers, int(start)))
+        self.increase = increase
+        self.decrease = decrease
+        self.timeout_threshold = timeout_threshold
+        self.lag_threshold = lag_threshold
+        self.rate_tolerance = rate_tolerance
+        self._last_rate: Optional[float] = None
+        self._last_action = "hold"
+
+    def update(self, completed: int, timeouts: int, lag: float, interval: float) -> int:
+        finished = completed + timeouts
+        if finished == 0:
+            self._last_action = "hold"
+            return self.target
+        rate = completed / max(interval, 1e-9)
+        timeout_ratio = timeouts / finished
+        rate_fell = (
+            self._last_action == "increase"
+            and self._last_rate is not None
+            and rate < self._last_rate * (1 - self.rate_tolerance)
+        )
+        if (
+            timeout_ratio > self.timeout_threshold
+            or lag > self.lag_threshold
+            or rate_fell
+        ):
+            self.target = max(self.min_workers, int(self.target * self.decrease))
+            self._last_action = "decrease"
+        else:
+            self.target = min(self.max_workers, self.target + self.increase)
+            self._last_action = "increase"
+        self._last_rate = rate
+        return self.target
+
+
+class WorkerPool:
+    """Grow and shrink a set of worker tasks created by ``factory``.
+
+    ``factory(worker_id, retire_event)`` must return a task. Shrinking sets the
+    retire event of the newest workers so they exit after their current trace;
+    factories whose workers ignore the event get them cancelled instead.
+    ``tasks`` holds every worker that is still running, retiring ones included;
+    finished tasks drop out of it.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[int, asyncio.Event], asyncio.Task],
+        graceful: bool = True,
+    ) -> None:
+        self._factory = factory
+        self._graceful = graceful
+        self._active: List[Tuple[asyncio.Task, asyncio.Event]] = []
+        self.tasks: List[asyncio.Task] = []
+        self._next_id = 0
+
+    @property
+    def size(self) -> int:
+        return len(self._active)
+
+    def _forget(self, task: asyncio.Task) -> None:
+        try:
+            self.tasks.remove(task)
+        except ValueError:
+            pass
+        self._active = [entry for entry in self._active if entry[0] is not task]
+
+    def resize(self, target: int) -> None:
+        while len(self._active) < target:
+            retire_event = asyncio.Event()
+            task = self._factory(self._next_id, retire_event)
+            self._next_id += 1
+            self._active.append((task, retire_event))
+            self.tasks.append(task)
+            task.add_done_callback(self._forget)
+        while len(self._active) > max(target, 0):
+            task, retire_event = self._active.pop()
+            retire_event.set()
+            if not self._graceful:
+                task.cancel()
+
+
+async def autoscale_workers(
+    pool: WorkerPool,
+    controller: AIMDController,
+    scan_stats: Dict,
+    stop_event: asyncio.Event,
+    interval: float = 5.0,
+    logger=None,
+) -> None:
+    """Resize ``pool`` every ``interval`` seconds until ``stop_event`` is set.
+
+    Completed and empty traces are read from the ``traces``/``empty_traces``
+    counters that workers keep in ``scan_stats``; event-loop lag is how late
+    this task wakes up relative to its interval.
+    """
+
+    loop = asyncio.get_running_loop()
+    scan_stats["workers"] = lambda: pool.size
+    last_completed = scan_stats.get("traces", 0)
+    last_timeouts = scan_stats.get("empty_traces", 0) + scan_stats.get("errors", 0)
+    while not stop_event.is_set():
+        started = loop.time()
+        try:
+            await asyncio.wait_for(stop_event.wait(), timeout=interval)
+            break
+        except asyncio.TimeoutError:
+            pass
+        elapsed = loop.time() - started
+        lag = max(0.0, elapsed - interval)
+        completed = scan_stats.get("traces", 0)
+        timeouts = scan_stats.get("empty_traces", 0) + scan_stats.get("errors", 0)
+        previous = pool.size
+        target = controller.update(
+            completed - last_completed, timeouts - last_timeouts, lag, elapsed
+        )
+        last_completed, last_timeouts = completed, timeouts
+        pool.resize(target)
+        scan_stats["loop_lag_ms"] = round(lag * 1000.0, 3)
+        if logger is not None and target != previous:
+            logger.info(f"[autoscale] workers {previous} -> {target}")
@@ -0,0 +1,526 @@
+"""Benchmarks for LatencyMesh's hot data structures and paths.
+
+:func:`run_benchmarks` backs ``lm bench``. It times each hot path on
+synthetic graphs grown from :class:`~latencymesh.simulate.SimulatedNetwork`
+traces, so every run on every machine measures the same graphs.
+"""
+
+import asyncio
+import gc
+import io
+import ipaddress
+import itertools
+import json
+import math
+import os
+import platform
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager, redirect_stdout
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence
+
+import networkx as nx
+
+from .compact import CompactGraph
+from .graph_ops import Hop, add_trace, add_traces
+from .io_graph import load_graph, save_graph
+from .iptools import LocalPool, generate_local_pool
+from .ipset import IPSet
+from .simulate import SimulatedNetwork
+from .writer import GraphWriter
+
+BENCH_VERSION = 1
+
+
+def _traced_bytes(build: Callable[[], object]) -> int:
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        built = build()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del built
+    return after - before
+
+
+def _addresses(count: int, network: str, scattered: bool) -> List[str]:
+    net = ipaddress.ip_network(network)
+    if scattered:
+        # The scan's own pool order: spread pseudo-randomly over the network.
+        pool = LocalPool([str(net.network_address)], net.prefixlen, None)
+        return list(itertools.islice(pool, count))
+    return [str(addr) for addr in itertools.islice(net.hosts(), count)]
+
+
+def ipset_memory(
+    count: int = 100_000,
+    networks: Iterable[str] = ("10.0.0.0/8", "2001:db8::/64"),
+) -> Dict[str, Dict[str, float]]:
+    """Compare a ``set`` of address strings against :class:`~latencymesh.ipset.IPSet`.
+
+    For each network, ``count`` consecutive hosts (``dense``) and ``count``
+    hosts in scan-pool order (``scattered``) are generated up front. Sizes
+    cover the containers plus the strings a ``set`` keeps alive, since the scan
+    holds them only through the set. Lookup time is the mean membership test
+    over every member.
+    """
+
+    results: Dict[str, Dict[str, float]] = {}
+    cases = [
+        (network, scattered) for network in networks for scattered in (False, True)
+    ]
+    for network, scattered in cases:
+        addresses = _addresses(count, network, scattered)
+        set_bytes = _traced_bytes(lambda: {"".join(a) for a in addresses})
+        ipset_bytes = _traced_bytes(lambda: IPSet(addresses))
+        strings, packed = set(addresses), IPSet(addresses)
+        timings = {}
+        for name, container in (("set", strings), ("ipset", packed)):
+            started = time.perf_counter()
+            for address in addresses:
+                address in container
+            timings[name] = (time.perf_counter() - started) / len(addresses)
+        label = f"{network} {'scattered' if scattered else 'dense'}"
+        results[label] = {
+            "count": len(addresses),
+            "set_bytes": set_bytes,
+            "ipset_bytes": ipset_bytes,
+            "ratio": round(set_bytes / max(ipset_bytes, 1), 1),
+            "set_lookup_ns": round(timings["set"] * 1e9, 1),
+            "ipset_lookup_ns": round(timings["ipset"] * 1e9, 1),
+        }
+    return results
+
+
+def graph_memory(
+    sizes: Iterable[int] = (10_000, 100_000), seed: int = 0
+) -> Dict[str, Dict[str, float]]:
+    """Compare networkx against :class:`~latencymesh.compact.CompactGraph`.
+
+    For each size, enough :func:`synthetic_traces` for that many nodes are
+    generated up front, then merged into each store in batches of 32
+    (``built``; sizes exclude the address strings, which both stores share),
+    and the saved node-link JSON of the result is parsed into each
+    (``loaded``, as ``lm stats`` does; sizes include every string the store
+    keeps, such as a ``last_seen`` per node).
+    """
+
+    results: Dict[str, Dict[str, float]] = {}
+    for nodes in sizes:
+        traces: List[List[Hop]] = []
+        seen: set = set()
+        for hops in synthetic_traces(seed):
+            traces.append(hops)
+            seen.update(ip for ip, _ in hops)
+            if len(seen) >= nodes:
+                break
+        batches = [traces[i : i + 32] for i in range(0, len(traces), 32)]
+
+        def build_networkx():
+            G = nx.Graph()
+            for batch in batches:
+                add_traces(G, batch)
+            return G
+
+        def build_compact():
+            store = CompactGraph()
+            for batch in batches:
+                store.add_traces(batch)
+            return store
+
+        timings = {}
+        for name, build in (("networkx", build_networkx), ("compact", build_compact)):
+            started = time.perf_counter()
+            build()
+            timings[name] = time.perf_counter() - started
+        G = build_networkx()
+        text = json.dumps(nx.node_link_data(G))
+        sizes_built = {
+            "networkx": _traced_bytes(build_networkx),
+            "compact": _traced_bytes(build_compact),
+        }
+        sizes_loaded = {
+            "networkx": _traced_bytes(lambda: nx.node_link_graph(json.loads(text))),
+            "compact": _traced_bytes(
+                lambda: CompactGraph.from_node_link(json.loads(text))
+            ),
+        }
+        results[str(nodes)] = {
+            "nodes": G.number_of_nodes(),
+            "edges": G.number_of_edges(),
+            "traces": len(traces),
+            "networkx_bytes": sizes_built["networkx"],
+            "compact_bytes": sizes_built["compact"],
+            "ratio": round(sizes_built["networkx"] / max(sizes_built["compact"], 1), 1),
+            "networkx_loaded_bytes": sizes_loaded["networkx"],
+            "compact_loaded_bytes": sizes_loaded["compact"],
+            "loaded_ratio": round(
+                sizes_loaded["networkx"] / max(sizes_loaded["compact"], 1), 1
+            ),
+            "networkx_traces_per_s": round(len(traces) / timings["networkx"], 1),
+            "compact_traces_per_s": round(len(traces) / timings["compact"], 1),
+        }
+    return results
+
+
+def synthetic_traces(seed: int = 0, network: str = "10.0.0.0/8") -> Iterator[List[Hop]]:
+    """Endless traces towards ``network`` in scan-pool order, from seed ``seed``."""
+
+    simulated = SimulatedNetwork(seed)
+    net = ipaddress.ip_network(network)
+    for host in LocalPool([str(net.network_address)], net.prefixlen, None):
+        replies, _ = simulated.schedule(host, 1.0, 30)
+        hops = [hop for _, hop, _ in sorted(replies)]
+        if hops:
+            yield hops
+
+
+def synthetic_graph(nodes: int, seed: int = 0) -> nx.Graph:
+    """A graph of at least ``nodes`` nodes merged from :func:`synthetic_traces`."""
+
+    G = nx.Graph()
+    traces = synthetic_traces(seed)
+    while G.number_of_nodes() < nodes:
+        add_trace(G, next(traces))
+    return G
+
+
+@contextmanager
+def _bench_add_trace(G, ctx):
+    G = G.copy()
+    fresh = list(itertools.islice(synthetic_traces(ctx.seed, "11.0.0.0/8"), 1000))
+    traces = itertools.cycle(fresh)
+    yield lambda: add_trace(G, next(traces)), 1
+
+
+@contextmanager
+def _bench_add_traces(G, ctx):
+    G = G.copy()
+    fresh = list(itertools.islice(synthetic_traces(ctx.seed, "11.0.0.0/8"), 1024))
+    batches = itertools.cycle([fresh[i : i + 32] for i in range(0, len(fresh), 32)])
+    yield lambda: add_traces(G, next(batches)), 32
+
+
+def _concurrent_ingest(G, traces, max_batch: Optional[int]) -> None:
+    """16 workers merge ``traces`` as a scan's workers would.
+
+    With ``max_batch`` they hand traces to a :class:`GraphWriter` merging up
+    to that many per step; without, each takes the graph lock per trace.
+    """
+
+    from .traceroute import _ingest
+
+    async def run():
+        lock = asyncio.Lock()
+        writer = GraphWriter(G, max_batch=max_batch) if max_batch else None
+        shares = [traces[i::16] for i in range(16)]
+
+        async def worker(share):
+            for hops in share:
+                if writer is not None:
+                    await writer.add(hops)
+                else:
+                    await _ingest(G, hops, lock)
+                # A worker yields to the loop between traces.
+                await asyncio.sleep(0)
+
+        await asyncio.gather(*(worker(share) for share in shares))
+        if writer is not None:
+            await writer.close()
+
+    asyncio.run(run())
+
+
+@contextmanager
+def _bench_ingest(G, ctx):
+    """Workers merging each trace under its own graph-lock hold."""
+
+    G = G.copy()
+    fresh = list(itertools.islice(synthetic_traces(ctx.seed, "11.0.0.0/8"), 512))
+    yield lambda: _concurrent_ingest(G, fresh, None), len(fresh)
+
+
+@contextmanager
+def _bench_ingest_writer(G, ctx):
+    """The same workers handing their traces to a :class:`GraphWriter`."""
+
+    G = G.copy()
+    fresh = list(itertools.islice(synthetic_traces(ctx.seed, "11.0.0.0/8"), 512))
+    yield lambda: _concurrent_ingest(G, fresh, 32), len(fresh)
+
+
+@contextmanager
+def _bench_ingest_writer_unbatched(G, ctx):
+    """The writer applying one trace per step (``--ingest-batch 1``)."""
+
+    G = G.copy()
+    fresh = list(itertools.islice(synthetic_traces(ctx.seed, "11.0.0.0/8"), 512))
+    yield lambda: _concurrent_ingest(G, fresh, 1), len(fresh)
+
+
+@contextmanager
+def _bench_compact_add_traces(G, ctx):
+    store = CompactGraph.from_networkx(G)
+    fresh = list(itertools.islice(synthetic_traces(ctx.seed, "11.0.0.0/8"), 1024))
+    batches = itertools.cycle([fresh[i : i + 32] for i in range(0, len(fresh), 32)])
+    yield lambda: store.add_traces(next(batches)), 32
+
+
+@contextmanager
+def _bench_compact_load_graph(G, ctx):
+    base = os.path.join(ctx.workdir, "load")
+    save_graph(G, base)
+    yield lambda: load_graph(base, compact=True), 1
+
+
+@contextmanager
+def _bench_graph_snapshot(G, ctx):
+    """A snapshot taken under ``graph_lock``, as readers do without a writer."""
+
+    from .webapp import _graph_snapshot
+
+    loop = asyncio.new_event_loop()
+    lock = asyncio.Lock()
+    try:
+        yield lambda: loop.run_until_complete(_graph_snapshot(G, lock, 0)), 1
+    finally:
+        loop.close()
+
+
+@contextmanager
+def _bench_view_snapshot(G, ctx):
+    """What ``serve`` does per update: one write, then its writer view encoded."""
+
+    from .webapp import _encode_snapshot
+
+    G = G.copy()
+    fresh = list(itertools.islice(synthetic_traces(ctx.seed, "11.0.0.0/8"), 1000))
+    traces = itertools.cycle(fresh)
+    loop = asyncio.new_event_loop()
+    writer = GraphWriter(G)
+
+    async def update():
+        await writer.add(next(traces))
+        return _encode_snapshot(writer.view(), writer.version)
+
+    try:
+        yield lambda: loop.run_until_complete(update()), 1
+    finally:
+        loop.run_until_complete(writer.close())
+        loop.close()
+
+
+@contextmanager
+def _bench_save_graph(G, ctx):
+    base = os.path.join(ctx.workdir, "save")
+    yield lambda: save_graph(G, base), 1
+
+
+@contextmanager
+def _bench_load_graph(G, ctx):
+    base = os.path.join(ctx.workdir, "load")
+    save_graph(G, base)
+    yield lambda: load_graph(base), 1
+
+
+@contextmanager
+def _bench_draw_map(G, ctx):
+    import matplotlib.pyplot as plt
+
+    from .viz import draw_map
+
+    fig, ax = plt.subplots(figsize=(8, 8))
+    base = os.path.join(ctx.workdir, "map")
+    try:
+        yield lambda: draw_map(G, base, ax), 1
+    finally:
+        plt.close(fig)
+
+
+@contextmanager
+def _bench_generate_local_pool(G, ctx):
+    size = max(1, len(G))
+    prefix = 32 - max(1, math.ceil(math.log2(size + 2)))
+    yield lambda: generate_local_pool(["10.0.0.1"], prefix, size), size
+
+
+@contextmanager
+def _bench_scan(G, ctx):
+    """Macro: a whole ``lm scan`` on the simulator, into a graph of this size."""
+
+    from .cli import parse_args
+    from .main import scan_async
+
+    def scan():
+        params = parse_args(
+            [
+                "scan",
+                "--no-display",
+                "--prober",
+                "simulate",
+                "--sim-seed",
+                str(ctx.seed),
+                "--sim-time-scale",
+                "0",
+                "--pps",
+                "1000000",
+                "--workers",
+                "16",
+                "--seeds",
+                "12.0.0.1",
+                "--prefix",
+                "16",
+                "--max-traces",
+                str(ctx.traces),
+                "--checkpoint-interval",
+                "0",
+                "--save-base",
+                os.path.join(ctx.workdir, "scan"),
+            ]
+        )
+        asyncio.run(scan_async(params, graph=G.copy()))
+
+    yield scan, ctx.traces
+
+
+# name -> (unit, default repetitions, case); a case yields (operation, items).
+BENCHMARKS: Dict[str, tuple] = {
+    "add_trace": ("traces", 2000, _bench_add_trace),
+    "add_traces": ("traces", 100, _bench_add_traces),
+    "compact_add_traces": ("traces", 100, _bench_compact_add_traces),
+    "ingest": ("traces", 10, _bench_ingest),
+    "ingest_writer": ("traces", 10, _bench_ingest_writer),
+    "ingest_writer_unbatched": ("traces", 10, _bench_ingest_writer_unbatched),
+    "graph_snapshot": ("snapshots", 20, _bench_graph_snapshot),
+    "view_snapshot": ("snapshots", 20, _bench_view_snapshot),
+    "save_graph": ("saves", 5, _bench_save_graph),
+    "load_graph": ("loads", 5, _bench_load_graph),
+    "compact_load_graph": ("loads", 5, _bench_compact_load_graph),
+    "draw_map": ("draws", 3, _bench_draw_map),
+    "generate_local_pool": ("addresses", 5, _bench_generate_local_pool),
+    "scan": ("traces", 3, _bench_scan),
+}
+
+
+def _percentile(ordered: Sequence[float], fraction: float) -> float:
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _peak_bytes(operation: Callable[[], Any]) -> int:
+    gc.collect()
+    tracemalloc.start()
+    try:
+        operation()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def _measure(operation: Callable[[], Any], items: int, repeat: int) -> Dict[str, Any]:
+    operation()  # Warm caches and imports before timing.
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        operation()
+        samples.append(time.perf_counter() - started)
+    ordered = sorted(samples)
+    total = sum(samples)
+    return {
+        "repeat": repeat,
+        "items": items * repeat,
+        "throughput": round(items * repeat / total, 1) if total else 0.0,
+        "mean_ms": round(total / repeat * 1000, 4),
+        "p50_ms": round(_percentile(ordered, 0.5) * 1000, 4),
+        "p90_ms": round(_percentile(ordered, 0.9) * 1000, 4),
+        "p99_ms": round(_percentile(ordered, 0.99) * 1000, 4),
+        "max_ms": round(ordered[-1] * 1000, 4),
+        "peak_kib": round(_peak_bytes(operation) / 1024, 1),
+    }
+
+
+def run_benchmarks(
+    sizes: Iterable[int] = (1_000, 10_000),
+    names: Optional[Iterable[str]] = None,
+    *,
+    repeat: Optional[int] = None,
+    traces: int = 1_000,
+    seed: int = 0,
+    progress: Optional[Callable[[str], None]] = None,
+) -> Dict[str, Any]:
+    """Run ``names`` (default: all of :data:`BENCHMARKS`) at each graph size.
+
+    Results are keyed ``<benchmark>@<nodes>``. ``repeat`` overrides every
+    benchmark's own repetition count; ``traces`` is the length of the ``scan``
+    macro-benchmark. Output printed by the code under test is swallowed.
+    """
+
+    names = list(names or BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        raise ValueError(f"Unknown benchmark: {', '.join(unknown)}")
+    results: Dict[str, Dict[str, Any]] = {}
+    with tempfile.TemporaryDirectory(prefix="lm-bench-") as workdir:
+        ctx = SimpleNamespace(seed=seed, traces=traces, workdir=workdir)
+        for nodes in sizes:
+            G = synthetic_graph(nodes, seed)
+            for name in names:
+                unit, default_repeat, case = BENCHMARKS[name]
+                if progress is not None:
+                    progress(f"{name}@{nodes}")
+                with redirect_stdout(io.StringIO()), case(G, ctx) as (op, items):
+                    measured = _measure(op, items, repeat or default_repeat)
+                results[f"{name}@{nodes}"] = {
+                    "benchmark": name,
+                    "nodes": G.number_of_nodes(),
+                    "edges": G.number_of_edges(),
+                    "unit": unit,
+                    **measured,
+                }
+    return {
+        "version": BENCH_VERSION,
+        "created_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": seed,
+        "results": results,
+    }
+
+
+def compare(
+    current: Dict[str, Any], baseline: Dict[str, Any], threshold: float = 0.1
+) -> Dict[str, Dict[str, Any]]:
+    """Relative change of each result present in both runs.
+
+    A result regressed when its median latency rose, or its throughput fell,
+    by more than ``threshold`` (a fraction).
+    """
+
+    comparison = {}
+    for key, result in current["results"].items():
+        base = baseline.get("results", {}).get(key)
+        if not base:
+            continue
+        p50 = result["p50_ms"] / base["p50_ms"] - 1 if base["p50_ms"] else 0.0
+        throughput = (
+            result["throughput"] / base["throughput"] - 1 if base["throughput"] else 0.0
+        )
+        comparison[key] = {
+            "p50_change": round(p50, 3),
+            "throughput_change": round(throughput, 3),
+            "regressed": p50 > threshold or throughput < -threshold,
+        }
+    return comparison
+
+
+def load_results(path: str) -> Dict[str, Any]:
+    with open(os.path.expanduser(path), encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, dict) or data.get("version") != BENCH_VERSION:
+        raise ValueError(f"{path} is not an lm bench v{BENCH_VERSION} result file")
+    return data
@@ -0,0 +1,175 @@
+"""Periodic checkpoints of the scan scheduler, so ``lm scan --resume`` can continue.
+
+The graph JSON only records what was measured. A checkpoint, written next to it
+as ``<save_base>.checkpoint.json``, records what was still to do: the pool
+cursor, every drawn-but-unfinished target, the frontier's revisit and yield
+bookkeeping, and the refresh scheduler's due times. Periodic checkpoints also
+rewrite the graph JSON, so that after a crash the graph and the checkpoint
+agree on which targets are done.
+"""
+
+import asyncio
+import json
+import os
+import time
+from typing import Any, Dict, Iterable, Optional
+
+import networkx as nx
+
+from .profiling import span
+
+CHECKPOINT_VERSION = 1
+
+
+def checkpoint_path(save_base: str) -> str:
+    base = os.path.expanduser(save_base)
+    if base.endswith(".json"):
+        base = base[: -len(".json")]
+    return f"{base}.checkpoint.json"
+
+
+def pool_fingerprint(seeds: Iterable[str], prefix: int, max_per_seed) -> Dict:
+    """What a resumed pool must match for its cursor to mean the same thing."""
+
+    return {
+        "seeds": list(seeds),
+        "prefix": prefix,
+        "max_per_seed": max_per_seed or None,
+    }
+
+
+def write_checkpoint(path: str, state: Dict[str, Any]) -> None:
+    """Write ``state`` as JSON atomically; a crash mid-write keeps the old file."""
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    partial = f"{path}.tmp"
+    with open(partial, "w", encoding="utf-8") as f:
+        json.dump(state, f, separators=(",", ":"))
+    os.replace(partial, path)
+
+
+def load_checkpoint(save_base: str) -> Optional[Dict[str, Any]]:
+    path = checkpoint_path(save_base)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        state = json.load(f)
+    if not isinstance(state, dict) or state.get("version") != CHECKPOINT_VERSION:
+        raise ValueError(f"unsupported checkpoint format in {path}")
+    return state
+
+
+def _link_data(view) -> Dict[str, Any]:
+    return nx.node_link_data(view.graph)
+
+
+class ScanCheckpoint:
+    """Snapshot the live scheduler state of one ``scan_async`` run.
+
+    :meth:`save` copies the scheduler state and the graph under
+    ``graph_lock`` in one step, so no trace lands between the two, then writes
+    both off the event loop. With a :class:`~latencymesh.writer.GraphWriter`
+    it takes the writer's read-only view instead of the lock, and builds and
+    encodes its graph off the event loop too. :meth:`save_now` writes only
+    the scheduler state, for use at exit right after the graph itself was
+    saved.
+    """
+
+    def __init__(
+        self,
+        save_base: str,
+        fingerprint: Dict,
+        pool,
+        queue,
+        pending_ips,
+        refresh=None,
+        graph=None,
+        graph_lock: Optional[asyncio.Lock] = None,
+        writer=None,
+    ) -> None:
+        self.path = checkpoint_path(save_base)
+        self.graph_path = self.path[: -len(".checkpoint.json")] + ".json"
+        self.fingerprint = fingerprint
+        self.pool = pool
+        self.queue = queue
+        self.pending_ips = pending_ips
+        self.refresh = refresh
+        self.graph = graph
+        self.graph_lock = graph_lock or asyncio.Lock()
+        self.writer = writer
+        self.saves = 0
+        self.last_seconds = 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        state: Dict[str, Any] = {
+            "version": CHECKPOINT_VERSION,
+            "saved_at": time.time(),
+            "pool": dict(self.fingerprint, cursor=self.pool.cursor),
+            "pending": list(self.pending_ips),
+            "frontier": self.queue.state(),
+        }
+        if self.refresh is not None:
+            state["refresh"] = self.refresh.state()
+        return state
+
+    def save_now(self) -> None:
+        started = time.perf_counter()
+        write_checkpoint(self.path, self.snapshot())
+        self._saved(started)
+
+    async def save(self) -> None:
+        started = time.perf_counter()
+        with span("checkpoint"):
+            loop = asyncio.get_running_loop()
+            if self.writer is not None:
+                # Workers drop a target from pending only once its trace is
+                # applied, so this view holds every trace the state omits.
+                state = self.snapshot()
+                view = self.writer.view()
+                graph = await loop.run_in_executor(None, _link_data, view)
+            else:
+                async with self.graph_lock:
+                    state = self.snapshot()
+                    graph = (
+                        None if self.graph is None else nx.node_link_data(self.graph)
+                    )
+            if graph is not None:
+                await loop.run_in_executor(
+                    None, write_checkpoint, self.graph_path, graph
+                )
+            await loop.run_in_executor(None, write_checkpoint, self.path, state)
+        self._saved(started)
+
+    def _saved(self, started: float) -> None:
+        self.saves += 1
+        self.last_seconds = time.perf_counter() - started
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "saves": self.saves,
+            "last_ms": round(self.last_seconds * 1000, 1),
+            "path": self.path,
+        }
+
+
+async def checkpoint_loop(
+    checkpoint: ScanCheckpoint,
+    stop_event: asyncio.Event,
+    interval: float = 60.0,
+    logger=None,
+) -> None:
+    """Save ``checkpoint`` every ``interval`` seconds until stopped."""
+
+    while True:
+        try:
+            await asyncio.wait_for(stop_event.wait(), timeout=interval)
+            return
+        except asyncio.TimeoutError:
+            pass
+        try:
+            await checkpoint.save()
+        except OSError as exc:
+            if logger is not None:
+                logger.warning(f"[checkpoint] save failed: {exc}")
@@ -1,10 +1,26 @@
 import argparse
-from typing import List
+from typing import List, Tuple
 
 from .durations import parse_duration
 
-
 DEFAULT_SEEDS: List[str] = ["192.168.1.1", "1.1.1.1", "8.8.8.8"]
+# The keys of bench.BENCHMARKS, listed here so parsing never imports bench.
+BENCHMARK_NAMES: Tuple[str, ...] = (
+    "add_trace",
+    "add_traces",
+    "compact_add_traces",
+    "ingest",
+    "ingest_writer",
+    "ingest_writer_unbatched",
+    "graph_snapshot",
+    "view_snapshot",
+    "save_graph",
+    "load_graph",
+    "compact_load_graph",
+    "draw_map",
+    "generate_local_pool",
+    "scan",
+)
 
 
 def add_scan_arguments(parser: argparse.ArgumentParser) -> None:
@@ -14,19 +30,200 @@ def add_scan_arguments(parser: argparse.ArgumentParser) -> None:
     parser.add_argument(
         "--workers", type=int, default=5, help="Concurrent traceroute workers"
     )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Time each pipeline stage and write <save-base>.profile.json and "
+        "a collapsed-stack .profile.folded at exit",
+    )
+    parser.add_argument(
+        "--profile-capture",
+        choices=["cpu", "memory"],
+        help="With --profile, also run cProfile or tracemalloc for --profile-window",
+    )
+    parser.add_argument(
+        "--profile-window",
+        type=float,
+        default=30.0,
+        help="Seconds of --profile-capture at the start of the run (default: 30)",
+    )
+    parser.add_argument(
+        "--loop",
+        choices=["asyncio", "uvloop"],
+        default="asyncio",
+        help="Event loop implementation (uvloop falls back to asyncio if missing)",
+    )
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=1,
+        help="Shard targets across this many scanning processes (one graph)",
+    )
+    parser.add_argument(
+        "--autoscale",
+        action="store_true",
+        help="Grow and shrink the worker count at runtime (AIMD), "
+        "starting from --workers",
+    )
+    parser.add_argument(
+        "--min-workers", type=int, default=1, help="Lower bound for --autoscale"
+    )
+    parser.add_argument(
+        "--max-workers",
+        type=int,
+        default=None,
+        help="Upper bound for --autoscale (default: 4x --workers)",
+    )
+    parser.add_argument(
+        "--autoscale-interval",
+        type=float,
+        default=5.0,
+        help="Seconds between --autoscale adjustments",
+    )
     parser.add_argument(
         "--pps", type=float, default=1.0, help="Rate limit (traceroutes/sec per worker)"
     )
+    parser.add_argument(
+        "--probe-rate",
+        type=float,
+        help="Global probe budget in packets/sec shared by all workers "
+        "(replaces the per-worker --pps pause)",
+    )
+    parser.add_argument(
+        "--probe-burst",
+        type=float,
+        help="Packets the global budget may send in a burst (default: one second)",
+    )
+    parser.add_argument(
+        "--prefix-rate",
+        type=float,
+        help="Politeness limit in packets/sec per destination /24",
+    )
+    parser.add_argument(
+        "--prefix-burst",
+        type=float,
+        help="Burst size of the per-prefix politeness limit",
+    )
     parser.add_argument("--prefix", type=int, default=16, help="Local prefix length")
     parser.add_argument(
         "--max-per-seed", type=int, default=4096, help="Max addresses per seed"
     )
+    parser.add_argument(
+        "--pool-offset",
+        type=int,
+        default=0,
+        help="Skip this many targets of the deterministic pool (resume a scan)",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue from the checkpoint next to --save-base instead of starting over",
+    )
+    parser.add_argument(
+        "--checkpoint-interval",
+        type=float,
+        default=60.0,
+        metavar="SECONDS",
+        help="Seconds between scan checkpoints (0 disables them)",
+    )
+    parser.add_argument(
+        "--pool-window",
+        type=int,
+        default=1024,
+        help="Targets drawn from the pool ahead of the workers",
+    )
     parser.add_argument(
         "--timeout", type=float, default=1.0, help="Per-hop timeout (seconds)"
     )
+    parser.add_argument(
+        "--adaptive-timeout",
+        action="store_true",
+        help="Derive each probe's timeout from smoothed RTTs, capped by --timeout",
+    )
+    parser.add_argument(
+        "--min-timeout",
+        type=float,
+        default=0.05,
+        help="Shortest adaptive per-hop timeout (seconds)",
+    )
     parser.add_argument(
         "--max-hops", type=int, default=30, help="Max hops per traceroute"
     )
+    parser.add_argument(
+        "--prober",
+        choices=["subprocess", "socket", "simulate"],
+        default="subprocess",
+        help="Traceroute backend: system traceroute, shared raw sockets, or a "
+        "synthetic network (no network access)",
+    )
+    parser.add_argument(
+        "--sim-seed",
+        type=int,
+        default=0,
+        help="Seed of the synthetic topology (--prober simulate)",
+    )
+    parser.add_argument(
+        "--sim-loss",
+        type=float,
+        default=0.01,
+        help="Simulated per-probe loss rate (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--sim-silent",
+        type=float,
+        default=0.05,
+        help="Share of simulated routers that never answer (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--sim-alive",
+        type=float,
+        default=0.3,
+        help="Share of simulated destinations that answer (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--sim-ecmp",
+        type=int,
+        default=2,
+        help="Equal-cost routers per simulated access/core hop (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--sim-time-scale",
+        type=float,
+        default=1.0,
+        help="Multiply simulated delays (0 answers instantly; default: %(default)s)",
+    )
+    parser.add_argument(
+        "--probe-window",
+        type=int,
+        help="TTLs probed in parallel per trace (0 = all at once)",
+    )
+    parser.add_argument(
+        "--stop-sets",
+        action="store_true",
+        help="Doubletree probing: skip hops already known (socket prober)",
+    )
+    parser.add_argument(
+        "--start-ttl",
+        type=int,
+        default=5,
+        help="Mid-path TTL where Doubletree probing starts",
+    )
+    parser.add_argument(
+        "--adaptive-ttl",
+        action="store_true",
+        help="Learn a first/max TTL window per destination /24",
+    )
+    parser.add_argument(
+        "--ttl-margin",
+        type=int,
+        default=2,
+        help="Hops probed past the learned destination distance",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Ingest and broadcast each hop as soon as it is answered",
+    )
     parser.add_argument(
         "--update-mode",
         choices=["fixed", "dynamic"],
@@ -53,6 +250,52 @@ def add_scan_arguments(parser: argparse.ArgumentParser) -> None:
         type=parse_duration,
         help="Stop the scan after the given duration (e.g. 10m, 2h)",
     )
+    parser.add_argument(
+        "--refresh",
+        type=parse_duration,
+        help="Re-measure every known node within this freshness window (e.g. 6h)",
+    )
+    parser.add_argument(
+        "--refresh-min",
+        type=parse_duration,
+        help="Shortest refresh interval for volatile nodes (default: window/16)",
+    )
+    parser.add_argument(
+        "--path-cache",
+        type=parse_duration,
+        metavar="TTL",
+        help="Do not re-trace a destination measured within TTL (e.g. 10m)",
+    )
+    parser.add_argument(
+        "--path-cache-prefix",
+        action="store_true",
+        help="Share cached paths across each destination /24",
+    )
+    parser.add_argument(
+        "--path-cache-mode",
+        choices=["skip", "check"],
+        default="check",
+        help="On a cache hit, skip the destination or confirm it with one probe",
+    )
+    parser.add_argument(
+        "--coalesce-prefix",
+        action="store_true",
+        help="Let one trace at a time run per destination /24; others wait for it",
+    )
+    parser.add_argument(
+        "--ingest-batch",
+        type=int,
+        default=32,
+        help="Most queued traces the graph writer merges per step; "
+        "1 merges each trace on its own (default: 32)",
+    )
+    parser.add_argument(
+        "--ingest-delay",
+        type=float,
+        default=0.0,
+        help="Seconds the graph writer waits to fill a partial batch; "
+        "0 merges whatever is queued when it runs (default: 0)",
+    )
     parser.add_argument(
         "--max-traces",
         type=int,
@@ -81,6 +324,16 @@ def create_parser() -> argparse.ArgumentParser:
 
     scan = subparsers.add_parser("scan", help="Perform an asynchronous traceroute scan")
     add_scan_arguments(scan)
+    scan.add_argument(
+        "--metrics-port",
+        type=int,
+        help="Serve Prometheus metrics at http://HOST:PORT/metrics during the scan",
+    )
+    scan.add_argument(
+        "--metrics-host",
+        default="127.0.0.1",
+        help="Interface for --metrics-port (default: %(default)s)",
+    )
 
     show = subparsers.add_parser("show", help="Render a stored internet map")
     show.add_argument("graph", help="Path to a JSON graph file")
@@ -93,6 +346,11 @@ def create_parser() -> argparse.ArgumentParser:
     show.add_argument(
         "--output", help="Optional output image path (default: <graph>_<layout>.svg)"
     )
+    show.add_argument(
+        "--compact",
+        action="store_true",
+        help="Load the graph into the array-backed store (far less memory)",
+    )
 
     export = subparsers.add_parser("export", help="Export a map to an alternate format")
     export.add_argument("graph", help="Path to a JSON graph file")
@@ -105,9 +363,19 @@ def create_parser() -> argparse.ArgumentParser:
     export.add_argument(
         "--output", help="Optional output path (default derived from input)"
     )
+    export.add_argument(
+        "--compact",
+        action="store_true",
+        help="Load the graph into the array-backed store (far less memory)",
+    )
 
     stats = subparsers.add_parser("stats", help="Show statistics for a graph")
     stats.add_argument("graph", help="Path to a JSON graph file")
+    stats.add_argument(
+        "--compact",
+        action="store_true",
+        help="Load the graph into the array-backed store (far less memory)",
+    )
 
     prune = subparsers.add_parser("prune", help="Remove stale or low-quality nodes")
     prune.add_argument("graph", help="Path to a JSON graph file")
@@ -150,8 +418,82 @@ def create_parser() -> argparse.ArgumentParser:
         dest="legacy_directory",
         help=argparse.SUPPRESS,
     )
+    serve.add_argument(
+        "--collect",
+        action="store_true",
+        help="Act as a hub: lease targets to `lm agent`s and merge their traces "
+        "instead of scanning locally",
+    )
+    serve.add_argument(
+        "--lease-size",
+        type=int,
+        default=256,
+        help="Targets per lease handed to an agent (with --collect)",
+    )
     add_scan_arguments(serve)
 
+    agent = subparsers.add_parser(
+        "agent", help="Scan from this vantage point and report to `lm serve --collect`"
+    )
+    agent.add_argument(
+        "--collector",
+        required=True,
+        metavar="URL",
+        help="Base URL of the collecting server (e.g. http://hub:8000)",
+    )
+    agent.add_argument(
+        "--vantage", help="Name of this vantage point (default: hostname)"
+    )
+    agent.add_argument(
+        "--batch-size", type=int, default=64, help="Traces per upload batch"
+    )
+    agent.add_argument(
+        "--flush-interval",
+        type=float,
+        default=2.0,
+        help="Seconds between uploads of partial batches",
+    )
+    add_scan_arguments(agent)
+
+    bench = subparsers.add_parser(
+        "bench", help="Benchmark the hot paths on synthetic graphs"
+    )
+    bench.add_argument(
+        "--nodes",
+        type=int,
+        nargs="+",
+        default=[1_000, 10_000],
+        help="Synthetic graph sizes to benchmark (default: 1000 10000)",
+    )
+    bench.add_argument(
+        "--only",
+        nargs="+",
+        choices=BENCHMARK_NAMES,
+        help="Run only these benchmarks",
+    )
+    bench.add_argument(
+        "--repeat", type=int, help="Timed runs per benchmark (default: per benchmark)"
+    )
+    bench.add_argument(
+        "--traces",
+        type=int,
+        default=1_000,
+        help="Traces per run of the end-to-end scan benchmark",
+    )
+    bench.add_argument(
+        "--seed", type=int, default=0, help="Seed of the synthetic graphs"
+    )
+    bench.add_argument("--output", help="Write the JSON results here (default: stdout)")
+    bench.add_argument(
+        "--baseline", help="Compare against a JSON file written by an earlier run"
+    )
+    bench.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="Relative slowdown that counts as a regression (default: 0.1)",
+    )
+
     return parser
 
 
@@ -0,0 +1,183 @@
+"""Central collection of traces from remote scan agents.
+
+``lm serve --collect`` turns the server into a hub: a :class:`Coordinator`
+leases disjoint slices of the deterministic target pool to ``lm agent``
+processes, and a :class:`Collector` merges the trace batches they post into the
+shared graph, tagging nodes and edges with the reporting vantage point.
+"""
+
+import asyncio
+import itertools
+import time
+from collections import Counter, deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+import networkx as nx
+
+from .graph_ops import add_traces
+from .iptools import LocalPool
+
+
+def _add_tag(attributes: Dict[str, Any], vantage: str) -> None:
+    tags = set(filter(None, str(attributes.get("vantages", "")).split(",")))
+    if vantage not in tags:
+        tags.add(vantage)
+        attributes["vantages"] = ",".join(sorted(tags))
+
+
+def parse_batch(batch: Any) -> Tuple[str, List[List[Tuple[str, float]]]]:
+    """Validate an agent batch and return ``(vantage, hop lists)``.
+
+    A batch is ``{"vantage": name, "traces": [[host, [[ip, rtt], ...]], ...]}``.
+    Raises :class:`ValueError` when the payload does not have that shape.
+    """
+
+    if not isinstance(batch, dict):
+        raise ValueError("batch must be an object")
+    vantage = str(batch.get("vantage") or "").strip()
+    if not vantage or "," in vantage:
+        raise ValueError("batch needs a vantage name without commas")
+    traces = batch.get("traces")
+    if not isinstance(traces, list):
+        raise ValueError("batch traces must be a list")
+    hop_lists = []
+    for trace in traces:
+        try:
+            _host, hops = trace
+            hop_lists.append([(str(ip), float(rtt)) for ip, rtt in hops])
+        except (TypeError, ValueError) as exc:
+            raise ValueError(f"malformed trace: {trace!r}") from exc
+    return vantage, hop_lists
+
+
+class Collector:
+    """Merge agent trace batches into ``graph`` under ``graph_lock``.
+
+    With a :class:`~latencymesh.writer.GraphWriter` the batch is merged by the
+    writer instead, in order with every other mutation.
+    """
+
+    def __init__(
+        self,
+        graph: nx.Graph,
+        graph_lock: asyncio.Lock,
+        notify: Optional[Callable[[], None]] = None,
+        writer=None,
+    ) -> None:
+        self.graph = graph
+        self.graph_lock = graph_lock
+        self.notify = notify
+        self.writer = writer
+        self.batches = 0
+        self.traces: Counter = Counter()
+
+    async def ingest(self, batch: Any) -> int:
+        vantage, hop_lists = parse_batch(batch)
+        hop_lists = [hops for hops in hop_lists if hops]
+        accepted = len(hop_lists)
+
+        def merge(graph: nx.Graph) -> None:
+            add_traces(graph, hop_lists)
+            for hops in hop_lists:
+                for index, (ip, _) in enumerate(hops):
+                    _add_tag(graph.nodes[ip], vantage)
+                    if index:
+                        _add_tag(graph[hops[index - 1][0]][ip], vantage)
+
+        if self.writer is not None:
+            await self.writer.apply(merge, touches=hop_lists)
+        else:
+            async with self.graph_lock:
+                merge(self.graph)
+        self.batches += 1
+        self.traces[vantage] += accepted
+        if accepted and self.notify is not None:
+            self.notify()
+        return accepted
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "batches": self.batches,
+            "traces": sum(self.traces.values()),
+            "vantages": dict(self.traces),
+        }
+
+
+class Coordinator:
+    """Lease disjoint ``[offset, offset + count)`` slices of the target pool.
+
+    Agents rebuild the same :class:`~latencymesh.iptools.LocalPool` from the
+    seeds in the lease and walk only their slice. Leases not completed within
+    ``lease_timeout`` seconds are handed out again.
+    """
+
+    def __init__(
+        self,
+        seeds: List[str],
+        prefix: int,
+        max_per_seed: Optional[int],
+        lease_size: int = 256,
+        lease_timeout: float = 600.0,
+        clock=None,
+    ) -> None:
+        self.seeds = list(seeds)
+        self.prefix = prefix
+        self.max_per_seed = max_per_seed
+        self.lease_size = max(1, int(lease_size))
+        self.lease_timeout = lease_timeout
+        self.total = LocalPool(self.seeds, prefix, max_per_seed).total
+        self._clock = clock or time.monotonic
+        self._next = 0
+        self._returned: Deque[Tuple[int, int]] = deque()
+        self._leases: Dict[int, Tuple[int, int, str, float]] = {}
+        self._ids = itertools.count(1)
+        self.completed = 0
+        self.expired = 0
+
+    def _expire(self) -> None:
+        now = self._clock()
+        for lease_id, (offset, count, _agent, issued) in list(self._leases.items()):
+            if now - issued > self.lease_timeout:
+                del self._leases[lease_id]
+                self._returned.append((offset, count))
+                self.expired += 1
+
+    def lease(self, agent: str) -> Optional[Dict[str, Any]]:
+        """Hand ``agent`` the next free slice, or ``None`` when none is left."""
+
+        self._expire()
+        if self._returned:
+            offset, count = self._returned.popleft()
+        elif self._next < self.total:
+            offset = self._next
+            count = min(self.lease_size, self.total - offset)
+            self._next += count
+        else:
+            return None
+        lease_id = next(self._ids)
+        self._leases[lease_id] = (offset, count, agent, self._clock())
+        return {
+            "lease": lease_id,
+            "seeds": self.seeds,
+            "prefix": self.prefix,
+            "max_per_seed": self.max_per_seed,
+            "offset": offset,
+            "count": count,
+        }
+
+    def complete(self, lease_id: int) -> bool:
+        if self._leases.pop(lease_id, None) is None:
+            return False
+        self.completed += 1
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        returned = sum(count for _, count in self._returned)
+        return {
+            "pool": self.total,
+            "remaining": self.total - self._next + returned,
+            "outstanding": len(self._leases),
+            "completed": self.completed,
+            "expired": self.expired,
+            "agents": len({agent for _, _, agent, _ in self._leases.values()}),
+        }
@@ -0,0 +1,416 @@
+"""Array-backed graph store for graphs too large for networkx's dicts.
+
+networkx keeps an attribute dict per node and per edge, each holding boxed
+floats and an ISO ``last_seen`` string. :class:`CompactGraph` numbers nodes
+instead and keeps their attributes in typed arrays (float32 RTT, uint32 epoch
+seconds), with edges in a growable edge list (two uint32 endpoint arrays and a
+float32 weight array). Neighbour lists are built on demand as a CSR index.
+:meth:`CompactGraph.view` wraps the store in a read-only ``nx.Graph`` that
+builds attribute dicts as they are read, so ``show``, ``export`` and
+``stats`` run on it unchanged.
+"""
+
+import calendar
+import math
+from array import array
+from collections.abc import ItemsView, Mapping
+from datetime import datetime, timezone
+from typing import Any, Dict, Hashable, Iterable, Iterator, List, Optional, Tuple
+
+import networkx as nx
+
+from .graph_ops import Hop
+
+_NO_RTT = math.nan
+_NO_SEEN = 0
+
+
+def _epoch(value: Any) -> Optional[int]:
+    """``last_seen`` as UTC epoch seconds, or ``None`` if it does not fit."""
+
+    try:
+        moment = datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc)
+    if moment.microsecond:
+        return None
+    seconds = calendar.timegm(moment.timetuple())
+    return seconds if 0 < seconds < 2**32 else None
+
+
+def _iso(seconds: int) -> str:
+    moment = datetime.fromtimestamp(seconds, timezone.utc).replace(tzinfo=None)
+    return moment.isoformat(timespec="seconds")
+
+
+def _now() -> int:
+    return calendar.timegm(datetime.utcnow().timetuple())
+
+
+class CompactGraph:
+    """Nodes and edges of an undirected graph in flat typed arrays.
+
+    Node ``i`` is ``names[i]`` with ``rtt[i]`` (``nan`` when unknown) and
+    ``seen[i]`` (``0`` when unknown). Edge ``e`` joins ``src[e]`` and
+    ``dst[e]`` with ``weight[e]``. Attributes that do not fit these columns,
+    such as collector ``vantages`` tags or a ``last_seen`` with sub-second
+    precision, are kept in a per-id dict. RTTs and weights are read back
+    rounded to three decimals (microseconds, as traceroute reports them),
+    which float32 holds to within rounding for anything below four seconds.
+    """
+
+    def __init__(self) -> None:
+        self.ids: Dict[Hashable, int] = {}
+        self.names: List[Hashable] = []
+        self.rtt = array("f")
+        self.seen = array("I")
+        self.src = array("I")
+        self.dst = array("I")
+        self.weight = array("f")
+        self._edges: Dict[int, int] = {}
+        self._node_extra: Dict[int, Dict[str, Any]] = {}
+        self._edge_extra: Dict[int, Dict[str, Any]] = {}
+        self._csr: Optional[Tuple[int, int, array, array, array]] = None
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def number_of_nodes(self) -> int:
+        return len(self.names)
+
+    def number_of_edges(self) -> int:
+        return len(self.src)
+
+    @staticmethod
+    def _key(u: int, v: int) -> int:
+        return (u << 32) | v if u <= v else (v << 32) | u
+
+    def node_id(self, name: Hashable, **attributes: Any) -> int:
+        """The id of ``name``, adding it (with ``attributes``) if it is new."""
+
+        node = self.ids.get(name)
+        if node is None:
+            node = self.ids[name] = len(self.names)
+            self.names.append(name)
+            self.rtt.append(_NO_RTT)
+            self.seen.append(_NO_SEEN)
+        if attributes:
+            self._set_node(node, attributes)
+        return node
+
+    def _set_node(self, node: int, attributes: Dict[str, Any]) -> None:
+        extra = {}
+        for key, value in attributes.items():
+            seconds = _epoch(value) if key == "last_seen" else None
+            if key == "rtt" and isinstance(value, (int, float)):
+                self.rtt[node] = value
+            elif seconds is not None:
+                self.seen[node] = seconds
+            else:
+                extra[key] = value
+        if extra:
+            self._node_extra.setdefault(node, {}).update(extra)
+
+    def edge_id(self, u: Hashable, v: Hashable) -> Optional[int]:
+        a, b = self.ids.get(u), self.ids.get(v)
+        if a is None or b is None:
+            return None
+        return self._edges.get(self._key(a, b))
+
+    def add_edge(self, u: Hashable, v: Hashable, **attributes: Any) -> int:
+        a, b = self.node_id(u), self.node_id(v)
+        key = self._key(a, b)
+        edge = self._edges.get(key)
+        if edge is None:
+            edge = self._edges[key] = len(self.src)
+            self.src.append(a)
+            self.dst.append(b)
+            self.weight.append(_NO_RTT)
+        extra = {}
+        for name, value in attributes.items():
+            if name == "weight" and isinstance(value, (int, float)):
+                self.weight[edge] = value
+            else:
+                extra[name] = value
+        if extra:
+            self._edge_extra.setdefault(edge, {}).update(extra)
+        return edge
+
+    def _merge(self, hops: List[Hop], now: int) -> int:
+        # graph_ops.add_trace's rules, on array slots instead of dicts.
+        ids, rtts, seen, edges, weights = (
+            self.ids,
+            self.rtt,
+            self.seen,
+            self._edges,
+            self.weight,
+        )
+        new_edges = 0
+        prev = prev_rtt = None
+        for ip, rtt in hops:
+            node = ids.get(ip)
+            if node is None:
+                node = ids[ip] = len(self.names)
+                self.names.append(ip)
+                rtts.append(rtt)
+                seen.append(now)
+            else:
+                if not rtt >= rtts[node]:
+                    rtts[node] = rtt
+                seen[node] = now
+            if prev is not None:
+                delta = max(rtt - prev_rtt, 0.1)
+                key = (prev << 32) | node if prev <= node else (node << 32) | prev
+                edge = edges.get(key)
+                if edge is None:
+                    edges[key] = len(self.src)
+                    self.src.append(prev)
+                    self.dst.append(node)
+                    weights.append(delta)
+                    new_edges += 1
+                elif not delta >= weights[edge]:
+                    weights[edge] = delta
+            prev, prev_rtt = node, rtt
+        return new_edges
+
+    def add_trace(self, hops: List[Hop]) -> int:
+        """Merge ``hops`` like :func:`~latencymesh.graph_ops.add_trace`."""
+
+        return self._merge(hops, _now())
+
+    def add_traces(self, traces: Iterable[List[Hop]]) -> List[int]:
+        """Merge many traces with one shared timestamp."""
+
+        now = _now()
+        return [self._merge(hops, now) for hops in traces]
+
+    def node_attributes(self, node: int) -> Dict[str, Any]:
+        data: Dict[str, Any] = {}
+        rtt = self.rtt[node]
+        if rtt == rtt:
+            data["rtt"] = round(rtt, 3)
+        if self.seen[node]:
+            data["last_seen"] = _iso(self.seen[node])
+        extra = self._node_extra.get(node)
+        if extra:
+            data.update(extra)
+        return data
+
+    def edge_attributes(self, edge: int) -> Dict[str, Any]:
+        data: Dict[str, Any] = {}
+        weight = self.weight[edge]
+        if weight == weight:
+            data["weight"] = round(weight, 3)
+        extra = self._edge_extra.get(edge)
+        if extra:
+            data.update(extra)
+        return data
+
+    def csr(self) -> Tuple[array, array, array]:
+        """``(offsets, neighbours, edges)``: node ``i``'s neighbours and the
+        edges to them are ``[offsets[i]:offsets[i + 1]]``.
+
+        Rebuilt after nodes or edges were added; attribute updates keep it.
+        """
+
+        nodes, count = len(self.names), len(self.src)
+        cached = self._csr
+        if cached is not None and cached[:2] == (nodes, count):
+            return cached[2:]
+        offsets = array("I", bytes(4 * (nodes + 1)))
+        for u, v in zip(self.src, self.dst):
+            offsets[u + 1] += 1
+            if u != v:
+                offsets[v + 1] += 1
+        for node in range(nodes):
+            offsets[node + 1] += offsets[node]
+        fill = array("I", offsets[:-1])
+        size = offsets[nodes] if nodes else 0
+        neighbours = array("I", bytes(4 * size))
+        edge_ids = array("I", bytes(4 * size))
+        for edge, (u, v) in enumerate(zip(self.src, self.dst)):
+            neighbours[fill[u]], edge_ids[fill[u]] = v, edge
+            fill[u] += 1
+            if u != v:
+                neighbours[fill[v]], edge_ids[fill[v]] = u, edge
+                fill[v] += 1
+        self._csr = (nodes, count, offsets, neighbours, edge_ids)
+        return offsets, neighbours, edge_ids
+
+    def nbytes(self) -> int:
+        """Bytes held by the typed arrays (not the name and edge indexes)."""
+
+        columns = (self.rtt, self.seen, self.src, self.dst, self.weight)
+        return sum(column.itemsize * len(column) for column in columns)
+
+    @classmethod
+    def from_networkx(cls, graph: nx.Graph) -> "CompactGraph":
+        store = cls()
+        for node, data in graph.nodes(data=True):
+            store.node_id(node, **data)
+        for u, v, data in graph.edges(data=True):
+            store.add_edge(u, v, **data)
+        return store
+
+    @classmethod
+    def from_node_link(cls, data: Dict[str, Any]) -> "CompactGraph":
+        """Build from ``nx.node_link_data`` output, as stored by ``save_graph``."""
+
+        store = cls()
+        for node in data.get("nodes", ()):
+            attributes = dict(node)
+            store.node_id(attributes.pop("id"), **attributes)
+        for link in data.get("edges", data.get("links", ())):
+            attributes = dict(link)
+            u, v = attributes.pop("source"), attributes.pop("target")
+            store.add_edge(u, v, **attributes)
+        return store
+
+    def to_networkx(self) -> nx.Graph:
+        graph = nx.Graph()
+        for node, name in enumerate(self.names):
+            graph.add_node(name, **self.node_attributes(node))
+        for edge, (u, v) in enumerate(zip(self.src, self.dst)):
+            graph.add_edge(self.names[u], self.names[v], **self.edge_attributes(edge))
+        return graph
+
+    def view(self) -> "CompactView":
+        return CompactView(self)
+
+
+class _Items(ItemsView):
+    def __init__(self, mapping: Mapping, items) -> None:
+        super().__init__(mapping)
+        self._items = items
+
+    def __iter__(self):
+        return self._items()
+
+
+class _Neighbours(Mapping):
+    """One node's row of the adjacency: neighbour -> edge attribute dict."""
+
+    __slots__ = ("store", "node")
+
+    def __init__(self, store: CompactGraph, node: int) -> None:
+        self.store = store
+        self.node = node
+
+    def _span(self) -> Tuple[array, array, int, int]:
+        offsets, neighbours, edges = self.store.csr()
+        return neighbours, edges, offsets[self.node], offsets[self.node + 1]
+
+    def __getitem__(self, name: Hashable) -> Dict[str, Any]:
+        other = self.store.ids.get(name)
+        if other is not None:
+            edge = self.store._edges.get(CompactGraph._key(self.node, other))
+            if edge is not None:
+                return self.store.edge_attributes(edge)
+        raise KeyError(name)
+
+    def __contains__(self, name: object) -> bool:
+        other = self.store.ids.get(name)
+        return (
+            other is not None
+            and CompactGraph._key(self.node, other) in self.store._edges
+        )
+
+    def __len__(self) -> int:
+        offsets = self.store.csr()[0]
+        return offsets[self.node + 1] - offsets[self.node]
+
+    def __iter__(self) -> Iterator[Hashable]:
+        neighbours, _, start, end = self._span()
+        names = self.store.names
+        return (names[neighbours[i]] for i in range(start, end))
+
+    def _pairs(self):
+        neighbours, edges, start, end = self._span()
+        names, attributes = self.store.names, self.store.edge_attributes
+        for i in range(start, end):
+            yield names[neighbours[i]], attributes(edges[i])
+
+    def items(self):
+        return _Items(self, self._pairs)
+
+
+class _Adjacency(Mapping):
+    __slots__ = ("store",)
+
+    def __init__(self, store: CompactGraph) -> None:
+        self.store = store
+
+    def __getitem__(self, name: Hashable) -> _Neighbours:
+        return _Neighbours(self.store, self.store.ids[name])
+
+    def __contains__(self, name: object) -> bool:
+        return name in self.store.ids
+
+    def __len__(self) -> int:
+        return len(self.store.names)
+
+    def __iter__(self) -> Iterator[Hashable]:
+        return iter(self.store.names)
+
+    def _pairs(self):
+        for node, name in enumerate(self.store.names):
+            yield name, _Neighbours(self.store, node)
+
+    def items(self):
+        return _Items(self, self._pairs)
+
+
+class _Nodes(Mapping):
+    __slots__ = ("store",)
+
+    def __init__(self, store: CompactGraph) -> None:
+        self.store = store
+
+    def __getitem__(self, name: Hashable) -> Dict[str, Any]:
+        return self.store.node_attributes(self.store.ids[name])
+
+    def __contains__(self, name: object) -> bool:
+        return name in self.store.ids
+
+    def __len__(self) -> int:
+        return len(self.store.names)
+
+    def __iter__(self) -> Iterator[Hashable]:
+        return iter(self.store.names)
+
+    def _pairs(self):
+        attributes = self.store.node_attributes
+        for node, name in enumerate(self.store.names):
+            yield name, attributes(node)
+
+    def items(self):
+        return _Items(self, self._pairs)
+
+
+class CompactView(nx.Graph):
+    """A read-only ``nx.Graph`` over a :class:`CompactGraph`.
+
+    Attribute dicts are built on each read, so changing them has no effect;
+    adding or removing nodes and edges raises ``NetworkXError``. Use
+    :meth:`CompactGraph.to_networkx` for a mutable copy.
+    """
+
+    def __init__(self, store: CompactGraph) -> None:
+        self.store = store
+        self.graph = {}
+        self._node = _Nodes(store)
+        self._adj = _Adjacency(store)
+        self.__networkx_cache__ = {}
+        nx.freeze(self)
+
+    def number_of_edges(self, u=None, v=None) -> int:
+        if u is None:
+            return self.store.number_of_edges()
+        return super().number_of_edges(u, v)
+
+    def copy(self, as_view: bool = False) -> nx.Graph:
+        if as_view:
+            return self
+        return self.store.to_networkx()
@@ -0,0 +1,218 @@
+"""Priority frontier that hands workers the most valuable target next."""
+
+import asyncio
+import heapq
+import math
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from .iptools import ip_prefix
+from .ipset import IPSet
+
+# A decayed /24 yield below this adds under 0.01 to a score; it is dropped.
+_YIELD_FLOOR = 0.01
+
+
+def _last_seen_age(G, host: str) -> Optional[float]:
+    if G is None or not G.has_node(host):
+        return None
+    last_seen = G.nodes[host].get("last_seen")
+    if not last_seen:
+        return None
+    try:
+        seen = datetime.fromisoformat(last_seen)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (datetime.utcnow() - seen).total_seconds())
+
+
+class Frontier(asyncio.Queue):
+    """``asyncio.Queue`` ordered by target value instead of arrival.
+
+    A target scores ``novelty + staleness + yield``:
+
+    * novelty -- ``novelty_weight`` until the target has been traced once;
+    * staleness -- time since the target was last traced (or, before that,
+      since the graph's ``last_seen``) over ``staleness_horizon``, capped at 1;
+      targets the graph has never seen count as fully stale;
+    * yield -- new edges recently discovered by traces into the same /24,
+      decayed with ``yield_half_life`` and squashed into ``[0, 1)``.
+
+    Scores are computed on ``put``; ``get`` re-scores the head and defers it if
+    its value dropped below the next entry. Equal scores keep FIFO order.
+
+    Trace times are kept only while they still matter: once a trace is older
+    than both ``staleness_horizon`` and ``revisit_after`` the host moves to a
+    packed :class:`~latencymesh.ipset.IPSet` of long-ago traces, which score
+    and revisit exactly as the timestamp would. The same periodic pass drops
+    /24 yields that have decayed below ``0.01``.
+    """
+
+    def __init__(
+        self,
+        graph=None,
+        *,
+        maxsize: int = 0,
+        novelty_weight: float = 1.0,
+        staleness_horizon: float = 3600.0,
+        yield_half_life: float = 600.0,
+        revisit_after: float = 1800.0,
+        clock=None,
+    ) -> None:
+        self.graph = graph
+        self.novelty_weight = novelty_weight
+        self.staleness_horizon = staleness_horizon
+        self.yield_half_life = yield_half_life
+        self.revisit_after = revisit_after
+        self._clock = clock or time.monotonic
+        self._traced: Dict[str, float] = {}
+        self._expired = IPSet()
+        self._forget_after = max(staleness_horizon, revisit_after)
+        self._pruned_at = self._clock()
+        self._yields: Dict[str, Tuple[float, float]] = {}
+        self._kinds: Counter = Counter()
+        self._prefixes: Counter = Counter()
+        self._seq = 0
+        self.revisits = 0
+        super().__init__(maxsize)
+
+    # asyncio.Queue storage hooks (the same ones PriorityQueue overrides).
+    def _init(self, maxsize: int) -> None:
+        self._queue: List[Tuple[float, int, Optional[str], str]] = []
+
+    def _put(self, host: Optional[str]) -> None:
+        if host is None:
+            # Shutdown sentinels jump the queue.
+            entry = (-math.inf, self._next_seq(), None, "sentinel")
+        else:
+            kind = "revisit" if self._was_traced(host) else "novel"
+            entry = (-self.score(host), self._next_seq(), host, kind)
+            self._prefixes[ip_prefix(host)] += 1
+        self._kinds[entry[3]] += 1
+        heapq.heappush(self._queue, entry)
+
+    def _get(self) -> Optional[str]:
+        entry = heapq.heappop(self._queue)
+        # Re-score lazily: yields decay and stale targets age while queued.
+        for _ in range(8):
+            if entry[2] is None or not self._queue:
+                break
+            fresh = -self.score(entry[2])
+            if fresh <= self._queue[0][0]:
+                break
+            entry = heapq.heappushpop(self._queue, (fresh, *entry[1:]))
+        self._kinds[entry[3]] -= 1
+        if entry[2] is not None:
+            prefix = ip_prefix(entry[2])
+            self._prefixes[prefix] -= 1
+            if self._prefixes[prefix] <= 0:
+                del self._prefixes[prefix]
+            now = self._clock()
+            self._traced[entry[2]] = now
+            self._expired.discard(entry[2])
+            self._prune(now)
+        return entry[2]
+
+    def _was_traced(self, host: str) -> bool:
+        return host in self._traced or host in self._expired
+
+    def _prune(self, now: float) -> None:
+        # A full pass at most once per minute keeps the cost amortised.
+        if now - self._pruned_at < min(60.0, self._forget_after):
+            return
+        self._pruned_at = now
+        cutoff = now - self._forget_after
+        old = [host for host, at in self._traced.items() if at <= cutoff]
+        for host in old:
+            del self._traced[host]
+            self._expired.add(host)
+        faded = [
+            prefix
+            for prefix in self._yields
+            if self._prefix_yield(prefix, now) < _YIELD_FLOOR
+        ]
+        for prefix in faded:
+            del self._yields[prefix]
+
+    def _next_seq(self) -> int:
+        self._seq += 1
+        return self._seq
+
+    def _prefix_yield(self, prefix: str, now: float) -> float:
+        value, updated = self._yields.get(prefix, (0.0, now))
+        if not value:
+            return 0.0
+        return value * 0.5 ** ((now - updated) / self.yield_half_life)
+
+    def score(self, host: str) -> float:
+        now = self._clock()
+        traced = self._traced.get(host)
+        if traced is not None:
+            novelty, age = 0.0, now - traced
+        elif host in self._expired:
+            novelty, age = 0.0, self._forget_after
+        else:
+            novelty, age = self.novelty_weight, _last_seen_age(self.graph, host)
+        staleness = 1.0 if age is None else min(1.0, age / self.staleness_horizon)
+        recent = self._prefix_yield(ip_prefix(host), now)
+        return novelty + staleness + recent / (1.0 + recent)
+
+    def record_yield(self, host: str, new_edges: int) -> None:
+        """Credit ``host``'s prefix with the edges its latest trace added."""
+
+        if new_edges <= 0:
+            return
+        prefix = ip_prefix(host)
+        now = self._clock()
+        self._yields[prefix] = (self._prefix_yield(prefix, now) + new_edges, now)
+
+    def wants_revisit(self, host: str) -> bool:
+        """Whether a rediscovered, already-seen ``host`` is worth queueing again."""
+
+        traced = self._traced.get(host)
+        if traced is None or self._clock() - traced >= self.revisit_after:
+            self.revisits += 1
+            return True
+        return False
+
+    def state(self) -> Dict[str, object]:
+        """Revisit and yield bookkeeping as clock-independent ages, for checkpoints."""
+
+        now = self._clock()
+        self._prune(now)
+        return {
+            "traced": {host: now - at for host, at in self._traced.items()},
+            "expired": list(self._expired),
+            "yields": {
+                prefix: self._prefix_yield(prefix, now) for prefix in self._yields
+            },
+            "revisits": self.revisits,
+        }
+
+    def restore(self, state: Dict[str, object], elapsed: float = 0.0) -> None:
+        """Reload :meth:`state`, aged by the ``elapsed`` seconds since it was taken."""
+
+        now = self._clock()
+        for host, age in dict(state.get("traced") or {}).items():
+            self._traced[host] = now - float(age) - elapsed
+        for host in state.get("expired") or ():
+            self._expired.add(host)
+        for prefix, value in dict(state.get("yields") or {}).items():
+            self._yields[prefix] = (float(value), now - elapsed)
+        self._pruned_at = -math.inf
+        self._prune(now)
+        self.revisits += int(state.get("revisits") or 0)
+
+    def stats(self) -> Dict[str, float]:
+        head = -self._queue[0][0] if self._queue and self._queue[0][2] else 0.0
+        return {
+            "queued": self.qsize(),
+            "novel": self._kinds["novel"],
+            "revisit": self._kinds["revisit"],
+            "prefixes": len(self._prefixes),
+            "traced": len(self._traced) + len(self._expired),
+            "revisits_planned": self.revisits,
+            "head_score": round(head, 3),
+        }
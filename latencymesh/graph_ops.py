@@ -1,32 +1,65 @@
 import math
 from datetime import datetime
-from typing import Dict, Tuple
+from typing import Dict, Iterable, List, Tuple
 
 import networkx as nx
 
 from .iptools import IPAddress, ip_angle
+from .profiling import profiled
 
 Hop = Tuple[IPAddress, float]
 Position = Dict[IPAddress, Tuple[float, float]]
 
 
-def add_trace(G: nx.Graph, hops: list[Hop]) -> None:
-    timestamp = datetime.utcnow().isoformat(timespec="seconds")
-    for i, (ip, rtt) in enumerate(hops):
-        if not G.has_node(ip):
+class Trace(list):
+    """Hop list that also records the TTL each hop answered at."""
+
+    def __init__(self, hops: Iterable[Hop] = (), ttls: Iterable[int] = ()):
+        super().__init__(hops)
+        self.ttls: List[int] = list(ttls)
+
+
+def _merge(G: nx.Graph, hops: list[Hop], timestamp: str) -> int:
+    # One lookup per hop and per link through the attribute dicts networkx
+    # hands out; new nodes and edges go through add_node / add_edge.
+    nodes = G.nodes
+    new_edges = 0
+    prev_ip = prev_rtt = None
+    for ip, rtt in hops:
+        node = nodes.get(ip)
+        if node is None:
             G.add_node(ip, rtt=rtt, last_seen=timestamp)
         else:
-            node = G.nodes[ip]
             node["rtt"] = min(node.get("rtt", rtt), rtt)
             node["last_seen"] = timestamp
-        if i > 0:
-            prev_ip, prev_rtt = hops[i - 1]
+        if prev_ip is not None:
             delta = max(rtt - prev_rtt, 0.1)
-            if not G.has_edge(prev_ip, ip):
+            edge = G.get_edge_data(prev_ip, ip)
+            if edge is None:
                 G.add_edge(prev_ip, ip, weight=delta)
+                new_edges += 1
             else:
-                edge = G[prev_ip][ip]
                 edge["weight"] = min(edge.get("weight", delta), delta)
+        prev_ip, prev_rtt = ip, rtt
+    return new_edges
+
+
+@profiled("add_trace")
+def add_trace(G: nx.Graph, hops: list[Hop]) -> int:
+    """Merge ``hops`` into ``G`` and return how many new edges they added."""
+
+    return _merge(G, hops, datetime.utcnow().isoformat(timespec="seconds"))
+
+
+@profiled("add_traces")
+def add_traces(G: nx.Graph, traces: Iterable[list[Hop]]) -> List[int]:
+    """Merge many traces in one pass; they share one ``last_seen`` timestamp.
+
+    Returns the number of new edges each trace added, in order.
+    """
+
+    timestamp = datetime.utcnow().isoformat(timespec="seconds")
+    return [_merge(G, hops, timestamp) for hops in traces]
 
 
 def compute_positions(G: nx.Graph) -> Position:
@@ -0,0 +1,51 @@
+"""Registry of traces in flight, so concurrent workers never duplicate one."""
+
+import asyncio
+from typing import Dict, Optional
+
+from .iptools import ip_prefix
+
+
+class InFlight:
+    """Destinations (or destination /24s) currently being traced.
+
+    The first worker to :meth:`claim` a key traces it and must
+    :meth:`release` it when done, whatever the outcome. Later claimants get
+    the leader's future back and wait on it instead of probing themselves; it
+    resolves to the host the leader traced.
+    """
+
+    def __init__(self, by_prefix: bool = False) -> None:
+        self.by_prefix = by_prefix
+        self._running: Dict[str, asyncio.Future] = {}
+        self.coalesced = 0
+        self.waits = 0
+
+    def _key(self, host: str) -> str:
+        return ip_prefix(host) if self.by_prefix else host
+
+    def claim(self, host: str) -> Optional[asyncio.Future]:
+        """Claim ``host``; return the running trace's future if already claimed."""
+
+        key = self._key(host)
+        running = self._running.get(key)
+        if running is not None:
+            self.waits += 1
+            return running
+        self._running[key] = asyncio.get_running_loop().create_future()
+        return None
+
+    def release(self, host: str) -> None:
+        future = self._running.pop(self._key(host), None)
+        if future is not None and not future.done():
+            future.set_result(host)
+
+    def __len__(self) -> int:
+        return len(self._running)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "in_flight": len(self._running),
+            "waits": self.waits,
+            "duplicates_avoided": self.coalesced,
+        }
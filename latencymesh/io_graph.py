@@ -4,6 +4,8 @@ from typing import Any, Dict
 
 import networkx as nx
 
+from .profiling import profiled
+
 
 def resolve_graph_path(path_or_base: str) -> str:
     path = os.path.expanduser(path_or_base)
@@ -16,17 +18,25 @@ def resolve_graph_path(path_or_base: str) -> str:
     return f"{path}.json"
 
 
-def load_graph(path_or_base: str) -> nx.Graph:
+def load_graph(path_or_base: str, compact: bool = False) -> nx.Graph:
+    """Load a saved graph; ``compact`` returns a read-only array-backed view."""
+
     path = resolve_graph_path(path_or_base)
     if os.path.exists(path):
         with open(path, encoding="utf-8") as f:
             data: Dict[str, Any] = json.load(f)
-        G = nx.node_link_graph(data)
+        if compact:
+            from .compact import CompactGraph
+
+            G = CompactGraph.from_node_link(data).view()
+        else:
+            G = nx.node_link_graph(data)
         print(f"[load] loaded {len(G)} nodes from previous session")
         return G
     return nx.Graph()
 
 
+@profiled("save_graph")
 def save_graph(G: nx.Graph, save_base: str) -> None:
     base = os.path.expanduser(save_base)
     if base.endswith(".json"):
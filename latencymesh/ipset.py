@@ -0,0 +1,200 @@
+"""Compact address sets for the scan's seen/pending bookkeeping."""
+
+import socket
+from array import array
+from bisect import bisect_left
+from collections.abc import MutableSet
+from typing import Dict, Iterable, Iterator, Optional, Set, Tuple, Union
+
+# Sorted 16-bit values are cheaper than a bitmap until a chunk holds this many.
+ARRAY_LIMIT = 4096
+# Bits kept inside a chunk and the array type holding them, per IP version.
+_LAYOUT = {4: (16, "H"), 6: (64, "Q")}
+
+
+class _Chunk:
+    """The low bits of every member sharing one high key (roaring container).
+
+    Chunks keep a sorted ``array``; 16-bit chunks switch to an 8 KiB bitmap
+    once they exceed :data:`ARRAY_LIMIT` members.
+    """
+
+    __slots__ = ("values", "bitmap", "count")
+
+    def __init__(self, typecode: str) -> None:
+        self.values: Optional[array] = array(typecode)
+        self.bitmap: Optional[bytearray] = None
+        self.count = 0
+
+    def __contains__(self, low: int) -> bool:
+        if self.bitmap is not None:
+            return bool(self.bitmap[low >> 3] & (1 << (low & 7)))
+        values = self.values
+        index = bisect_left(values, low)
+        return index < len(values) and values[index] == low
+
+    def add(self, low: int) -> bool:
+        if self.bitmap is not None:
+            byte, bit = low >> 3, 1 << (low & 7)
+            if self.bitmap[byte] & bit:
+                return False
+            self.bitmap[byte] |= bit
+        else:
+            values = self.values
+            index = bisect_left(values, low)
+            if index < len(values) and values[index] == low:
+                return False
+            values.insert(index, low)
+            if len(values) > ARRAY_LIMIT and values.typecode == "H":
+                self._to_bitmap()
+        self.count += 1
+        return True
+
+    def discard(self, low: int) -> bool:
+        if self.bitmap is not None:
+            byte, bit = low >> 3, 1 << (low & 7)
+            if not self.bitmap[byte] & bit:
+                return False
+            self.bitmap[byte] &= ~bit & 0xFF
+        else:
+            values = self.values
+            index = bisect_left(values, low)
+            if index >= len(values) or values[index] != low:
+                return False
+            del values[index]
+        self.count -= 1
+        return True
+
+    def _to_bitmap(self) -> None:
+        bitmap = bytearray(1 << 13)
+        for low in self.values:
+            bitmap[low >> 3] |= 1 << (low & 7)
+        self.bitmap, self.values = bitmap, None
+
+    def __iter__(self) -> Iterator[int]:
+        if self.bitmap is None:
+            yield from self.values
+            return
+        for byte_index, byte in enumerate(self.bitmap):
+            if byte:
+                for bit in range(8):
+                    if byte & (1 << bit):
+                        yield (byte_index << 3) | bit
+
+
+def _pack(value: str) -> Optional[Tuple[int, int]]:
+    """Return ``(version, integer)`` for an address string, else ``None``."""
+
+    if not isinstance(value, str):
+        return None
+    if ":" in value:
+        family, version = socket.AF_INET6, 6
+    else:
+        family, version = socket.AF_INET, 4
+    try:
+        return version, int.from_bytes(socket.inet_pton(family, value), "big")
+    except (OSError, ValueError):
+        return None
+
+
+def _unpack(version: int, value: int) -> str:
+    if version == 4:
+        return socket.inet_ntop(socket.AF_INET, value.to_bytes(4, "big"))
+    return socket.inet_ntop(socket.AF_INET6, value.to_bytes(16, "big"))
+
+
+class IPSet(MutableSet):
+    """Set of address strings stored as packed integers.
+
+    Each address is split into a high key (the /16 for IPv4, the /64 for IPv6)
+    and the remaining low bits. A key with one member stores that low value
+    directly; more members share a roaring-bitmap-style :class:`_Chunk`, so a
+    dense IPv4 /16 costs 8 KiB and addresses within one IPv6 /64 cost 8 bytes
+    each, instead of ~100 bytes per string. Strings that are not IP addresses
+    fall back to a plain set. Members come back in their canonical text form.
+    """
+
+    def __init__(self, items: Iterable[str] = ()) -> None:
+        self._chunks: Dict[int, Dict[int, Union[int, _Chunk]]] = {4: {}, 6: {}}
+        self._other: Set[str] = set()
+        self._len = 0
+        for item in items:
+            self.add(item)
+
+    def __contains__(self, item) -> bool:
+        packed = _pack(item)
+        if packed is None:
+            return item in self._other
+        version, value = packed
+        bits = _LAYOUT[version][0]
+        chunk = self._chunks[version].get(value >> bits)
+        if chunk is None:
+            return False
+        low = value & ((1 << bits) - 1)
+        if isinstance(chunk, int):
+            return chunk == low
+        return low in chunk
+
+    def add(self, item: str) -> None:
+        packed = _pack(item)
+        if packed is None:
+            if item not in self._other:
+                self._other.add(item)
+                self._len += 1
+            return
+        version, value = packed
+        bits, typecode = _LAYOUT[version]
+        high, low = value >> bits, value & ((1 << bits) - 1)
+        chunks = self._chunks[version]
+        chunk = chunks.get(high)
+        if chunk is None:
+            chunks[high] = low
+        elif isinstance(chunk, int):
+            if chunk == low:
+                return
+            grown = chunks[high] = _Chunk(typecode)
+            grown.add(chunk)
+            grown.add(low)
+        elif not chunk.add(low):
+            return
+        self._len += 1
+
+    def discard(self, item: str) -> None:
+        packed = _pack(item)
+        if packed is None:
+            if item in self._other:
+                self._other.discard(item)
+                self._len -= 1
+            return
+        version, value = packed
+        bits = _LAYOUT[version][0]
+        high, low = value >> bits, value & ((1 << bits) - 1)
+        chunks = self._chunks[version]
+        chunk = chunks.get(high)
+        if chunk is None:
+            return
+        if isinstance(chunk, int):
+            if chunk != low:
+                return
+            del chunks[high]
+        elif not chunk.discard(low):
+            return
+        elif not chunk.count:
+            del chunks[high]
+        self._len -= 1
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self) -> Iterator[str]:
+        for version, chunks in self._chunks.items():
+            bits = _LAYOUT[version][0]
+            for high in sorted(chunks):
+                chunk = chunks[high]
+                lows = (chunk,) if isinstance(chunk, int) else chunk
+                for low in lows:
+                    yield _unpack(version, (high << bits) | low)
+        yield from self._other
+
+    def __repr__(self) -> str:
+        return f"IPSet({len(self)} addresses)"
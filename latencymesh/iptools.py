@@ -1,5 +1,5 @@
-import hashlib, ipaddress, itertools, math, random
-from typing import Iterable, List, NewType, Optional, Union
+import hashlib, ipaddress, itertools, math, random, sys
+from typing import Iterable, Iterator, List, NewType, Optional, Tuple, Union
 
 IPAddress = NewType("IPAddress", str)
 
@@ -13,6 +13,15 @@ def ip_angle(ip: IPAddress) -> float:
     return (h % 10000) / 10000 * 2 * math.pi
 
 
+def ip_prefix(ip: str, v4_len: int = 24, v6_len: int = 48) -> str:
+    try:
+        address = ipaddress.ip_address(ip)
+    except ValueError:
+        return ip
+    length = v4_len if address.version == 4 else v6_len
+    return str(ipaddress.ip_network(f"{address}/{length}", strict=False))
+
+
 def generate_local_pool(
     seed_ips: List[str], prefix_len: int, max_per_seed: Optional[int]
 ) -> List[IPAddress]:
@@ -44,3 +53,138 @@ def generate_local_pool(
         # Support tests that monkeypatch random.shuffle with a simpler signature.
         random.shuffle(pool)
     return pool
+
+
+class _FeistelPermutation:
+    """Keyed bijection on ``range(size)`` built from a balanced Feistel network.
+
+    The network permutes the smallest even-width power-of-two domain covering
+    ``size``; values that land outside ``range(size)`` are re-encrypted until
+    they fall inside (cycle walking), which takes fewer than four rounds on
+    average.
+    """
+
+    def __init__(self, size: int, key: bytes, rounds: int = 4) -> None:
+        self.size = size
+        bits = max(2, (size - 1).bit_length())
+        self.half = (bits + 1) // 2
+        self.mask = (1 << self.half) - 1
+        self.key = key
+        self.rounds = rounds
+
+    def _round(self, index: int, value: int) -> int:
+        digest = hashlib.blake2b(
+            bytes([index]) + value.to_bytes(16, "big"), key=self.key, digest_size=8
+        ).digest()
+        return int.from_bytes(digest, "big") & self.mask
+
+    def _encrypt(self, value: int) -> int:
+        left, right = value >> self.half, value & self.mask
+        for index in range(self.rounds):
+            left, right = right, left ^ self._round(index, right)
+        return (left << self.half) | right
+
+    def __call__(self, index: int) -> int:
+        value = self._encrypt(index)
+        while value >= self.size:
+            value = self._encrypt(value)
+        return value
+
+
+class LocalPool:
+    """Lazy, deterministic target pool over the seed networks.
+
+    Each seed's ``/prefix_len`` network (capped to its first ``max_per_seed``
+    hosts) is walked in the order of a keyed permutation, and the seeds are
+    interleaved round-robin. Addresses are computed on demand, so even a /8 or
+    an IPv6 /64 costs nothing up front. ``cursor`` counts the addresses handed
+    out so far; a new pool built with ``offset=cursor`` resumes where the old
+    one stopped.
+    """
+
+    def __init__(
+        self,
+        seed_ips: List[str],
+        prefix_len: int,
+        max_per_seed: Optional[int],
+        offset: int = 0,
+    ) -> None:
+        self._networks: List[Tuple[int, int, type, _FeistelPermutation]] = []
+        seen = set()
+        for s in seed_ips:
+            try:
+                ip = ipaddress.ip_address(s)
+            except Exception:
+                continue
+            net = ipaddress.ip_network(f"{ip}/{prefix_len}", strict=False)
+            if net in seen:
+                continue
+            seen.add(net)
+            first, size = int(net.network_address), net.num_addresses
+            if size > 2:
+                # Mirror ``hosts()``: skip the network address, and for IPv4
+                # the broadcast address too.
+                first += 1
+                size -= 2 if net.version == 4 else 1
+            if max_per_seed is not None:
+                size = min(size, max_per_seed)
+            if size <= 0:
+                continue
+            key = hashlib.sha256(f"{net}|{max_per_seed}".encode("utf-8")).digest()
+            self._networks.append(
+                (
+                    first,
+                    size,
+                    type(net.network_address),
+                    _FeistelPermutation(size, key),
+                )
+            )
+        self.cursor = max(0, int(offset))
+
+    @property
+    def total(self) -> int:
+        return sum(size for _, size, _, _ in self._networks)
+
+    def __len__(self) -> int:
+        # ``len()`` must fit in a machine word; IPv6 pools may not.
+        return min(self.total, sys.maxsize)
+
+    def __bool__(self) -> bool:
+        return bool(self._networks)
+
+    def _consumed(self, rounds: int) -> int:
+        return sum(min(size, rounds) for _, size, _, _ in self._networks)
+
+    def _address(self, seed: int, index: int) -> IPAddress:
+        first, _, address_type, permutation = self._networks[seed]
+        return IPAddress(str(address_type(first + permutation(index))))
+
+    def __iter__(self) -> Iterator[IPAddress]:
+        if self.cursor >= self.total:
+            return
+        # Find the round-robin round the cursor falls in.
+        low, high = 0, max(size for _, size, _, _ in self._networks)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self._consumed(middle) <= self.cursor:
+                low = middle
+            else:
+                high = middle - 1
+        current = low
+        skip = self.cursor - self._consumed(current)
+        order = [
+            seed
+            for seed, (_, size, _, _) in enumerate(self._networks)
+            if size > current
+        ]
+        for seed in order[skip:]:
+            self.cursor += 1
+            yield self._address(seed, current)
+        while True:
+            current += 1
+            order = [seed for seed in order if self._networks[seed][1] > current]
+            if not order:
+                return
+            for seed in order:
+                self.cursor += 1
+                yield self._address(seed, current)
@@ -2,10 +2,13 @@ import asyncio
 from asyncio import QueueEmpty, QueueFull
 import csv
 import inspect
+import itertools
+import json
 import os
 import signal
 import sys
-from datetime import datetime
+import time
+from datetime import datetime, timedelta
 from functools import partial
 from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
 from typing import Iterable, List, Optional
@@ -14,18 +17,51 @@ import matplotlib.pyplot as plt
 import networkx as nx
 import uvicorn
 
+from .agent import run_agent
+from .autoscale import AIMDController, WorkerPool, autoscale_workers
+from .checkpoint import (
+    ScanCheckpoint,
+    checkpoint_loop,
+    load_checkpoint,
+    pool_fingerprint,
+)
 from .cli import DEFAULT_SEEDS, parse_args
+from .collector import Collector, Coordinator
 from .durations import parse_duration
+from .frontier import Frontier
+from .inflight import InFlight
 from .io_graph import load_graph, resolve_graph_path, save_graph
-from .iptools import generate_local_pool
+from .ipset import IPSet
+from .iptools import LocalPool
 from .logging_async import get_logger, log_worker
+from .loops import LoopLagMonitor, run
+from .metrics import ScanMetrics, serve_metrics
+from .pathcache import PathCache
+from .probe import create_prober
+from .profiling import finish_profile, start_profile
+from .ratelimit import ProbeLimiter
+from .refresh import RefreshScheduler, refresh_loop
+from .rto import AdaptiveTimeouts
+from .shard import scan_sharded
+from .stopsets import StopSets
 from .traceroute import traceroute_worker
+from .ttl_window import TTLWindows
 from .ui import ui_manager
 from .viz import draw_map
 from .webapp import GraphBroadcast, create_app
-
-
-async def scan_async(params, graph=None, update_queue=None, graph_lock=None):
+from .writer import GraphWriter
+
+
+async def scan_async(
+    params,
+    graph=None,
+    update_queue=None,
+    graph_lock=None,
+    scan_stats=None,
+    link=None,
+    metrics=None,
+    writer=None,
+):
     seeds = list(params.seeds or [])
     if params.extra_seeds:
         seeds.extend(params.extra_seeds)
@@ -33,7 +69,33 @@ async def scan_async(params, graph=None, update_queue=None, graph_lock=None):
     if not hasattr(params, "layout"):
         params.layout = "radial"
 
-    pool = generate_local_pool(params.seeds, params.prefix, params.max_per_seed or None)
+    fingerprint = pool_fingerprint(params.seeds, params.prefix, params.max_per_seed)
+    pool_offset = getattr(params, "pool_offset", None) or 0
+    resume_state = None
+    if getattr(params, "resume", False) and link is None:
+        try:
+            resume_state = load_checkpoint(params.save_base)
+        except (OSError, ValueError) as exc:
+            print(f"[error] cannot resume: {exc}")
+            return
+        if resume_state is None:
+            print("[resume] no checkpoint found; starting from the beginning")
+        else:
+            saved_pool = dict(resume_state.get("pool") or {})
+            pool_offset = saved_pool.pop("cursor", 0)
+            if saved_pool != fingerprint:
+                print(
+                    "[error] the checkpoint was written for other seeds/prefix; "
+                    "run without --resume to start over"
+                )
+                return
+
+    pool = LocalPool(
+        params.seeds,
+        params.prefix,
+        params.max_per_seed or None,
+        offset=pool_offset,
+    )
     if not pool:
         print("[error] no addresses in pool; check seeds/prefix")
         return
@@ -42,6 +104,8 @@ async def scan_async(params, graph=None, update_queue=None, graph_lock=None):
     stop_event = asyncio.Event()
     log_task = asyncio.create_task(log_worker(log_queue, stop_event))
     logger = get_logger(log_queue)
+    # Under `lm serve` the server already started the profiler.
+    profiler = start_profile(params)
 
     G = graph if graph is not None else load_graph(params.save_base)
     graph_lock = graph_lock or asyncio.Lock()
@@ -51,12 +115,30 @@ async def scan_async(params, graph=None, update_queue=None, graph_lock=None):
     if not params.no_display:
         _, ax = plt.subplots(figsize=(8, 8))
 
-    queue = asyncio.Queue()
-    seen_ips, pending_ips = set(G.nodes()), set()
+    queue = Frontier(G)
+    seen_ips, pending_ips = IPSet(G.nodes()), IPSet()
+    if link is not None:
+        link.attach(queue, seen_ips, pending_ips, stop_event)
+    if resume_state is not None:
+        elapsed = max(0.0, time.time() - resume_state.get("saved_at", time.time()))
+        queue.restore(resume_state.get("frontier") or {}, elapsed)
+        for ip in resume_state.get("pending") or ():
+            if ip not in pending_ips:
+                pending_ips.add(ip)
+                queue.put_nowait(ip)
+        print(
+            f"[resume] pool position {pool_offset}, "
+            f"{len(pending_ips)} unfinished targets re-queued"
+        )
 
-    for ip in pool:
-        await queue.put(ip)
-        pending_ips.add(ip)
+    # Targets are drawn lazily: fill one window now, top it up as it drains.
+    pool_window = max(1, getattr(params, "pool_window", None) or 1024)
+    targets = link.targets(pool) if link is not None else iter(pool)
+    if not hasattr(targets, "__anext__"):
+        for ip in itertools.islice(targets, pool_window):
+            if ip not in pending_ips:
+                queue.put_nowait(ip)
+                pending_ips.add(ip)
 
     success_counter, counter_lock = {"since_last_draw": 0, "total": 0}, asyncio.Lock()
 
@@ -65,17 +147,156 @@ async def scan_async(params, graph=None, update_queue=None, graph_lock=None):
     except (TypeError, ValueError):  # pragma: no cover - defensive fallback
         worker_signature = None
 
+    scan_stats = scan_stats if scan_stats is not None else {}
+    scan_stats["frontier"] = queue.stats
+    if hasattr(pool, "cursor"):
+        scan_stats["pool"] = lambda: {"cursor": pool.cursor, "size": pool.total}
+    stop_sets = None
+    if getattr(params, "stop_sets", False):
+        stop_sets = StopSets(getattr(params, "start_ttl", 5))
+    limiter = None
+    if getattr(params, "probe_rate", None):
+        limiter = ProbeLimiter(
+            params.probe_rate,
+            getattr(params, "probe_burst", None),
+            getattr(params, "prefix_rate", None),
+            getattr(params, "prefix_burst", None),
+        )
+        scan_stats["rate_limit"] = limiter.stats
+    timeouts = None
+    if getattr(params, "adaptive_timeout", False):
+        timeouts = AdaptiveTimeouts(
+            getattr(params, "min_timeout", None) or 0.05, params.timeout
+        )
+        scan_stats["timeouts"] = timeouts.stats
+    prober_name = getattr(params, "prober", "subprocess")
+    network = None
+    if prober_name == "simulate":
+        from .simulate import simulated_network
+
+        network = simulated_network(params)
+    prober = await create_prober(
+        prober_name,
+        logger,
+        window=getattr(params, "probe_window", None),
+        stop_sets=stop_sets,
+        limiter=limiter,
+        timeouts=timeouts,
+        network=network,
+        time_scale=getattr(params, "sim_time_scale", 1.0),
+    )
+    scan_stats["probes"] = prober.stats
+    ttl_windows = None
+    if getattr(params, "adaptive_ttl", False):
+        ttl_windows = TTLWindows(margin=getattr(params, "ttl_margin", 2))
+        scan_stats["ttl_windows"] = ttl_windows.stats
+
+    refresh = None
+    refresh_value = getattr(params, "refresh", None)
+    if isinstance(refresh_value, str) and refresh_value:
+        refresh_value = parse_duration(refresh_value)
+    if refresh_value is not None and refresh_value.total_seconds() > 0:
+        refresh_min = getattr(params, "refresh_min", None)
+        if isinstance(refresh_min, str) and refresh_min:
+            refresh_min = parse_duration(refresh_min)
+        if isinstance(refresh_min, timedelta):
+            refresh_min = refresh_min.total_seconds()
+        refresh = RefreshScheduler(
+            refresh_value.total_seconds(),
+            refresh_min,
+            owns=link.owns if link is not None else None,
+        )
+        refresh.load(G)
+        if resume_state is not None and resume_state.get("refresh"):
+            refresh.restore(resume_state["refresh"])
+        scan_stats["refresh"] = refresh.stats
+
+    path_cache = None
+    cache_ttl = getattr(params, "path_cache", None)
+    if isinstance(cache_ttl, str) and cache_ttl:
+        cache_ttl = parse_duration(cache_ttl)
+    if cache_ttl is not None and cache_ttl.total_seconds() > 0:
+        path_cache = PathCache(
+            cache_ttl.total_seconds(),
+            by_prefix=getattr(params, "path_cache_prefix", False),
+            mode=getattr(params, "path_cache_mode", None) or "check",
+        )
+        scan_stats["path_cache"] = path_cache.stats
+
+    inflight = InFlight(by_prefix=getattr(params, "coalesce_prefix", False))
+    scan_stats["inflight"] = inflight.stats
+
+    metrics = metrics if metrics is not None else ScanMetrics()
+    metrics.bind(graph=G, queue=queue, pending=pending_ips, prober=prober)
+
+    # Under `lm serve` the server owns the writer and shares it with readers.
+    owns_writer = writer is None
+    if owns_writer:
+        writer = _graph_writer(G, params, metrics)
+    scan_stats["writer"] = writer.stats
+
+    metrics_server = None
+    metrics_port = getattr(params, "metrics_port", None)
+    if metrics_port:
+        metrics_host = getattr(params, "metrics_host", None) or "127.0.0.1"
+        try:
+            metrics_server = await serve_metrics(
+                metrics, metrics_host, metrics_port, scan_stats
+            )
+        except OSError as exc:
+            logger.warning(f"[metrics] cannot listen on port {metrics_port}: {exc}")
+        else:
+            logger.info(
+                f"[metrics] serving http://{metrics_host}:{metrics_port}/metrics"
+            )
+
+    checkpoint = None
+    checkpoint_interval = getattr(params, "checkpoint_interval", None)
+    if link is None and checkpoint_interval and checkpoint_interval > 0:
+        checkpoint = ScanCheckpoint(
+            params.save_base,
+            fingerprint,
+            pool,
+            queue,
+            pending_ips,
+            refresh,
+            graph=G,
+            graph_lock=graph_lock,
+            writer=writer,
+        )
+        scan_stats["checkpoint"] = checkpoint.stats
+
+    optional_worker_kwargs = {
+        "graph_lock": graph_lock,
+        "update_queue": update_queue,
+        "prober": prober,
+        "ttl_windows": ttl_windows,
+        "scan_stats": scan_stats,
+        "refresh": refresh,
+        "path_cache": path_cache,
+        "inflight": inflight,
+        "metrics": metrics,
+        "writer": writer,
+    }
+    if link is not None:
+        optional_worker_kwargs["owns"] = link.owns
+        optional_worker_kwargs["trace_sink"] = link.send_trace
     worker_kwargs = {}
     if worker_signature:
-        if "graph_lock" in worker_signature.parameters:
-            worker_kwargs["graph_lock"] = graph_lock
-        if "update_queue" in worker_signature.parameters:
-            worker_kwargs["update_queue"] = update_queue
-
-    workers = [
-        asyncio.create_task(
+        worker_kwargs = {
+            name: value
+            for name, value in optional_worker_kwargs.items()
+            if name in worker_signature.parameters
+        }
+    graceful = bool(worker_signature and "retire_event" in worker_signature.parameters)
+
+    def spawn_worker(worker_id, retire_event):
+        kwargs = dict(worker_kwargs)
+        if graceful:
+            kwargs["retire_event"] = retire_event
+        return asyncio.create_task(
             traceroute_worker(
-                i,
+                worker_id,
                 G,
                 queue,
                 params,
@@ -85,11 +306,50 @@ async def scan_async(params, graph=None, update_queue=None, graph_lock=None):
                 success_counter,
                 counter_lock,
                 logger,
-                **worker_kwargs,
+                **kwargs,
             )
         )
-        for i in range(params.workers)
-    ]
+
+    workers = WorkerPool(spawn_worker, graceful=graceful)
+    autoscale_task = None
+    if getattr(params, "autoscale", False):
+        controller = AIMDController(
+            getattr(params, "min_workers", None) or 1,
+            getattr(params, "max_workers", None) or max(params.workers, 1) * 4,
+            initial=params.workers,
+        )
+        workers.resize(controller.target)
+        autoscale_task = asyncio.create_task(
+            autoscale_workers(
+                workers,
+                controller,
+                scan_stats,
+                stop_event,
+                interval=getattr(params, "autoscale_interval", None) or 5.0,
+                logger=logger,
+            )
+        )
+    else:
+        workers.resize(params.workers)
+    scan_stats["workers"] = lambda: workers.size
+    lag_task = None
+    if "loop" not in scan_stats:
+        lag_monitor = LoopLagMonitor()
+        scan_stats["loop"] = lag_monitor.stats
+        lag_task = lag_monitor.start()
+    feeder_task = asyncio.create_task(
+        _feed_pool(targets, queue, pending_ips, stop_event, pool_window)
+    )
+    refresh_task = None
+    if refresh is not None:
+        refresh_task = asyncio.create_task(
+            refresh_loop(refresh, queue, pending_ips, stop_event)
+        )
+    checkpoint_task = None
+    if checkpoint is not None:
+        checkpoint_task = asyncio.create_task(
+            checkpoint_loop(checkpoint, stop_event, checkpoint_interval, logger)
+        )
     ui_task = None
     if not params.no_display:
         try:
@@ -99,6 +359,8 @@ async def scan_async(params, graph=None, update_queue=None, graph_lock=None):
         ui_kwargs = {}
         if ui_signature and "graph_lock" in ui_signature.parameters:
             ui_kwargs["graph_lock"] = graph_lock
+        if ui_signature and "writer" in ui_signature.parameters:
+            ui_kwargs["writer"] = writer
         ui_task = asyncio.create_task(
             ui_manager(
                 G,
@@ -151,7 +413,9 @@ async def scan_async(params, graph=None, update_queue=None, graph_lock=None):
                 continue
 
     logger.info(
-        f"[start] mapping local neighborhood — {params.workers} workers, prefix /{params.prefix}"
+        f"[start] mapping local neighborhood — {workers.size} workers"
+        f"{' (autoscaled)' if autoscale_task else ''}, "
+        f"prefix /{params.prefix}, {prober.name} prober"
     )
 
     try:
@@ -167,24 +431,67 @@ async def scan_async(params, graph=None, update_queue=None, graph_lock=None):
                 signal.signal(sig, previous)
             except (ValueError, AttributeError):
                 pass
-        tasks = [*workers]
-        if ui_task:
-            tasks.append(ui_task)
+        tasks = [*workers.tasks, feeder_task]
+        if lag_task:
+            tasks.append(lag_task)
+        if autoscale_task:
+            tasks.append(autoscale_task)
+        if refresh_task:
+            tasks.append(refresh_task)
+        if checkpoint_task:
+            tasks.append(checkpoint_task)
         for t in tasks:
             t.cancel()
         if tasks:
             await asyncio.gather(*tasks, return_exceptions=True)
-        try:
-            async with graph_lock:
+        await prober.close()
+        # Traces of cancelled workers are still waiting in the writer's inbox.
+        if owns_writer:
+            await writer.close()
+        else:
+            await writer.sync()
+        if ui_task:
+            # Stopped only now, so its final draw sees the drained writer.
+            ui_task.cancel()
+            await asyncio.gather(ui_task, return_exceptions=True)
+        if metrics_server is not None:
+            metrics_server.close()
+        if lag_task:
+            lag = lag_monitor.stats()
+            logger.info(
+                f"[loop] {lag['loop']} lag p50={lag['p50_ms']}ms "
+                f"p99={lag['p99_ms']}ms max={lag['max_ms']}ms"
+            )
+        probe_stats = prober.stats()
+        if probe_stats:
+            summary = ", ".join(f"{key}={value}" for key, value in probe_stats.items())
+            logger.info(f"[stats] {summary}")
+        if link is not None:
+            # Whoever is at the other end of the link owns and saves the graph.
+            await link.close()
+        else:
+            try:
+                async with graph_lock:
+                    with metrics.save_seconds.time():
+                        save_graph(G, params.save_base)
+            except RuntimeError:
+                # If the event loop is closing, fall back to an unlocked save
                 save_graph(G, params.save_base)
-        except RuntimeError:
-            # If the event loop is closing, fall back to an unlocked save
-            save_graph(G, params.save_base)
+            if checkpoint is not None:
+                try:
+                    checkpoint.save_now()
+                except OSError as exc:
+                    logger.warning(f"[checkpoint] save failed: {exc}")
         if ax:
             plt.ioff()
             plt.close("all")
+        finish_profile(profiler, params.save_base)
         stop_event.set()
-        await log_queue.join()
+        # Another scan in this process (e.g. a second agent) may log into this
+        # queue after the worker has exited, so stop waiting when it does.
+        drained = asyncio.ensure_future(log_queue.join())
+        await asyncio.wait({drained, log_task}, return_when=asyncio.FIRST_COMPLETED)
+        drained.cancel()
         log_task.cancel()
         if update_queue is not None:
             sentinel = {"type": "shutdown"}
@@ -202,6 +509,38 @@ async def scan_async(params, graph=None, update_queue=None, graph_lock=None):
         print("[exit] done.")
 
 
+async def _iterate_async(iterable):
+    for item in iterable:
+        yield item
+
+
+async def _feed_pool(targets, queue, pending_ips, stop_event, window):
+    """Move targets into ``queue`` whenever it holds fewer than ``window``.
+
+    ``targets`` may be a plain or an asynchronous iterator.
+    """
+
+    if not hasattr(targets, "__anext__"):
+        targets = _iterate_async(targets)
+    async for ip in targets:
+        if ip in pending_ips:
+            continue
+        # Pending from the moment it is drawn, so checkpoints never lose a
+        # target the pool cursor already counts.
+        pending_ips.add(ip)
+        while queue.qsize() >= window:
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=0.05)
+                return
+            except asyncio.TimeoutError:
+                continue
+        if stop_event.is_set():
+            return
+        queue.put_nowait(ip)
+        # Yield so computing addresses never starves the workers.
+        await asyncio.sleep(0)
+
+
 async def _forward_graph_updates(
     update_queue: asyncio.Queue, broadcast: GraphBroadcast
 ):
@@ -216,6 +555,15 @@ async def _forward_graph_updates(
         raise
 
 
+def _graph_writer(G, params, metrics=None) -> GraphWriter:
+    return GraphWriter(
+        G,
+        max_batch=getattr(params, "ingest_batch", None) or 32,
+        max_delay=getattr(params, "ingest_delay", None) or 0.0,
+        metrics=metrics,
+    )
+
+
 async def serve_async(params):
     params.no_display = True
     host = getattr(params, "host", "0.0.0.0")
@@ -225,22 +573,77 @@ async def serve_async(params):
     graph_lock = asyncio.Lock()
     update_queue: asyncio.Queue = asyncio.Queue(maxsize=1)
     broadcast = GraphBroadcast()
-
-    app = create_app(G, graph_lock, broadcast)
-    config = uvicorn.Config(app, host=host, port=port, loop="asyncio", log_level="info")
+    scan_stats: dict = {}
+    metrics = ScanMetrics()
+    metrics.bind(graph=G)
+    writer = _graph_writer(G, params, metrics)
+    scan_stats["writer"] = writer.stats
+
+    collector = coordinator = None
+    if getattr(params, "collect", False):
+        # Hub mode: agents scan and report; no local scan.
+        collector = Collector(G, graph_lock, broadcast.notify, writer=writer)
+        seeds = list(params.seeds or []) + list(params.extra_seeds or [])
+        coordinator = Coordinator(
+            seeds or DEFAULT_SEEDS,
+            params.prefix,
+            params.max_per_seed or None,
+            lease_size=getattr(params, "lease_size", None) or 256,
+        )
+        scan_stats["collector"] = collector.stats
+        scan_stats["coordinator"] = coordinator.stats
+
+    app = create_app(
+        G,
+        graph_lock,
+        broadcast,
+        scan_stats,
+        collector,
+        coordinator,
+        metrics,
+        writer=writer,
+    )
+    # The server runs on whichever loop --loop selected; uvicorn must not pick one.
+    config = uvicorn.Config(app, host=host, port=port, loop="none", log_level="info")
     server = uvicorn.Server(config)
 
+    profiler = start_profile(params)
     forwarder = asyncio.create_task(_forward_graph_updates(update_queue, broadcast))
-    scan_task = asyncio.create_task(
-        scan_async(params, graph=G, update_queue=update_queue, graph_lock=graph_lock)
-    )
+    lag_monitor = LoopLagMonitor()
+    scan_stats["loop"] = lag_monitor.stats
+    lag_task = lag_monitor.start()
+    scan_task = None
+    if collector is None:
+        scan_kwargs = {}
+        if getattr(params, "processes", 1) > 1:
+            scan = scan_sharded
+        else:
+            scan, scan_kwargs = scan_async, {"metrics": metrics}
+        scan_task = asyncio.create_task(
+            scan(
+                params,
+                graph=G,
+                update_queue=update_queue,
+                graph_lock=graph_lock,
+                scan_stats=scan_stats,
+                writer=writer,
+                **scan_kwargs,
+            )
+        )
 
     try:
         await server.serve()
     finally:
-        if not scan_task.done():
-            scan_task.cancel()
-        await asyncio.gather(scan_task, return_exceptions=True)
+        if scan_task is None:
+            await writer.close()
+            async with graph_lock:
+                with metrics.save_seconds.time():
+                    save_graph(G, params.save_base)
+        else:
+            if not scan_task.done():
+                scan_task.cancel()
+            await asyncio.gather(scan_task, return_exceptions=True)
+            await writer.close()
         sentinel = {"type": "shutdown"}
         try:
             update_queue.put_nowait(sentinel)
@@ -254,6 +657,9 @@ async def serve_async(params):
             except QueueFull:
                 pass
         await forwarder
+        lag_task.cancel()
+        await asyncio.gather(lag_task, return_exceptions=True)
+        finish_profile(profiler, params.save_base)
 
 
 def serve_directory(directory: str, port: int) -> None:
@@ -270,24 +676,28 @@ def serve_directory(directory: str, port: int) -> None:
         httpd.server_close()
 
 
-def render_graph(graph_path: str, layout: str, output: Optional[str]) -> str:
+def render_graph(
+    graph_path: str, layout: str, output: Optional[str], compact: bool = False
+) -> str:
     resolved = resolve_graph_path(graph_path)
     if not os.path.exists(resolved):
         raise FileNotFoundError(f"Graph not found: {graph_path}")
     base, _ = os.path.splitext(resolved)
-    G = load_graph(resolved)
+    G = load_graph(resolved, compact=compact)
     target = output or f"{base}_{layout}.svg"
     draw_map(G, base, None, layout=layout, output_path=target)
     plt.close("all")
     return target
 
 
-def export_graph(graph_path: str, fmt: str, output: Optional[str]) -> str:
+def export_graph(
+    graph_path: str, fmt: str, output: Optional[str], compact: bool = False
+) -> str:
     resolved = resolve_graph_path(graph_path)
     if not os.path.exists(resolved):
         raise FileNotFoundError(f"Graph not found: {graph_path}")
     base, _ = os.path.splitext(resolved)
-    G = load_graph(resolved)
+    G = load_graph(resolved, compact=compact)
 
     if fmt == "gexf":
         target = output or f"{base}.gexf"
@@ -304,11 +714,11 @@ def export_graph(graph_path: str, fmt: str, output: Optional[str]) -> str:
     return target
 
 
-def graph_stats(graph_path: str) -> dict:
+def graph_stats(graph_path: str, compact: bool = False) -> dict:
     resolved = resolve_graph_path(graph_path)
     if not os.path.exists(resolved):
         raise FileNotFoundError(f"Graph not found: {graph_path}")
-    G = load_graph(resolved)
+    G = load_graph(resolved, compact=compact)
     num_nodes = G.number_of_nodes()
     num_edges = G.number_of_edges()
     components = nx.number_connected_components(G) if num_nodes else 0
@@ -427,6 +837,56 @@ def detect_default_gateway() -> Optional[str]:
     return None
 
 
+def run_bench(params) -> int:
+    """``lm bench``: run, report, and compare.
+
+    Returns 1 if anything regressed and 2 if the baseline cannot be read.
+    """
+
+    # Only ``lm bench`` pays for importing the benchmark fixtures.
+    from .bench import compare, load_results, run_benchmarks
+
+    baseline = None
+    if params.baseline:
+        try:
+            baseline = load_results(params.baseline)
+        except (OSError, ValueError) as exc:
+            print(f"[error] cannot use baseline: {exc}", file=sys.stderr)
+            return 2
+    results = run_benchmarks(
+        params.nodes,
+        params.only,
+        repeat=params.repeat,
+        traces=params.traces,
+        seed=params.seed,
+        progress=lambda name: print(f"[bench] {name}", file=sys.stderr),
+    )
+    regressed = []
+    if baseline is not None:
+        results["baseline"] = params.baseline
+        results["comparison"] = compare(results, baseline, params.threshold)
+        regressed = [
+            key for key, change in results["comparison"].items() if change["regressed"]
+        ]
+    if params.output:
+        with open(os.path.expanduser(params.output), "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        for key, result in results["results"].items():
+            change = results.get("comparison", {}).get(key)
+            delta = f"  p50 {change['p50_change']:+.1%}" if change else ""
+            print(
+                f"{key:>28}: {result['throughput']:>12,.1f} {result['unit']}/s  "
+                f"p50 {result['p50_ms']:.3f}ms  p99 {result['p99_ms']:.3f}ms  "
+                f"peak {result['peak_kib']:,.0f} KiB{delta}"
+            )
+        print(f"[bench] wrote {params.output}")
+    else:
+        print(json.dumps(results, indent=2))
+    for key in regressed:
+        print(f"[bench] regression: {key}", file=sys.stderr)
+    return 1 if regressed else 0
+
+
 def auto_seeds() -> List[str]:
     seeds = []
     gw = detect_default_gateway()
@@ -442,18 +902,34 @@ def main(argv: Optional[List[str]] = None):
     params = parse_args(argv or sys.argv[1:])
     try:
         if params.command == "scan":
+            scan = scan_sharded if getattr(params, "processes", 1) > 1 else scan_async
             try:
-                asyncio.run(scan_async(params))
+                run(scan(params), getattr(params, "loop", None))
             except KeyboardInterrupt:
                 print("\n[interrupt] exiting…")
+        elif params.command == "agent":
+            try:
+                run(run_agent(params), getattr(params, "loop", None))
+            except KeyboardInterrupt:
+                print("\n[interrupt] agent exiting…")
         elif params.command == "show":
-            target = render_graph(params.graph, params.layout, params.output)
+            target = render_graph(
+                params.graph,
+                params.layout,
+                params.output,
+                compact=getattr(params, "compact", False),
+            )
             print(f"[show] wrote {target}")
         elif params.command == "export":
-            target = export_graph(params.graph, params.format, params.output)
+            target = export_graph(
+                params.graph,
+                params.format,
+                params.output,
+                compact=getattr(params, "compact", False),
+            )
             print(f"[export] wrote {target}")
         elif params.command == "stats":
-            stats = graph_stats(params.graph)
+            stats = graph_stats(params.graph, compact=getattr(params, "compact", False))
             for key, value in stats.items():
                 display = f"{value:.2f}" if isinstance(value, float) else value
                 print(f"{key:>12}: {display}")
@@ -475,6 +951,8 @@ def main(argv: Optional[List[str]] = None):
                 if seed not in seen:
                     print(seed)
                     seen.add(seed)
+        elif params.command == "bench":
+            sys.exit(run_bench(params))
         elif params.command == "serve":
             legacy_directory = getattr(params, "directory", None)
             if legacy_directory is None:
@@ -483,7 +961,7 @@ def main(argv: Optional[List[str]] = None):
                 serve_directory(legacy_directory, params.port)
             else:
                 try:
-                    asyncio.run(serve_async(params))
+                    run(serve_async(params), getattr(params, "loop", None))
                 except KeyboardInterrupt:
                     print("\n[interrupt] server exiting…")
         else:
@@ -0,0 +1,256 @@
+"""Prometheus text-format metrics for the scan pipeline.
+
+Instruments are plain attribute updates on the event-loop thread, cheap
+enough to stay on in every scan; nothing is formatted until someone reads
+``/metrics``. Rates such as traces per second are left to the scraper:
+``rate(latencymesh_traces_total[1m])``.
+"""
+
+import asyncio
+import re
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# Seconds, from sub-millisecond lock waits to multi-second traces and saves.
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+
+Sample = Tuple[str, Dict[str, str], float]
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    inner = ",".join(f'{key}="{value}"' for key, value in labels.items())
+    return "{" + inner + "}"
+
+
+class Counter:
+    """Monotonic total; ``function`` reads it from an existing counter instead."""
+
+    kind = "counter"
+
+    def __init__(
+        self, name: str, help: str, function: Optional[Callable[[], float]] = None
+    ) -> None:
+        self.name = name
+        self.help = help
+        self.function = function
+        self._value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._value += amount
+
+    @property
+    def value(self) -> float:
+        if self.function is not None:
+            return float(self.function() or 0)
+        return self._value
+
+    def samples(self) -> List[Sample]:
+        return [(self.name, {}, self.value)]
+
+
+class Gauge(Counter):
+    """Value that goes up and down, or is read from ``function`` when scraped."""
+
+    kind = "gauge"
+
+    def set(self, value: float) -> None:
+        self._value = value
+
+    def dec(self, amount: float = 1.0) -> None:
+        self._value -= amount
+
+
+class Histogram:
+    """Cumulative-bucket histogram of durations in seconds."""
+
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, help: str, buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> None:
+        self.name = name
+        self.help = help
+        self.bounds = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    def samples(self) -> List[Sample]:
+        samples: List[Sample] = []
+        cumulative = 0
+        for bound, count in zip((*self.bounds, float("inf")), self.counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else _format_value(bound)
+            samples.append((f"{self.name}_bucket", {"le": le}, cumulative))
+        samples.append((f"{self.name}_sum", {}, self.sum))
+        samples.append((f"{self.name}_count", {}, self.count))
+        return samples
+
+
+def _stats_samples(prefix: str, stats: Dict[str, Any]) -> List[Tuple[str, float]]:
+    """Numeric leaves of a ``scan_stats`` dict as ``(name, value)`` pairs."""
+
+    samples = []
+    for key, value in stats.items():
+        if callable(value):
+            value = value()
+        name = re.sub(r"[^a-zA-Z0-9_]", "_", f"{prefix}_{key}")
+        if isinstance(value, dict):
+            samples.extend(_stats_samples(name, value))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            samples.append((name, float(value)))
+    return samples
+
+
+class ScanMetrics:
+    """The scan pipeline's instruments and their text exposition."""
+
+    def __init__(self) -> None:
+        self.traces = Counter(
+            "latencymesh_traces_total", "Traces that returned at least one hop."
+        )
+        self.empty_traces = Counter(
+            "latencymesh_empty_traces_total", "Traces that returned no hops."
+        )
+        # Named like the scan_stats keys, so workers count both the same way.
+        self.errors = Counter(
+            "latencymesh_trace_errors_total", "Traces that raised an error."
+        )
+        self.probes = Counter(
+            "latencymesh_probes_total", "Probes sent by the prober.", lambda: 0
+        )
+        self.trace_seconds = Histogram(
+            "latencymesh_trace_duration_seconds", "Time to trace one destination."
+        )
+        self.lock_wait = Histogram(
+            "latencymesh_graph_lock_wait_seconds", "Time spent waiting for the graph."
+        )
+        self.write_seconds = Histogram(
+            "latencymesh_graph_write_seconds",
+            "Time the graph writer spent applying one batch.",
+        )
+        self.snapshot_seconds = Histogram(
+            "latencymesh_snapshot_seconds",
+            "Time to copy the graph out and serialize it as JSON.",
+        )
+        self.save_seconds = Histogram(
+            "latencymesh_save_duration_seconds", "Time to write the graph to disk."
+        )
+        self.queue_depth = Gauge(
+            "latencymesh_queue_depth", "Targets waiting in the frontier.", lambda: 0
+        )
+        self.pending = Gauge(
+            "latencymesh_pending_targets",
+            "Targets queued or being traced.",
+            lambda: 0,
+        )
+        self.sse_clients = Gauge(
+            "latencymesh_sse_clients", "Connected /api/stream subscribers."
+        )
+        self.nodes = Gauge("latencymesh_graph_nodes", "Nodes in the graph.", lambda: 0)
+        self.edges = Gauge("latencymesh_graph_edges", "Edges in the graph.", lambda: 0)
+
+    @property
+    def instruments(self) -> List[Any]:
+        return [value for value in vars(self).values() if hasattr(value, "samples")]
+
+    def bind(self, *, graph=None, queue=None, pending=None, prober=None) -> None:
+        """Read the gauges and the probe counter from live scan objects."""
+
+        if graph is not None:
+            self.nodes.function = graph.number_of_nodes
+            self.edges.function = graph.number_of_edges
+        if queue is not None:
+            self.queue_depth.function = queue.qsize
+        if pending is not None:
+            self.pending.function = lambda: len(pending)
+        if prober is not None:
+            self.probes.function = lambda: prober.stats().get("probes_sent", 0)
+
+    def render(self, scan_stats: Optional[Dict[str, Any]] = None) -> str:
+        """Text exposition; numeric ``scan_stats`` become ``latencymesh_scan_*``."""
+
+        lines = []
+        for instrument in self.instruments:
+            lines.append(f"# HELP {instrument.name} {instrument.help}")
+            lines.append(f"# TYPE {instrument.name} {instrument.kind}")
+            for name, labels, value in instrument.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        for name, value in _stats_samples("latencymesh_scan", scan_stats or {}):
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+async def serve_metrics(
+    metrics: ScanMetrics,
+    host: str,
+    port: int,
+    scan_stats: Optional[Dict[str, Any]] = None,
+) -> asyncio.AbstractServer:
+    """Answer ``GET /metrics`` on ``host:port`` for scans without a web server."""
+
+    async def handle(reader, writer):
+        try:
+            request = await asyncio.wait_for(reader.readline(), timeout=5.0)
+            while (await asyncio.wait_for(reader.readline(), timeout=5.0)).strip():
+                pass
+            parts = request.decode("latin-1").split()
+            if len(parts) >= 2 and parts[0] == "GET" and parts[1] == "/metrics":
+                status, body = "200 OK", metrics.render(scan_stats).encode()
+            else:
+                status, body = "404 Not Found", b"not found\n"
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: {CONTENT_TYPE}\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode()
+                + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
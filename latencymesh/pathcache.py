@@ -0,0 +1,121 @@
+"""Recently measured paths, so re-queued destinations are not traced again.
+
+A destination comes back through hop discovery, revisits and refreshes long
+before its path is likely to have changed. Within ``ttl`` seconds of a trace
+the worker either skips it outright or sends one probe at the destination's
+last TTL to confirm it still answers there.
+"""
+
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from .graph_ops import Hop, Trace
+from .iptools import ip_prefix
+
+
+@dataclass
+class CachedPath:
+    hops: Trace
+    measured: float
+
+    @property
+    def last_ttl(self) -> int:
+        ttls = self.hops.ttls
+        return ttls[-1] if ttls else len(self.hops)
+
+
+class PathCache:
+    """LRU of the last hop list per destination (or per destination /24).
+
+    ``mode`` is ``"skip"`` to drop a fresh destination without probing, or
+    ``"check"`` to verify it with a single probe first. Only traces that
+    reached their destination are cached, so a check always knows which TTL
+    to probe and what answer to expect.
+    """
+
+    MODES = ("skip", "check")
+
+    def __init__(
+        self,
+        ttl: float,
+        *,
+        by_prefix: bool = False,
+        mode: str = "check",
+        max_entries: int = 100_000,
+        clock=None,
+    ) -> None:
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown path cache mode: {mode}")
+        self.ttl = ttl
+        self.by_prefix = by_prefix
+        self.mode = mode
+        self.max_entries = max_entries
+        self._clock = clock or time.monotonic
+        self._paths: "OrderedDict[str, CachedPath]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.checks_failed = 0
+
+    def _key(self, host: str) -> str:
+        return ip_prefix(host) if self.by_prefix else host
+
+    def lookup(self, host: str) -> Optional[CachedPath]:
+        """Return the fresh cached path towards ``host``, counting hit or miss."""
+
+        key = self._key(host)
+        entry = self._paths.get(key)
+        if entry is not None and self._clock() - entry.measured > self.ttl:
+            del self._paths[key]
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self._paths.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def store(self, host: str, hops) -> None:
+        if not hops or hops[-1][0] != host:
+            return
+        trace = Trace(hops, getattr(hops, "ttls", ()))
+        key = self._key(host)
+        self._paths[key] = CachedPath(trace, self._clock())
+        self._paths.move_to_end(key)
+        while len(self._paths) > self.max_entries:
+            self._paths.popitem(last=False)
+
+    def confirm(self, host: str, entry: CachedPath, hop: Hop) -> Trace:
+        """Fold a successful last-hop check into the cache.
+
+        Returns the segment that was measured: the cached hop before the
+        destination followed by ``hop``.
+        """
+
+        segment = Trace(entry.hops[-2:-1], entry.hops.ttls[-2:-1])
+        segment.append(hop)
+        segment.ttls.append(entry.last_ttl)
+        if not self.by_prefix:
+            entry.measured = self._clock()
+            entry.hops[-1] = hop
+        return segment
+
+    def invalidate(self, host: str) -> None:
+        """Forget ``host``'s path after a failed check; it gets a full trace."""
+
+        self.checks_failed += 1
+        # A miss was not counted at lookup time; turn the hit into one.
+        self.hits -= 1
+        self.misses += 1
+        self._paths.pop(self._key(host), None)
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._paths),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "checks_failed": self.checks_failed,
+        }
@@ -0,0 +1,614 @@
+"""Pluggable traceroute probers.
+
+``SubprocessProber`` wraps the system ``traceroute`` binary. ``SocketProber``
+sends TTL-limited UDP probes from a pair of shared sockets owned by a
+:class:`ProbeEngine` and matches ICMP replies back to outstanding probes on the
+event loop, avoiding a fork/exec per trace.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import ipaddress
+import socket
+import struct
+import time
+from typing import AsyncIterator, Callable, Dict, List, Optional, Set, Tuple
+
+from . import traceroute
+from .graph_ops import Hop, Trace
+from .ratelimit import ProbeLimiter
+from .rto import AdaptiveTimeouts
+from .stopsets import StopSets
+
+BASE_PORT = 33434
+PORT_SPAN = 16384
+PROBE_PAYLOAD = b"latencymesh"
+
+ICMP_DEST_UNREACH = 3
+ICMP_TIME_EXCEEDED = 11
+
+# (responder, rtt in ms, destination reached)
+ProbeReply = Tuple[str, float, bool]
+StopRule = Callable[[int, ProbeReply], bool]
+
+
+def parse_icmp_reply(packet: bytes) -> Optional[Tuple[str, int, str, int]]:
+    """Decode an ICMP error quoting one of our UDP probes.
+
+    Returns ``(responder, icmp_type, original_dst, original_dport)`` or
+    ``None`` when the packet is not a time-exceeded/unreachable reply carrying
+    a UDP header.
+    """
+
+    if len(packet) < 20:
+        return None
+    ihl = (packet[0] & 0x0F) * 4
+    if len(packet) < ihl + 8 + 20:
+        return None
+    responder = socket.inet_ntoa(packet[12:16])
+    icmp_type = packet[ihl]
+    if icmp_type not in (ICMP_TIME_EXCEEDED, ICMP_DEST_UNREACH):
+        return None
+    inner = packet[ihl + 8 :]
+    inner_ihl = (inner[0] & 0x0F) * 4
+    if inner[9] != socket.IPPROTO_UDP or len(inner) < inner_ihl + 4:
+        return None
+    original_dst = socket.inet_ntoa(inner[16:20])
+    (original_dport,) = struct.unpack("!H", inner[inner_ihl + 2 : inner_ihl + 4])
+    return responder, icmp_type, original_dst, original_dport
+
+
+class ProbeEngine:
+    """Send TTL-limited UDP probes and match ICMP replies on the event loop.
+
+    One engine is shared by every worker. Outstanding probes are keyed by
+    ``(destination, destination port)`` so concurrent traces never collide.
+    Sockets may be injected for testing; otherwise a UDP send socket and a raw
+    ICMP receive socket are opened, which requires ``CAP_NET_RAW``.
+    """
+
+    def __init__(
+        self,
+        send_sock: Optional[socket.socket] = None,
+        recv_sock: Optional[socket.socket] = None,
+        *,
+        base_port: int = BASE_PORT,
+        limiter: Optional[ProbeLimiter] = None,
+    ) -> None:
+        self.limiter = limiter
+        self._send = send_sock
+        self._recv = recv_sock
+        self._base_port = base_port
+        self._next_port = 0
+        self._outstanding: Dict[Tuple[str, int], Tuple[asyncio.Future, float]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.probes_sent = 0
+
+    async def start(self) -> None:
+        if self._recv is None:
+            self._recv = socket.socket(
+                socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP
+            )
+        if self._send is None:
+            self._send = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._recv.setblocking(False)
+        self._send.setblocking(False)
+        self._loop = asyncio.get_running_loop()
+        self._loop.add_reader(self._recv.fileno(), self._on_readable)
+
+    def close(self) -> None:
+        if self._loop is not None and self._recv is not None:
+            self._loop.remove_reader(self._recv.fileno())
+        for future, _ in self._outstanding.values():
+            if not future.done():
+                future.cancel()
+        self._outstanding.clear()
+        for sock in (self._send, self._recv):
+            if sock is not None:
+                sock.close()
+        self._loop = None
+
+    def _allocate_port(self, host: str) -> int:
+        for _ in range(PORT_SPAN):
+            port = self._base_port + self._next_port
+            self._next_port = (self._next_port + 1) % PORT_SPAN
+            if (host, port) not in self._outstanding:
+                return port
+        raise RuntimeError(f"no free probe ports for {host}")
+
+    def _on_readable(self) -> None:
+        while True:
+            try:
+                packet = self._recv.recv(4096)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                return
+            self._handle_packet(packet, time.perf_counter())
+
+    def _handle_packet(self, packet: bytes, received: float) -> None:
+        decoded = parse_icmp_reply(packet)
+        if decoded is None:
+            return
+        responder, icmp_type, original_dst, original_dport = decoded
+        entry = self._outstanding.pop((original_dst, original_dport), None)
+        if entry is None:
+            return
+        future, sent = entry
+        if not future.done():
+            reached = icmp_type == ICMP_DEST_UNREACH
+            future.set_result((responder, (received - sent) * 1000.0, reached))
+
+    async def probe(self, host: str, ttl: int, timeout: float) -> Optional[ProbeReply]:
+        """Send one probe with ``ttl`` and wait up to ``timeout`` seconds."""
+
+        if self._loop is None:
+            raise RuntimeError("ProbeEngine.start() has not been awaited")
+        if self.limiter is not None:
+            await self.limiter.acquire(host)
+        port = self._allocate_port(host)
+        future = self._loop.create_future()
+        key = (host, port)
+        self._outstanding[key] = (future, time.perf_counter())
+        try:
+            self._send.setsockopt(socket.IPPROTO_IP, socket.IP_TTL, ttl)
+            self._send.sendto(PROBE_PAYLOAD, (host, port))
+        except OSError:
+            self._outstanding.pop(key, None)
+            return None
+        self.probes_sent += 1
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            self._outstanding.pop(key, None)
+
+
+class Prober:
+    """Interface shared by traceroute backends."""
+
+    name = "base"
+    # Whether ``trace`` honours ``first_ttl``; callers skip TTL windows otherwise.
+    supports_first_ttl = False
+
+    async def trace(self, host, timeout, max_hops, logger, first_ttl=1) -> List[Hop]:
+        raise NotImplementedError
+
+    async def stream(
+        self, host, timeout, max_hops, logger, first_ttl=1
+    ) -> AsyncIterator[Tuple[int, Hop]]:
+        """Yield ``(ttl, hop)`` pairs; backends without streaming yield at the end."""
+
+        hops = await self.trace(host, timeout, max_hops, logger, first_ttl=first_ttl)
+        ttls = getattr(hops, "ttls", None) or range(first_ttl, first_ttl + len(hops))
+        for ttl, hop in zip(ttls, hops):
+            yield ttl, hop
+
+    def stats(self) -> Dict[str, int]:
+        return {}
+
+    async def close(self) -> None:
+        return None
+
+
+class SubprocessProber(Prober):
+    """Run the system ``traceroute`` binary once per target.
+
+    ``window`` maps onto ``traceroute -N``, the number of probes in flight at
+    once; ``None`` keeps the binary's default. The binary cannot be paced per
+    packet, so a ``limiter`` is charged one probe per TTL in the range before
+    the run and refunded for the TTLs past the destination afterwards. With
+    ``timeouts`` the binary's ``-w`` is the longest adaptive timeout any TTL of
+    the trace needs, and every answer or silent TTL updates the estimates.
+    Subclasses answer from somewhere else by overriding ``_run`` and ``_stream``.
+    """
+
+    name = "subprocess"
+    supports_first_ttl = True
+
+    def __init__(
+        self,
+        window: Optional[int] = None,
+        limiter: Optional[ProbeLimiter] = None,
+        *,
+        timeouts: Optional[AdaptiveTimeouts] = None,
+    ):
+        self.window = window
+        self.limiter = limiter
+        self.timeouts = timeouts
+        self.probes_sent = 0
+
+    def _wait(self, host, timeout, first_ttl, max_hops) -> float:
+        if self.timeouts is None:
+            return timeout
+        ttls = range(first_ttl, max_hops + 1)
+        return round(self.timeouts.trace_timeout(host, ttls, timeout), 3)
+
+    def _account(self, host, timeout, wait, first_ttl, max_hops, answers) -> None:
+        """Feed a finished run's answers (``{ttl: (ip, rtt)}``) to the estimates."""
+
+        if self.timeouts is None:
+            return
+        last_ttl = max_hops
+        for ttl in sorted(answers):
+            if answers[ttl][0] == host:
+                last_ttl = ttl
+                break
+        for ttl in range(first_ttl, last_ttl + 1):
+            if ttl in answers:
+                self.timeouts.observe(host, ttl, answers[ttl][1] / 1000.0)
+            else:
+                self.timeouts.expire(host, ttl, wait, timeout)
+
+    async def _run(self, host, wait, max_hops, logger, **kwargs) -> List[Hop]:
+        return await traceroute.run_traceroute(host, wait, max_hops, logger, **kwargs)
+
+    def _stream(self, host, wait, max_hops, logger, **kwargs):
+        return traceroute.stream_traceroute(host, wait, max_hops, logger, **kwargs)
+
+    async def _reserve(self, host, first_ttl, max_hops) -> int:
+        budget = max(1, max_hops - first_ttl + 1)
+        if self.limiter is not None:
+            await self.limiter.acquire(host, budget)
+        return budget
+
+    def _settle(self, host, budget, first_ttl, last_ttl, reached) -> None:
+        # One probe per TTL, as for the limiter; none past the destination.
+        sent = last_ttl - first_ttl + 1 if reached else budget
+        self.probes_sent += sent
+        if self.limiter is not None and reached:
+            self.limiter.refund(host, budget - sent)
+
+    async def trace(self, host, timeout, max_hops, logger, first_ttl=1) -> List[Hop]:
+        kwargs = {}
+        if self.window is not None:
+            kwargs["squeries"] = self.window if self.window > 0 else max_hops
+        if first_ttl > 1:
+            kwargs["first_ttl"] = first_ttl
+        budget = await self._reserve(host, first_ttl, max_hops)
+        wait = self._wait(host, timeout, first_ttl, max_hops)
+        hops = await self._run(host, wait, max_hops, logger, **kwargs)
+        ttls = getattr(hops, "ttls", None) or range(first_ttl, first_ttl + len(hops))
+        self._account(host, timeout, wait, first_ttl, max_hops, dict(zip(ttls, hops)))
+        if hops:
+            last_ttl = ttls[len(hops) - 1]
+            self._settle(host, budget, first_ttl, last_ttl, hops[-1][0] == host)
+        else:
+            self._settle(host, budget, first_ttl, max_hops, False)
+        return hops
+
+    async def stream(
+        self, host, timeout, max_hops, logger, first_ttl=1
+    ) -> AsyncIterator[Tuple[int, Hop]]:
+        squeries = None
+        if self.window is not None:
+            squeries = self.window if self.window > 0 else max_hops
+        budget = await self._reserve(host, first_ttl, max_hops)
+        wait = self._wait(host, timeout, first_ttl, max_hops)
+        last_ttl, reached = first_ttl, False
+        answers = {}
+        async for ttl, hop in self._stream(
+            host, wait, max_hops, logger, squeries=squeries, first_ttl=first_ttl
+        ):
+            last_ttl, reached = ttl, hop[0] == host
+            answers[ttl] = hop
+            yield ttl, hop
+        self._account(host, timeout, wait, first_ttl, max_hops, answers)
+        self._settle(host, budget, first_ttl, last_ttl, reached)
+
+    def stats(self) -> Dict[str, int]:
+        return {"probes_sent": self.probes_sent}
+
+
+class SocketProber(Prober):
+    """Trace with a shared :class:`ProbeEngine` instead of a subprocess.
+
+    ``window`` is the number of TTLs probed concurrently for one destination:
+    ``1`` walks the path hop by hop, ``0`` sends every TTL at once so a trace
+    costs roughly one RTT plus one timeout. Once the destination answers,
+    probes for higher TTLs are cancelled. With ``stop_sets`` each trace follows
+    the Doubletree order instead: forwards from ``stop_sets.start_ttl`` and
+    then backwards towards the vantage point, stopping at known hops. The
+    engine only speaks IPv4; other destinations are handed to ``fallback``.
+    With ``timeouts`` each probe waits its own adaptive timeout, capped by the
+    trace's ``timeout``.
+    """
+
+    name = "socket"
+    supports_first_ttl = True
+
+    def __init__(
+        self,
+        engine: ProbeEngine,
+        fallback: Optional[Prober] = None,
+        *,
+        window: Optional[int] = None,
+        stop_sets: Optional[StopSets] = None,
+        timeouts: Optional[AdaptiveTimeouts] = None,
+    ):
+        self.engine = engine
+        self.fallback = fallback or SubprocessProber(
+            window, engine.limiter, timeouts=timeouts
+        )
+        self.window = 1 if window is None else window
+        self.stop_sets = stop_sets
+        self.timeouts = timeouts
+
+    async def trace(self, host, timeout, max_hops, logger, first_ttl=1) -> List[Hop]:
+        try:
+            address = ipaddress.ip_address(host)
+        except ValueError:
+            address = None
+        if address is None or address.version != 4:
+            return await self.fallback.trace(
+                host, timeout, max_hops, logger, first_ttl=first_ttl
+            )
+        if self.stop_sets is not None:
+            return await self._trace_doubletree(
+                str(address), timeout, max_hops, logger, first_ttl
+            )
+        replies, _ = await self._probe_ttls(
+            str(address), range(first_ttl, max_hops + 1), timeout
+        )
+        hops, _, _ = self._assemble(host, replies, logger)
+        return hops
+
+    async def stream(
+        self, host, timeout, max_hops, logger, first_ttl=1
+    ) -> AsyncIterator[Tuple[int, Hop]]:
+        """Yield each hop once it and every lower TTL have answered or timed out.
+
+        Doubletree traces probe out of TTL order, so they yield at the end.
+        """
+
+        try:
+            address = ipaddress.ip_address(host)
+        except ValueError:
+            address = None
+        if address is None or address.version != 4:
+            source = self.fallback.stream(
+                host, timeout, max_hops, logger, first_ttl=first_ttl
+            )
+        elif self.stop_sets is not None:
+            source = super().stream(host, timeout, max_hops, logger, first_ttl)
+        else:
+            source = self._stream_ttls(
+                str(address), range(first_ttl, max_hops + 1), timeout, logger
+            )
+        async for ttl, hop in source:
+            yield ttl, hop
+
+    async def _stream_ttls(self, host, ttls, timeout, logger):
+        ready: asyncio.Queue = asyncio.Queue()
+        probing = asyncio.ensure_future(
+            self._probe_ttls(
+                host,
+                ttls,
+                timeout,
+                on_reply=lambda ttl, reply: ready.put_nowait((ttl, reply)),
+            )
+        )
+        probing.add_done_callback(lambda _probing: ready.put_nowait(None))
+        try:
+            while True:
+                item = await ready.get()
+                if item is None:
+                    break
+                ttl, (ip, rtt, reached) = item
+                logger.debug(f"[trace:{host}] {ip} {rtt:.3f}ms")
+                yield ttl, (ip, round(rtt, 3))
+                if reached:
+                    break
+            await probing
+        finally:
+            if not probing.done():
+                probing.cancel()
+                await asyncio.gather(probing, return_exceptions=True)
+
+    async def _trace_doubletree(
+        self, host, timeout, max_hops, logger, first_ttl
+    ) -> List[Hop]:
+        # A learned TTL window already marks the hops below first_ttl as
+        # explored, so it replaces the fixed mid-path start.
+        stop_sets = self.stop_sets
+        start = first_ttl if first_ttl > 1 else stop_sets.start_ttl
+        start = min(start, max_hops)
+        forward, sent_forward = await self._probe_ttls(
+            host,
+            range(start, max_hops + 1),
+            timeout,
+            stop=lambda ttl, reply: stop_sets.stops_forward(reply[0], host),
+        )
+        # A classic trace probes every TTL up to the destination, or up to
+        # max_hops when the destination never answers.
+        classic = max_hops
+        if forward:
+            last_ttl = max(forward)
+            remaining = stop_sets.remaining(forward[last_ttl][0], host)
+            if remaining:
+                classic = last_ttl + remaining
+        backward, sent_backward = await self._probe_ttls(
+            host,
+            range(start - 1, first_ttl - 1, -1),
+            timeout,
+            stop=lambda ttl, reply: stop_sets.stops_backward(reply[0], ttl),
+        )
+        hops, hops_by_ttl, reached = self._assemble(
+            host, {**backward, **forward}, logger
+        )
+        if reached:
+            classic = max(hops_by_ttl)
+        classic -= first_ttl - 1
+        stop_sets.record(host, hops_by_ttl, reached)
+        sent = sent_forward + sent_backward
+        stop_sets.account(sent, classic - sent)
+        return hops
+
+    def _assemble(self, host, replies: Dict[int, ProbeReply], logger):
+        hops = Trace()
+        hops_by_ttl: Dict[int, str] = {}
+        reached = False
+        for ttl in sorted(replies):
+            ip, rtt, reached = replies[ttl]
+            logger.debug(f"[trace:{host}] {ip} {rtt:.3f}ms")
+            hops.append((ip, round(rtt, 3)))
+            hops.ttls.append(ttl)
+            hops_by_ttl[ttl] = ip
+            if reached:
+                break
+        return hops, hops_by_ttl, reached
+
+    async def _probe_ttls(
+        self,
+        host,
+        ttls,
+        timeout,
+        stop: Optional[StopRule] = None,
+        on_reply: Optional[Callable[[int, ProbeReply], None]] = None,
+    ) -> Tuple[Dict[int, ProbeReply], int]:
+        """Probe ``ttls`` in windows, in the order given.
+
+        Stops after the window in which the destination answered or in which
+        ``stop`` matched a reply; replies past that point are discarded.
+        Returns the replies keyed by TTL and the number of probes launched.
+        ``on_reply(ttl, reply)`` is called for each reply, in the order of
+        ``ttls``, as soon as every earlier TTL has answered or timed out.
+        """
+
+        ttls = list(ttls)
+        window = self.window if self.window > 0 else max(len(ttls), 1)
+        replies: Dict[int, ProbeReply] = {}
+        reached_at: Optional[int] = None
+        sent = 0
+        settled: Set[int] = set()
+        released = 0
+
+        def release() -> None:
+            nonlocal released
+            while released < len(ttls) and ttls[released] in settled:
+                ttl = ttls[released]
+                released += 1
+                if ttl in replies:
+                    on_reply(ttl, replies[ttl])
+
+        for start in range(0, len(ttls), window):
+            batch = ttls[start : start + window]
+            sent += len(batch)
+            tasks = {
+                asyncio.ensure_future(self._probe(host, ttl, timeout)): ttl
+                for ttl in batch
+            }
+            cancelled = []
+            while tasks:
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task not in tasks:
+                        continue
+                    ttl = tasks.pop(task)
+                    reply = task.result()
+                    settled.add(ttl)
+                    if reply is None:
+                        continue
+                    replies[ttl] = reply
+                    if reply[2] and (reached_at is None or ttl < reached_at):
+                        reached_at = ttl
+                        for other, other_ttl in list(tasks.items()):
+                            if other_ttl > ttl:
+                                other.cancel()
+                                tasks.pop(other)
+                                cancelled.append(other)
+                if on_reply is not None:
+                    release()
+            if cancelled:
+                await asyncio.gather(*cancelled, return_exceptions=True)
+            if stop is not None:
+                for position, ttl in enumerate(batch):
+                    if ttl in replies and stop(ttl, replies[ttl]):
+                        for later in batch[position + 1 :]:
+                            replies.pop(later, None)
+                        return replies, sent
+            if reached_at is not None:
+                break
+        return replies, sent
+
+    async def _probe(self, host, ttl, timeout) -> Optional[ProbeReply]:
+        timeouts = self.timeouts
+        if timeouts is None:
+            return await self.engine.probe(host, ttl, timeout)
+        wait = timeouts.timeout(host, ttl, timeout)
+        reply = await self.engine.probe(host, ttl, wait)
+        if reply is None:
+            timeouts.expire(host, ttl, wait, timeout)
+        else:
+            timeouts.observe(host, ttl, reply[1] / 1000.0)
+        return reply
+
+    def stats(self) -> Dict[str, int]:
+        fallback_sent = self.fallback.stats().get("probes_sent", 0)
+        stats = {"probes_sent": self.engine.probes_sent + fallback_sent}
+        if self.stop_sets is not None:
+            stop_stats = self.stop_sets.stats()
+            stop_stats.pop("probes_sent")
+            stats.update(stop_stats)
+        return stats
+
+    async def close(self) -> None:
+        self.engine.close()
+        await self.fallback.close()
+
+
+async def create_prober(
+    name: str,
+    logger,
+    engine: Optional[ProbeEngine] = None,
+    *,
+    window: Optional[int] = None,
+    stop_sets: Optional[StopSets] = None,
+    limiter: Optional[ProbeLimiter] = None,
+    timeouts: Optional[AdaptiveTimeouts] = None,
+    network=None,
+    time_scale: float = 1.0,
+):
+    """Build the prober called ``name``, falling back to the subprocess backend.
+
+    Opening the raw ICMP socket needs elevated privileges; when that fails the
+    error is logged and :class:`SubprocessProber` is returned instead. Stop
+    sets need per-TTL control and are ignored by the subprocess backend and the
+    ``simulate`` backend, which answers from ``network`` (a seed-0
+    :class:`~latencymesh.simulate.SimulatedNetwork` by default).
+    """
+
+    if name == "subprocess":
+        if stop_sets is not None:
+            logger.warning("[probe] stop sets need the socket prober; ignoring")
+        return SubprocessProber(window, limiter, timeouts=timeouts)
+    if name == "simulate":
+        from .simulate import SimulatedNetwork, SimulatedProber
+
+        if stop_sets is not None:
+            logger.warning("[probe] stop sets need the socket prober; ignoring")
+        return SimulatedProber(
+            network or SimulatedNetwork(),
+            window,
+            limiter,
+            timeouts=timeouts,
+            time_scale=time_scale,
+        )
+    if name == "socket":
+        engine = engine or ProbeEngine()
+        if limiter is not None:
+            engine.limiter = limiter
+        try:
+            await engine.start()
+        except OSError as exc:
+            engine.close()
+            logger.warning(
+                f"[probe] socket prober unavailable ({exc}); using subprocess"
+            )
+            return SubprocessProber(window, limiter, timeouts=timeouts)
+        return SocketProber(
+            engine, window=window, stop_sets=stop_sets, timeouts=timeouts
+        )
+    raise ValueError(f"Unknown prober: {name}")
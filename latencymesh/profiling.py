@@ -0,0 +1,273 @@
+"""Per-stage timing spans for ``--profile``.
+
+Stages mark themselves with :func:`span` (or :func:`profiled`), which does
+nothing until :func:`start_profile` activates a :class:`Profiler`. Spans nest
+per asyncio task, so a subprocess spawn inside a worker's trace is reported
+as ``trace;spawn``. At exit the profiler writes a JSON breakdown and a
+collapsed-stack file (one ``stack microseconds`` line per stack, self time
+only) that ``flamegraph.pl`` and speedscope read directly.
+"""
+
+import cProfile
+import functools
+import json
+import os
+import pstats
+import time
+import tracemalloc
+from asyncio import events
+from contextlib import nullcontext
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+
+CAPTURES = ("cpu", "memory")
+
+_stack: ContextVar[Tuple[str, ...]] = ContextVar("latencymesh_profile", default=())
+_active: Optional["Profiler"] = None
+_NOOP = nullcontext()
+
+
+class _Span:
+    __slots__ = ("profiler", "name", "token", "started")
+
+    def __init__(self, profiler: "Profiler", name: str) -> None:
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self) -> None:
+        self.token = _stack.set(_stack.get() + (self.name,))
+        self.started = time.perf_counter()
+
+    def __exit__(self, *_exc) -> None:
+        elapsed = time.perf_counter() - self.started
+        path = _stack.get()
+        try:
+            _stack.reset(self.token)
+        except ValueError:
+            # Exited in another context, e.g. an async generator closed elsewhere.
+            _stack.set(path[:-1])
+        self.profiler.record(path, elapsed)
+
+
+class Profiler:
+    """Aggregate span timings by stack, plus an optional bounded capture.
+
+    ``capture`` is ``"cpu"`` (cProfile) or ``"memory"`` (tracemalloc); it runs
+    for the first ``window`` seconds only, so the overhead stays bounded.
+    """
+
+    def __init__(self, capture: Optional[str] = None, window: float = 30.0) -> None:
+        if capture is not None and capture not in CAPTURES:
+            raise ValueError(f"Unknown profile capture: {capture}")
+        self.capture = capture
+        self.window = window
+        self.started = time.perf_counter()
+        self.stacks: Dict[Tuple[str, ...], List[float]] = {}
+        self._cpu: Optional[cProfile.Profile] = None
+        self._memory: Optional[tracemalloc.Snapshot] = None
+        self._peak = 0
+        self._capturing = False
+        self._timer = None
+
+    def span(self, name: str) -> _Span:
+        return _Span(self, name)
+
+    def record(self, path: Tuple[str, ...], elapsed: float) -> None:
+        entry = self.stacks.get(path)
+        if entry is None:
+            self.stacks[path] = [1, elapsed, elapsed]
+        else:
+            entry[0] += 1
+            entry[1] += elapsed
+            if elapsed > entry[2]:
+                entry[2] = elapsed
+
+    def start_capture(self) -> None:
+        if self.capture is None or self._capturing:
+            return
+        if self.capture == "cpu":
+            self._cpu = cProfile.Profile()
+            try:
+                self._cpu.enable()
+            except ValueError as exc:
+                # Another profiler (a coverage tool, say) already owns the hook.
+                print(f"[profile] cannot start cProfile: {exc}")
+                self._cpu = None
+                return
+        else:
+            tracemalloc.start()
+        self._capturing = True
+        try:
+            loop = events.get_running_loop()
+        except RuntimeError:
+            return
+        self._timer = loop.call_later(self.window, self.stop_capture)
+
+    def stop_capture(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._capturing:
+            return
+        self._capturing = False
+        if self._cpu is not None:
+            self._cpu.disable()
+        else:
+            self._memory = tracemalloc.take_snapshot()
+            self._peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+    def _self_times(self) -> Dict[Tuple[str, ...], float]:
+        self_times = {path: entry[1] for path, entry in self.stacks.items()}
+        for path, entry in self.stacks.items():
+            parent = path[:-1]
+            if parent in self_times:
+                self_times[parent] -= entry[1]
+        # Children running in parallel tasks can outlast their parent.
+        return {path: max(0.0, value) for path, value in self_times.items()}
+
+    def _cpu_report(self, limit: int = 25) -> List[Dict[str, Any]]:
+        stats = pstats.Stats(self._cpu)
+        rows = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)
+        return [
+            {
+                "function": f"{os.path.basename(file)}:{line}:{name}",
+                "calls": calls,
+                "self_s": round(self_time, 6),
+                "cumulative_s": round(cumulative, 6),
+            }
+            for (file, line, name), (_, calls, self_time, cumulative, _) in rows[:limit]
+        ]
+
+    def _memory_report(self, limit: int = 25) -> Dict[str, Any]:
+        top = self._memory.statistics("lineno")[:limit]
+        return {
+            "peak_kib": round(self._peak / 1024, 1),
+            "top": [
+                {
+                    "site": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                    "size_kib": round(stat.size / 1024, 1),
+                    "count": stat.count,
+                }
+                for stat in top
+            ],
+        }
+
+    def report(self) -> Dict[str, Any]:
+        self_times = self._self_times()
+        stacks = {
+            ";".join(path): {
+                "count": count,
+                "total_s": round(total, 6),
+                "self_s": round(self_times[path], 6),
+                "mean_ms": round(total / count * 1000, 3),
+                "max_ms": round(worst * 1000, 3),
+            }
+            for path, (count, total, worst) in sorted(self.stacks.items())
+        }
+        stages: Dict[str, Dict[str, float]] = {}
+        for path, (count, total, _) in self.stacks.items():
+            stage = stages.setdefault(path[-1], {"count": 0, "total_s": 0.0})
+            stage["count"] += count
+            stage["total_s"] += total
+        for stage in stages.values():
+            stage["total_s"] = round(stage["total_s"], 6)
+        report: Dict[str, Any] = {
+            "wall_seconds": round(time.perf_counter() - self.started, 3),
+            "stages": dict(
+                sorted(
+                    stages.items(), key=lambda item: item[1]["total_s"], reverse=True
+                )
+            ),
+            "stacks": stacks,
+        }
+        if self._cpu is not None:
+            report["cpu"] = self._cpu_report()
+        if self._memory is not None:
+            report["memory"] = self._memory_report()
+        return report
+
+    def collapsed(self) -> List[str]:
+        return [
+            f"{';'.join(path)} {int(round(seconds * 1_000_000))}"
+            for path, seconds in sorted(self._self_times().items())
+        ]
+
+    def write(self, base: str) -> List[str]:
+        """Write ``<base>.profile.json`` and ``.folded`` (and ``.pstats``)."""
+
+        self.stop_capture()
+        base = os.path.expanduser(base)
+        if base.endswith(".json"):
+            base = base[: -len(".json")]
+        directory = os.path.dirname(base)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        paths = [f"{base}.profile.json", f"{base}.profile.folded"]
+        with open(paths[0], "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, indent=2)
+        with open(paths[1], "w", encoding="utf-8") as f:
+            f.write("\n".join(self.collapsed()) + "\n")
+        if self._cpu is not None:
+            paths.append(f"{base}.profile.pstats")
+            self._cpu.dump_stats(paths[2])
+        return paths
+
+
+def span(name: str):
+    """Context manager timing ``name`` under the active profiler, if any."""
+
+    profiler = _active
+    if profiler is None:
+        return _NOOP
+    return profiler.span(name)
+
+
+def profiled(name: str):
+    """Decorate a synchronous function so each call is a ``name`` span."""
+
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+def active() -> Optional[Profiler]:
+    return _active
+
+
+def start_profile(params) -> Optional[Profiler]:
+    """Activate a profiler for ``params.profile``; ``None`` if off or running."""
+
+    global _active
+    if not getattr(params, "profile", False) or _active is not None:
+        return None
+    profiler = Profiler(
+        getattr(params, "profile_capture", None),
+        getattr(params, "profile_window", None) or 30.0,
+    )
+    _active = profiler
+    profiler.start_capture()
+    return profiler
+
+
+def finish_profile(profiler: Optional[Profiler], base: str) -> List[str]:
+    """Deactivate ``profiler`` and write its report next to ``base``."""
+
+    global _active
+    if profiler is None:
+        return []
+    if _active is profiler:
+        _active = None
+    try:
+        paths = profiler.write(base)
+    except OSError as exc:
+        print(f"[profile] cannot write the profile: {exc}")
+        return []
+    print(f"[profile] wrote {', '.join(paths)}")
+    return paths
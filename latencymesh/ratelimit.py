@@ -0,0 +1,122 @@
+"""Token buckets shared by every worker to enforce a global probe budget."""
+
+import asyncio
+import time
+from typing import Dict, Optional
+
+from .iptools import ip_prefix
+
+
+class TokenBucket:
+    """Burst-capable token bucket counted in probe packets.
+
+    Callers reserve tokens up front: the balance may go negative and the caller
+    sleeps until the debt is repaid. Reservations are therefore served in
+    arrival order and requests larger than ``burst`` still make progress.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None, clock=None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = float(rate)
+        self.burst = float(burst) if burst else max(1.0, self.rate)
+        self._clock = clock or time.monotonic
+        self._tokens = self.burst
+        self._updated = self._clock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, n: float = 1) -> float:
+        """Take ``n`` tokens and return how long to wait before using them."""
+
+        self._refill()
+        self._tokens -= n
+        return max(0.0, -self._tokens / self.rate)
+
+    async def acquire(self, n: float = 1) -> float:
+        wait = self.reserve(n)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def refund(self, n: float) -> None:
+        if n <= 0:
+            return
+        self._refill()
+        self._tokens = min(self.burst, self._tokens + n)
+
+    @property
+    def idle(self) -> bool:
+        self._refill()
+        return self._tokens >= self.burst
+
+
+class ProbeLimiter:
+    """Global packet budget plus optional per-destination-prefix politeness.
+
+    ``acquire`` blocks until both the global bucket and the bucket of the
+    destination's /24 (or /48) allow ``n`` more probes.
+    """
+
+    MAX_IDLE_PREFIXES = 4096
+
+    def __init__(
+        self,
+        rate: float,
+        burst: Optional[float] = None,
+        prefix_rate: Optional[float] = None,
+        prefix_burst: Optional[float] = None,
+    ) -> None:
+        self.bucket = TokenBucket(rate, burst)
+        self.prefix_rate = prefix_rate
+        self.prefix_burst = prefix_burst
+        self._prefixes: Dict[str, TokenBucket] = {}
+        self.granted = 0
+        self.waited = 0.0
+
+    def _prefix_bucket(self, host: str) -> Optional[TokenBucket]:
+        if not self.prefix_rate:
+            return None
+        prefix = ip_prefix(host)
+        bucket = self._prefixes.get(prefix)
+        if bucket is None:
+            if len(self._prefixes) >= self.MAX_IDLE_PREFIXES:
+                self._prefixes = {
+                    key: value
+                    for key, value in self._prefixes.items()
+                    if not value.idle
+                }
+            bucket = TokenBucket(self.prefix_rate, self.prefix_burst)
+            self._prefixes[prefix] = bucket
+        return bucket
+
+    async def acquire(self, host: str, n: int = 1) -> None:
+        prefix_bucket = self._prefix_bucket(host)
+        wait = self.bucket.reserve(n)
+        if prefix_bucket is not None:
+            wait = max(wait, prefix_bucket.reserve(n))
+        self.granted += n
+        if wait > 0:
+            self.waited += wait
+            await asyncio.sleep(wait)
+
+    def refund(self, host: str, n: int) -> None:
+        if n <= 0:
+            return
+        self.granted -= n
+        self.bucket.refund(n)
+        prefix_bucket = self._prefixes.get(ip_prefix(host))
+        if prefix_bucket is not None:
+            prefix_bucket.refund(n)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "rate": self.bucket.rate,
+            "burst": self.bucket.burst,
+            "probes_granted": self.granted,
+            "wait_seconds": round(self.waited, 3),
+            "prefix_buckets": len(self._prefixes),
+        }
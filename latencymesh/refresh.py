@@ -0,0 +1,206 @@
+"""Per-node refresh deadlines that keep a long-running mesh fresh."""
+
+import asyncio
+import heapq
+import time
+import zlib
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+def _last_seen_epoch(value) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        seen = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+    if seen.tzinfo is None:
+        seen = seen.replace(tzinfo=timezone.utc)
+    return seen.timestamp()
+
+
+class RefreshScheduler:
+    """Heap of next-due times, one per known node.
+
+    Every node is re-measured at least once per ``freshness`` seconds. Its
+    interval halves (down to ``min_interval``) each time a trace towards it
+    finds new edges and doubles back towards ``freshness`` while it stays
+    unchanged, so volatile nodes are refreshed more often. Nodes seen on other
+    paths have their deadline pushed back without changing their interval.
+
+    :meth:`due` releases overdue nodes at no more than ``pace`` times the rate
+    needed to cover every node once per window, spreading refreshes evenly
+    instead of in bursts.
+
+    With ``owns`` (a sharded scan's ownership test) only the nodes it accepts
+    are scheduled, so each node is refreshed by exactly one shard.
+    """
+
+    def __init__(
+        self,
+        freshness: float,
+        min_interval: Optional[float] = None,
+        *,
+        pace: float = 2.0,
+        clock=None,
+        owns: Optional[Callable[[str], bool]] = None,
+    ) -> None:
+        if freshness <= 0:
+            raise ValueError("freshness must be positive")
+        self.freshness = float(freshness)
+        self.min_interval = float(min_interval or freshness / 16)
+        self.pace = pace
+        self._clock = clock or time.time
+        self._owns = owns
+        self._due: Dict[str, float] = {}
+        self._interval: Dict[str, float] = {}
+        self._heap: List[Tuple[float, str]] = []
+        self._budget = 0.0
+        self._released_at: Optional[float] = None
+        self.refreshed = 0
+
+    def __len__(self) -> int:
+        return len(self._due)
+
+    def _tracks(self, node: str) -> bool:
+        return self._owns is None or self._owns(node)
+
+    def _schedule(self, node: str, due: float) -> None:
+        self._due[node] = due
+        heapq.heappush(self._heap, (due, node))
+        # Drop superseded heap entries once they dominate the heap.
+        if len(self._heap) > 2 * len(self._due) + 64:
+            self._heap = [(d, n) for n, d in self._due.items()]
+            heapq.heapify(self._heap)
+
+    def load(self, G) -> None:
+        """Schedule every node in ``G`` from its ``last_seen`` timestamp.
+
+        Nodes without a timestamp get a deterministic offset within the window
+        so a freshly loaded graph does not come due all at once.
+        """
+
+        now = self._clock()
+        for node, data in G.nodes(data=True):
+            if not self._tracks(node):
+                continue
+            seen = _last_seen_epoch(data.get("last_seen"))
+            if seen is None:
+                offset = zlib.crc32(str(node).encode()) / 0xFFFFFFFF
+                due = now + offset * self.freshness
+            else:
+                due = seen + self.freshness
+            self._interval.setdefault(node, self.freshness)
+            self._schedule(node, due)
+
+    def touch(self, node: str) -> None:
+        """Record that ``node`` answered on some path just now."""
+
+        if not self._tracks(node):
+            return
+        interval = self._interval.setdefault(node, self.freshness)
+        self._schedule(node, self._clock() + interval)
+
+    def observe(self, node: str, changed: bool) -> None:
+        """Record a trace towards ``node`` and adapt its refresh interval."""
+
+        if not self._tracks(node):
+            return
+        interval = self._interval.get(node, self.freshness)
+        if changed:
+            interval = max(self.min_interval, interval / 2)
+        else:
+            interval = min(self.freshness, interval * 2)
+        self._interval[node] = interval
+        self._schedule(node, self._clock() + interval)
+
+    def due(self, limit: Optional[int] = None) -> List[str]:
+        """Pop overdue nodes allowed by the pacing budget, most overdue first."""
+
+        now = self._clock()
+        rate = self.pace * max(len(self._due), 1) / self.freshness
+        if self._released_at is not None:
+            self._budget = min(
+                max(1.0, rate), self._budget + (now - self._released_at) * rate
+            )
+        else:
+            self._budget = 1.0
+        self._released_at = now
+        nodes: List[str] = []
+        while self._heap and self._budget >= 1.0:
+            if limit is not None and len(nodes) >= limit:
+                break
+            due, node = self._heap[0]
+            if due > now:
+                break
+            heapq.heappop(self._heap)
+            if self._due.get(node) != due:
+                continue
+            # Re-arm with the full interval in case the trace never reports back.
+            self._schedule(node, now + self._interval.get(node, self.freshness))
+            nodes.append(node)
+            self._budget -= 1.0
+        self.refreshed += len(nodes)
+        return nodes
+
+    def state(self) -> Dict[str, object]:
+        """Due times and intervals of every node, for checkpoints."""
+
+        return {
+            "due": dict(self._due),
+            "interval": dict(self._interval),
+            "refreshed": self.refreshed,
+        }
+
+    def restore(self, state: Dict[str, object]) -> None:
+        """Reload :meth:`state`, replacing the schedule of every node it lists."""
+
+        self._interval.update(
+            (node, float(interval))
+            for node, interval in dict(state.get("interval") or {}).items()
+            if self._tracks(node)
+        )
+        self._due.update(
+            (node, float(due))
+            for node, due in dict(state.get("due") or {}).items()
+            if self._tracks(node)
+        )
+        self._heap = [(due, node) for node, due in self._due.items()]
+        heapq.heapify(self._heap)
+        self.refreshed += int(state.get("refreshed") or 0)
+
+    def stats(self) -> Dict[str, float]:
+        now = self._clock()
+        overdue = [due for due in self._due.values() if due <= now]
+        lag = now - min(overdue) if overdue else 0.0
+        intervals = self._interval.values()
+        return {
+            "tracked": len(self._due),
+            "overdue": len(overdue),
+            "lag_seconds": round(lag, 1),
+            "refreshed": self.refreshed,
+            "mean_interval": (
+                round(sum(intervals) / len(intervals), 1) if intervals else 0.0
+            ),
+        }
+
+
+async def refresh_loop(
+    scheduler: RefreshScheduler,
+    queue,
+    pending_ips,
+    stop_event: asyncio.Event,
+    interval: float = 1.0,
+) -> None:
+    """Move due nodes into ``queue`` every ``interval`` seconds until stopped."""
+
+    while not stop_event.is_set():
+        for node in scheduler.due():
+            if node not in pending_ips:
+                pending_ips.add(node)
+                await queue.put(node)
+        try:
+            await asyncio.wait_for(stop_event.wait(), timeout=interval)
+        except asyncio.TimeoutError:
+            pass
@@ -0,0 +1,141 @@
+"""RTT-adaptive probe timeouts, estimated the way TCP estimates its RTO.
+
+Every answered probe updates a smoothed RTT and RTT variance (RFC 6298) at
+three levels: the hop (destination /24 and TTL), the destination /24, and the
+whole scan. A probe waits ``SRTT + 4 * RTTVAR`` of the most specific level with
+enough samples, clamped to the operator's bounds, instead of always waiting
+the full ``--timeout``.
+"""
+
+from collections import OrderedDict
+from typing import Dict, Hashable, Iterable, Optional
+
+from .iptools import ip_prefix
+
+
+class RTTEstimate:
+    """Smoothed RTT and variance for one key, in seconds."""
+
+    __slots__ = ("srtt", "rttvar", "samples", "backoff")
+
+    ALPHA = 0.125
+    BETA = 0.25
+    K = 4
+
+    def __init__(self) -> None:
+        self.srtt = 0.0
+        self.rttvar = 0.0
+        self.samples = 0
+        self.backoff = 1
+
+    def observe(self, rtt: float) -> None:
+        if not self.samples:
+            self.srtt, self.rttvar = rtt, rtt / 2
+        else:
+            self.rttvar += self.BETA * (abs(self.srtt - rtt) - self.rttvar)
+            self.srtt += self.ALPHA * (rtt - self.srtt)
+        self.samples += 1
+        self.backoff = 1
+
+    def rto(self, granularity: float) -> float:
+        return (self.srtt + max(granularity, self.K * self.rttvar)) * self.backoff
+
+
+class AdaptiveTimeouts:
+    """Pick each probe's timeout from RTT estimates; account the wait saved.
+
+    A level is used once it has ``min_samples`` answers. A probe that times out
+    doubles its hop's timeout (up to ``max_backoff`` times) until that hop
+    answers again, so a slow hop is not starved by a tight estimate. Hop and
+    prefix estimates are kept for the ``max_keys`` most recently used keys.
+    """
+
+    def __init__(
+        self,
+        min_timeout: float = 0.05,
+        max_timeout: float = 1.0,
+        *,
+        min_samples: int = 3,
+        granularity: float = 0.01,
+        max_backoff: int = 4,
+        max_keys: int = 100_000,
+    ) -> None:
+        self.min_timeout = min(min_timeout, max_timeout)
+        self.max_timeout = max_timeout
+        self.min_samples = min_samples
+        self.granularity = granularity
+        self.max_backoff = max_backoff
+        self.max_keys = max_keys
+        self._estimates: "OrderedDict[Hashable, RTTEstimate]" = OrderedDict()
+        self.overall = RTTEstimate()
+        self.probes = 0
+        self.expired = 0
+        self.saved = 0.0
+
+    def _keys(self, host: str, ttl: int):
+        prefix = ip_prefix(host)
+        return (prefix, ttl), prefix
+
+    def _estimate(self, key: Hashable, create: bool) -> Optional[RTTEstimate]:
+        estimate = self._estimates.get(key)
+        if estimate is None and create:
+            estimate = self._estimates[key] = RTTEstimate()
+            while len(self._estimates) > self.max_keys:
+                self._estimates.popitem(last=False)
+        elif estimate is not None:
+            self._estimates.move_to_end(key)
+        return estimate
+
+    def _clamp(self, value: float) -> float:
+        return min(self.max_timeout, max(self.min_timeout, value))
+
+    def timeout(self, host: str, ttl: int, ceiling: Optional[float] = None) -> float:
+        """Seconds to wait for the probe to ``host`` at ``ttl``."""
+
+        ceiling = self.max_timeout if ceiling is None else ceiling
+        hop_key, prefix_key = self._keys(host, ttl)
+        hop = self._estimate(hop_key, False)
+        backoff = hop.backoff if hop is not None else 1
+        for estimate in (hop, self._estimate(prefix_key, False), self.overall):
+            if estimate is not None and estimate.samples >= self.min_samples:
+                rto = estimate.rto(self.granularity)
+                if estimate is not hop:
+                    rto *= backoff
+                return min(ceiling, self._clamp(rto))
+        return ceiling
+
+    def trace_timeout(
+        self, host: str, ttls: Iterable[int], ceiling: Optional[float] = None
+    ) -> float:
+        """One timeout for a whole trace: the longest any of ``ttls`` needs."""
+
+        return max((self.timeout(host, ttl, ceiling) for ttl in ttls), default=0.0)
+
+    def observe(self, host: str, ttl: int, rtt: float) -> None:
+        """Record an answer after ``rtt`` seconds."""
+
+        self.probes += 1
+        for key in self._keys(host, ttl):
+            self._estimate(key, True).observe(rtt)
+        self.overall.observe(rtt)
+
+    def expire(self, host: str, ttl: int, waited: float, ceiling=None) -> None:
+        """Record a probe that got no answer within ``waited`` seconds."""
+
+        ceiling = self.max_timeout if ceiling is None else ceiling
+        self.probes += 1
+        self.expired += 1
+        self.saved += max(0.0, ceiling - waited)
+        hop = self._estimate(self._keys(host, ttl)[0], True)
+        hop.backoff = min(hop.backoff * 2, self.max_backoff)
+
+    def stats(self) -> Dict[str, float]:
+        rto = self.overall.rto(self.granularity) if self.overall.samples else 0.0
+        return {
+            "probes": self.probes,
+            "timed_out": self.expired,
+            "wait_saved_seconds": round(self.saved, 3),
+            "srtt_ms": round(self.overall.srtt * 1000, 2),
+            "rto_ms": round(self._clamp(rto) * 1000, 2),
+            "estimates": len(self._estimates),
+        }
@@ -0,0 +1,295 @@
+"""Hash-sharded scanning across worker processes feeding one graph owner.
+
+``lm scan --processes N`` starts N child processes, each running its own
+:func:`~latencymesh.main.scan_async` loop over the targets that hash to it.
+Children stream every finished trace over a pipe to the parent, which owns the
+only graph, routes newly discovered hops to the shard that owns them, and saves
+once at the end.
+"""
+
+import asyncio
+import copy
+import multiprocessing
+import signal
+import zlib
+from asyncio import QueueEmpty, QueueFull
+from typing import Iterator, List, Optional
+
+from .durations import parse_duration
+from .graph_ops import add_trace
+from .io_graph import load_graph, save_graph
+from .ipset import IPSet
+from .loops import run
+from .traceroute import _publish_update
+
+
+def shard_of(ip: str, count: int) -> int:
+    """Stable shard index of ``ip`` (the same in every process)."""
+
+    return zlib.crc32(str(ip).encode("utf-8")) % count
+
+
+class ShardedPool:
+    """The addresses of ``pool`` that belong to shard ``index`` of ``count``."""
+
+    def __init__(self, pool, index: int, count: int) -> None:
+        self.pool = pool
+        self.index = index
+        self.count = count
+
+    @property
+    def cursor(self) -> int:
+        return self.pool.cursor
+
+    @property
+    def total(self) -> int:
+        return self.pool.total
+
+    def __bool__(self) -> bool:
+        return bool(self.pool)
+
+    def __iter__(self) -> Iterator[str]:
+        for ip in self.pool:
+            if shard_of(ip, self.count) == self.index:
+                yield ip
+
+
+class ShardLink:
+    """Child-process end of the pipe to the graph-owning parent.
+
+    Passed to ``scan_async`` as its ``link``: it chooses the child's targets,
+    decides which discovered hops the child may queue, receives every finished
+    trace, and is closed instead of saving the graph.
+
+    Outgoing messages are ``("trace", index, host, hops)`` per finished trace
+    and ``("done", index)`` at exit. Incoming ones are ``("target", ip)`` for
+    hops other shards discovered and ``("stop",)``.
+    """
+
+    def __init__(self, conn, index: int, count: int) -> None:
+        self.conn = conn
+        self.index = index
+        self.count = count
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._closed = False
+
+    def targets(self, pool) -> Iterator[str]:
+        return iter(ShardedPool(pool, self.index, self.count))
+
+    def owns(self, ip: str) -> bool:
+        return shard_of(ip, self.count) == self.index
+
+    def _send(self, message) -> None:
+        if self._closed:
+            return
+        try:
+            self.conn.send(message)
+        except (BrokenPipeError, EOFError, OSError):
+            self._closed = True
+
+    def send_trace(self, host: str, hops) -> None:
+        self._send(("trace", self.index, host, [tuple(hop) for hop in hops]))
+
+    def attach(self, queue, seen_ips, pending_ips, stop_event: asyncio.Event):
+        """Feed routed targets into ``queue`` and stop when the parent says so."""
+
+        def on_readable():
+            try:
+                while self.conn.poll():
+                    message = self.conn.recv()
+                    if message[0] == "target":
+                        ip = message[1]
+                        if ip not in seen_ips and ip not in pending_ips:
+                            seen_ips.add(ip)
+                            pending_ips.add(ip)
+                            queue.put_nowait(ip)
+                    elif message[0] == "stop":
+                        stop_event.set()
+            except (EOFError, OSError):
+                self._loop.remove_reader(self.conn.fileno())
+                stop_event.set()
+
+        self._loop = asyncio.get_running_loop()
+        self._loop.add_reader(self.conn.fileno(), on_readable)
+
+    async def close(self) -> None:
+        if self._loop is not None and not self._closed:
+            self._loop.remove_reader(self.conn.fileno())
+        self._send(("done", self.index))
+        self._closed = True
+
+
+def _run_shard(params, index: int, count: int, conn) -> None:
+    from .main import scan_async
+
+    # The parent owns the display and the global trace limit.
+    params.no_display = True
+    params.max_traces = None
+    link = ShardLink(conn, index, count)
+    try:
+        run(scan_async(params, link=link), getattr(params, "loop", None))
+    except KeyboardInterrupt:
+        link._send(("done", index))
+    finally:
+        conn.close()
+
+
+async def scan_sharded(
+    params,
+    graph=None,
+    update_queue=None,
+    graph_lock=None,
+    scan_stats=None,
+    context=None,
+    shutdown_timeout: float = 10.0,
+    writer=None,
+):
+    """Run ``params.processes`` shard processes and merge their traces."""
+
+    count = max(1, int(getattr(params, "processes", 1) or 1))
+    if getattr(params, "resume", False):
+        print("[warn] --resume is not supported with --processes; starting over")
+    G = graph if graph is not None else load_graph(params.save_base)
+    graph_lock = graph_lock or asyncio.Lock()
+    scan_stats = scan_stats if scan_stats is not None else {}
+    seen_ips = IPSet(G.nodes())
+    context = context or multiprocessing.get_context("spawn")
+    loop = asyncio.get_running_loop()
+    inbox: asyncio.Queue = asyncio.Queue()
+    stop_event = asyncio.Event()
+
+    connections: List = []
+    processes: List = []
+    for index in range(count):
+        parent_conn, child_conn = context.Pipe()
+        child_params = copy.copy(params)
+        child_params.processes = 1
+        process = context.Process(
+            target=_run_shard,
+            args=(child_params, index, count, child_conn),
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()
+        connections.append(parent_conn)
+        processes.append(process)
+
+    def on_readable(index):
+        conn = connections[index]
+        try:
+            while conn.poll():
+                inbox.put_nowait(conn.recv())
+        except (EOFError, OSError):
+            loop.remove_reader(conn.fileno())
+            inbox.put_nowait(("done", index))
+
+    for index, conn in enumerate(connections):
+        loop.add_reader(conn.fileno(), on_readable, index)
+
+    def send(index, message):
+        try:
+            connections[index].send(message)
+        except (BrokenPipeError, EOFError, OSError):
+            pass
+
+    limit = getattr(params, "max_traces", None)
+    limit = int(limit) if limit else None
+    duration = getattr(params, "duration", None)
+    if isinstance(duration, str) and duration:
+        duration = parse_duration(duration)
+    timer = None
+    if duration is not None:
+        timer = loop.call_later(max(duration.total_seconds(), 0), stop_event.set)
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except (NotImplementedError, RuntimeError, ValueError):
+            continue
+
+    stats = {"processes": count, "traces": 0, "routed": 0}
+    scan_stats["shards"] = lambda: dict(stats)
+
+    def applied(future: asyncio.Future) -> None:
+        if not future.cancelled() and future.exception() is None:
+            _publish_update(update_queue)
+
+    async def consume():
+        running = set(range(count))
+        while running:
+            message = await inbox.get()
+            if message[0] == "done":
+                running.discard(message[1])
+                continue
+            _, index, _host, hops = message
+            if writer is not None:
+                # Queue and read on: the writer merges whatever piles up
+                # meanwhile in one step, and the finally block syncs it.
+                writer.submit(hops).add_done_callback(applied)
+            else:
+                async with graph_lock:
+                    add_trace(G, hops)
+                _publish_update(update_queue)
+            stats["traces"] += 1
+            for ip, _ in hops:
+                if ip in seen_ips:
+                    continue
+                seen_ips.add(ip)
+                owner = shard_of(ip, count)
+                if owner != index:
+                    send(owner, ("target", ip))
+                    stats["routed"] += 1
+            if limit is not None and stats["traces"] >= limit:
+                stop_event.set()
+
+    print(f"[start] sharded scan — {count} processes")
+    consumer = asyncio.create_task(consume())
+    stopper = asyncio.create_task(stop_event.wait())
+    try:
+        await asyncio.wait({consumer, stopper}, return_when=asyncio.FIRST_COMPLETED)
+        if not consumer.done():
+            for index in range(count):
+                send(index, ("stop",))
+            try:
+                await asyncio.wait_for(consumer, timeout=shutdown_timeout)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        stopper.cancel()
+        consumer.cancel()
+        await asyncio.gather(stopper, consumer, return_exceptions=True)
+        if timer is not None:
+            timer.cancel()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.remove_signal_handler(sig)
+            except (NotImplementedError, RuntimeError, ValueError):
+                pass
+        for conn in connections:
+            try:
+                loop.remove_reader(conn.fileno())
+            except (OSError, ValueError):
+                pass
+        for process in processes:
+            await loop.run_in_executor(None, process.join, shutdown_timeout)
+            if process.is_alive():
+                process.terminate()
+        for conn in connections:
+            conn.close()
+        if writer is not None:
+            await writer.sync()
+        async with graph_lock:
+            save_graph(G, params.save_base)
+        if update_queue is not None:
+            sentinel = {"type": "shutdown"}
+            try:
+                update_queue.put_nowait(sentinel)
+            except QueueFull:
+                try:
+                    update_queue.get_nowait()
+                except QueueEmpty:
+                    pass
+                try:
+                    update_queue.put_nowait(sentinel)
+                except QueueFull:
+                    pass
+        print(f"[exit] merged {stats['traces']} traces from {count} processes.")
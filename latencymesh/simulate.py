@@ -0,0 +1,238 @@
+"""Synthetic network for scanning at any scale without touching the Internet.
+
+A :class:`SimulatedNetwork` derives every path from a seed, so the same seed
+always yields the same topology: a home gateway, an access tier and a core
+tier with equal-cost (ECMP) siblings, then aggregation routers per /16 and
+/20 and an edge router per /24 in front of the destination. Some routers
+never answer, some destinations are down, probes are lost and RTTs jitter.
+:class:`SimulatedProber` answers traces from it with the timing a real
+``traceroute`` would show, so ``--prober simulate`` drives ``lm scan`` and
+``lm serve`` end to end with no network access.
+"""
+
+import asyncio
+import hashlib
+import ipaddress
+import random
+from typing import List, Optional, Sequence, Tuple
+
+from .graph_ops import Hop, Trace
+from .probe import SubprocessProber
+
+GATEWAY = "192.168.1.1"
+# traceroute sends this many probes at once unless told otherwise (-N).
+DEFAULT_WINDOW = 16
+_CGNAT = int(ipaddress.IPv4Address("100.64.0.0"))
+
+# (ECMP siblings, RTT from the vantage point in ms) for one TTL.
+Level = Tuple[Tuple[str, ...], float]
+
+
+class SimulatedNetwork:
+    """Deterministic synthetic topology; per-probe randomness is seeded too.
+
+    ``tiers`` is the number of access, core and aggregation hops. ``ecmp``
+    parallel routers share each access and core hop; every probe picks one by
+    its flow hash, as classic traceroute does, so repeated traces reveal
+    diamonds. ``silent`` is the share of routers that never answer, ``alive``
+    the share of destinations that do, ``loss`` the per-probe loss rate and
+    ``jitter`` the largest extra delay as a fraction of the RTT.
+    """
+
+    def __init__(
+        self,
+        seed: int = 0,
+        *,
+        tiers: Sequence[int] = (2, 3, 2),
+        core_size: int = 256,
+        ecmp: int = 2,
+        silent: float = 0.05,
+        alive: float = 0.3,
+        loss: float = 0.01,
+        jitter: float = 0.2,
+    ) -> None:
+        self.seed = seed
+        self.tiers = tuple(tiers)
+        self.core_size = max(1, core_size)
+        self.ecmp = max(1, ecmp)
+        self.silent = silent
+        self.alive = alive
+        self.loss = loss
+        self.jitter = jitter
+        self.random = random.Random(seed)
+
+    def _hash(self, *key) -> int:
+        digest = hashlib.blake2b(repr((self.seed, *key)).encode(), digest_size=8)
+        return int.from_bytes(digest.digest(), "big")
+
+    def _fraction(self, *key) -> float:
+        return self._hash(*key) / 2**64
+
+    def _router(self, *key) -> str:
+        return str(ipaddress.IPv4Address(_CGNAT + self._hash(*key) % (1 << 22)))
+
+    def _latency(self, low: float, high: float, *key) -> float:
+        return low + (high - low) * self._fraction("latency", *key)
+
+    def is_silent(self, ip: str) -> bool:
+        return ip != GATEWAY and self._fraction("silent", ip) < self.silent
+
+    def is_alive(self, host: str) -> bool:
+        return self._fraction("alive", host) < self.alive
+
+    def levels(self, host: str) -> Tuple[List[Level], bool]:
+        """The routers at each TTL towards ``host``, and whether it answers."""
+
+        try:
+            address = ipaddress.ip_address(host)
+        except ValueError:
+            return [], False
+        if address.version != 4:
+            return [], False
+        access, core, aggregation = (list(self.tiers) + [0, 0, 0])[:3]
+        net16 = ipaddress.ip_network(f"{host}/16", strict=False)
+        rtt = 0.8
+        levels: List[Level] = [((GATEWAY,), rtt)]
+        for level in range(access):
+            rtt += self._latency(1.0, 4.0, "access", level)
+            siblings = tuple(self._router("access", level, j) for j in range(self.ecmp))
+            levels.append((siblings, rtt))
+        # The core is where distance lives: far /8s cost up to ~120 ms.
+        distance = self._latency(5.0, 120.0, "distance", host.split(".")[0])
+        for level in range(core):
+            rtt += distance / max(1, core)
+            base = self._hash("core", str(net16), level) % self.core_size
+            siblings = tuple(
+                self._router("core", (base + j) % self.core_size)
+                for j in range(self.ecmp)
+            )
+            levels.append((siblings, rtt))
+        for level in range(aggregation):
+            prefix = min(24, 16 + 4 * level)
+            network = ipaddress.ip_network(f"{host}/{prefix}", strict=False)
+            rtt += self._latency(0.5, 2.0, "aggregation", str(network))
+            levels.append(((self._router("aggregation", str(network)),), rtt))
+        net24 = ipaddress.ip_network(f"{host}/24", strict=False)
+        edge = str(net24.network_address + 1)
+        rtt += self._latency(0.3, 1.0, "edge", edge)
+        levels.append(((edge,), rtt))
+        rtt += self._latency(0.2, 0.5, "host", host)
+        levels.append(((host,), rtt))
+        for index, (siblings, _) in enumerate(levels[:-1]):
+            if host in siblings:
+                # The destination is itself a router on the way.
+                return levels[: index + 1], True
+        if not self.is_alive(host):
+            return levels[:-1], False
+        return levels, True
+
+    def answer(self, siblings: Tuple[str, ...], rtt: float) -> Optional[Hop]:
+        """One probe's reply at a level, or ``None`` if lost or unanswered."""
+
+        ip = siblings[self.random.getrandbits(16) % len(siblings)]
+        if self.is_silent(ip) or self.random.random() < self.loss:
+            return None
+        return ip, round(rtt * (1 + self.jitter * self.random.random()), 3)
+
+    def schedule(
+        self, host: str, wait: float, max_hops: int, first_ttl: int = 1, window=None
+    ) -> Tuple[List[Tuple[int, Hop, float]], float]:
+        """Replies as ``(ttl, hop, seconds after start)`` and the total duration.
+
+        Probes go out ``window`` TTLs at a time; a batch ends when its last
+        reply arrives, or after ``wait`` if any probe in it went unanswered.
+        The trace ends with the batch in which the destination answers, at
+        its own TTL or, if that reply was lost, any higher one. Like
+        ``traceroute``, replies come out in TTL order: a hop's time is when it
+        and every lower TTL have answered or timed out.
+        """
+
+        levels, reachable = self.levels(host)
+        window = window if window and window > 0 else DEFAULT_WINDOW
+        replies: List[Tuple[int, Hop, float]] = []
+        elapsed = printed = 0.0
+        ttl = first_ttl
+        while ttl <= max_hops:
+            batch_end, reached = 0.0, False
+            for ttl in range(ttl, min(max_hops, ttl + window - 1) + 1):
+                hop = None
+                if ttl <= len(levels):
+                    hop = self.answer(*levels[ttl - 1])
+                elif reachable:
+                    # A live destination answers every TTL that reaches it.
+                    hop = self.answer(*levels[-1])
+                if hop is None:
+                    batch_end = max(batch_end, wait)
+                    printed = max(printed, elapsed + wait)
+                    continue
+                at = hop[1] / 1000.0
+                printed = max(printed, elapsed + at)
+                replies.append((ttl, hop, printed))
+                batch_end = max(batch_end, at)
+                if reachable and ttl >= len(levels):
+                    reached = True
+                    break
+            elapsed += batch_end
+            if reached:
+                break
+            ttl += 1
+        return replies, elapsed
+
+
+class SimulatedProber(SubprocessProber):
+    """Answer traces from a :class:`SimulatedNetwork` instead of ``traceroute``.
+
+    Replies arrive after the simulated delays times ``time_scale``; ``0``
+    answers at once, for load tests that only exercise the pipeline.
+    """
+
+    name = "simulate"
+
+    def __init__(
+        self,
+        network: SimulatedNetwork,
+        window: Optional[int] = None,
+        limiter=None,
+        *,
+        timeouts=None,
+        time_scale: float = 1.0,
+    ) -> None:
+        super().__init__(window, limiter, timeouts=timeouts)
+        self.network = network
+        self.time_scale = time_scale
+
+    async def _pause(self, seconds: float) -> None:
+        await asyncio.sleep(max(0.0, seconds * self.time_scale))
+
+    async def _run(
+        self, host, wait, max_hops, logger, squeries=None, first_ttl=1
+    ) -> List[Hop]:
+        replies, duration = self.network.schedule(
+            host, wait, max_hops, first_ttl, squeries
+        )
+        await self._pause(duration)
+        return Trace([hop for _, hop, _ in replies], [ttl for ttl, _, _ in replies])
+
+    async def _stream(self, host, wait, max_hops, logger, squeries=None, first_ttl=1):
+        replies, duration = self.network.schedule(
+            host, wait, max_hops, first_ttl, squeries
+        )
+        now = 0.0
+        for ttl, hop, at in replies:
+            await self._pause(at - now)
+            now = at
+            logger.debug(f"[sim:{host}] {hop[0]} {hop[1]}ms")
+            yield ttl, hop
+        await self._pause(duration - now)
+
+
+def simulated_network(params) -> SimulatedNetwork:
+    """The network described by ``--sim-*`` options."""
+
+    return SimulatedNetwork(
+        getattr(params, "sim_seed", None) or 0,
+        ecmp=getattr(params, "sim_ecmp", None) or 2,
+        silent=getattr(params, "sim_silent", 0.05),
+        alive=getattr(params, "sim_alive", 0.3),
+        loss=getattr(params, "sim_loss", 0.01),
+    )
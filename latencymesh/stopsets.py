@@ -0,0 +1,60 @@
+"""Doubletree-style stop sets for redundancy-aware probing.
+
+A trace starts at a mid-path TTL and probes forwards until it reaches the
+destination or a hop already known to lead to the destination's prefix (the
+*global* stop set), then backwards until it meets an interface already seen at
+the same distance from this vantage point (the *local* stop set).
+"""
+
+from typing import Dict, Set, Tuple
+
+from .iptools import ip_prefix
+
+
+class StopSets:
+    """Local ``(interface, hop)`` and global ``(hop, destination prefix)`` sets.
+
+    Global entries remember how many hops separated the interface from the
+    destination when it was learned, so a forward stop can be credited with the
+    probes it avoided. ``probes_sent``/``probes_saved`` accumulate across every
+    trace that consulted the sets.
+    """
+
+    def __init__(self, start_ttl: int = 5) -> None:
+        self.start_ttl = max(1, int(start_ttl))
+        self.local: Set[Tuple[str, int]] = set()
+        self.global_: Dict[Tuple[str, str], int] = {}
+        self.probes_sent = 0
+        self.probes_saved = 0
+
+    def stops_backward(self, ip: str, ttl: int) -> bool:
+        return (ip, ttl) in self.local
+
+    def stops_forward(self, ip: str, destination: str) -> bool:
+        return (ip, ip_prefix(destination)) in self.global_
+
+    def remaining(self, ip: str, destination: str) -> int:
+        return self.global_.get((ip, ip_prefix(destination)), 0)
+
+    def record(self, destination: str, hops_by_ttl: Dict[int, str], reached: bool):
+        """Add the interfaces of a finished trace to both stop sets."""
+
+        prefix = ip_prefix(destination)
+        last_ttl = max(hops_by_ttl, default=0)
+        for ttl, ip in hops_by_ttl.items():
+            self.local.add((ip, ttl))
+            key = (ip, prefix)
+            distance = last_ttl - ttl if reached else 0
+            self.global_[key] = max(self.global_.get(key, 0), distance)
+
+    def account(self, sent: int, saved: int) -> None:
+        self.probes_sent += sent
+        self.probes_saved += max(0, saved)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "probes_sent": self.probes_sent,
+            "probes_saved": self.probes_saved,
+            "local_stop_set": len(self.local),
+            "global_stop_set": len(self.global_),
+        }
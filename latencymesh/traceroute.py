@@ -5,10 +5,31 @@ import re
 import time
 from asyncio import QueueEmpty, QueueFull
 
-from .graph_ops import add_trace
+from .graph_ops import Trace, add_trace
+from .profiling import span
 
 
-async def run_traceroute(host, timeout, max_hops, logger):
+def _parse_hop_line(raw: bytes):
+    """``(ttl, ip, rtt_ms)`` from one ``traceroute -n -q 1`` line, or ``None``."""
+
+    m = re.match(r"\s*(\d+)\s+(\S+)\s+([\d\.]+)\s+ms", raw.decode().strip())
+    if not m:
+        return None
+    ttl, ip, latency = m.groups()
+    if ip == "*":
+        return None
+    try:
+        ipaddress.ip_address(ip)
+    except ValueError:
+        return None
+    return int(ttl), ip, float(latency)
+
+
+async def stream_traceroute(
+    host, timeout, max_hops, logger, squeries=None, first_ttl=1
+):
+    """Yield ``(ttl, (ip, rtt))`` for each hop line as ``traceroute`` prints it."""
+
     cmd = [
         "traceroute",
         "-n",
@@ -18,29 +39,201 @@ async def run_traceroute(host, timeout, max_hops, logger):
         str(timeout),
         "-m",
         str(max_hops),
-        str(host),
     ]
-    proc = await asyncio.create_subprocess_exec(
-        *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL
-    )
-    hops = []
-    assert proc.stdout
-    async for raw in proc.stdout:
-        m = re.match(r"\s*\d+\s+(\S+)\s+([\d\.]+)\s+ms", raw.decode().strip())
-        if m:
-            ip, latency = m.groups()
-            if ip == "*":
-                continue
-            try:
-                ipaddress.ip_address(ip)
-            except ValueError:
+    if squeries is not None:
+        cmd += ["-N", str(squeries)]
+    if first_ttl > 1:
+        cmd += ["-f", str(first_ttl)]
+    cmd.append(str(host))
+    with span("spawn"):
+        proc = await asyncio.create_subprocess_exec(
+            *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL
+        )
+    finished = False
+    try:
+        assert proc.stdout
+        async for raw in proc.stdout:
+            with span("parse"):
+                hop = _parse_hop_line(raw)
+            if hop is None:
                 continue
+            ttl, ip, latency = hop
             logger.debug(f"[trace:{host}] {ip} {latency}ms")
-            hops.append((ip, float(latency)))
-    await proc.wait()
+            yield ttl, (ip, latency)
+        finished = True
+        await proc.wait()
+    finally:
+        if not finished and proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+
+
+async def run_traceroute(host, timeout, max_hops, logger, squeries=None, first_ttl=1):
+    hops = Trace()
+    async for ttl, hop in stream_traceroute(
+        host, timeout, max_hops, logger, squeries=squeries, first_ttl=first_ttl
+    ):
+        hops.append(hop)
+        hops.ttls.append(ttl)
     return hops
 
 
+def _ttl_window(host, params, prober, ttl_windows):
+    if prober is None or ttl_windows is None or not prober.supports_first_ttl:
+        return 1, params.max_hops, None
+    return ttl_windows.window(host, params.max_hops)
+
+
+def _attach_anchor(hops, anchor, first_ttl):
+    if anchor is None or not hops:
+        return hops
+    ttls = getattr(hops, "ttls", [])
+    return Trace([anchor, *hops], [first_ttl - 1, *ttls] if ttls else ())
+
+
+async def _probe_host(host, params, prober, ttl_windows, logger):
+    if prober is None:
+        return await run_traceroute(host, params.timeout, params.max_hops, logger)
+    if ttl_windows is None or not prober.supports_first_ttl:
+        return await prober.trace(host, params.timeout, params.max_hops, logger)
+    first_ttl, max_ttl, anchor = _ttl_window(host, params, prober, ttl_windows)
+    hops = await prober.trace(
+        host, params.timeout, max_ttl, logger, first_ttl=first_ttl
+    )
+    ttl_windows.observe(host, hops, first_ttl, max_ttl)
+    return _attach_anchor(hops, anchor, first_ttl)
+
+
+async def _stream_host(host, params, prober, ttl_windows, logger, on_segment):
+    """Probe ``host`` and hand each new path segment to ``on_segment`` at once.
+
+    A segment is the newly answered hop, preceded by the previous hop (or the
+    TTL-window anchor) so the edge between them can be ingested immediately.
+    """
+
+    first_ttl, max_ttl, anchor = _ttl_window(host, params, prober, ttl_windows)
+    if prober is None:
+        source = stream_traceroute(host, params.timeout, max_ttl, logger)
+    else:
+        source = prober.stream(
+            host, params.timeout, max_ttl, logger, first_ttl=first_ttl
+        )
+    hops = Trace()
+    previous = anchor
+    async for ttl, hop in source:
+        hops.append(hop)
+        hops.ttls.append(ttl)
+        await on_segment([previous, hop] if previous is not None else [hop])
+        previous = hop
+    if ttl_windows is not None and prober is not None and prober.supports_first_ttl:
+        ttl_windows.observe(host, hops, first_ttl, max_ttl)
+    return _attach_anchor(hops, anchor, first_ttl)
+
+
+async def _cached_path(host, path_cache, params, prober, logger):
+    """Serve ``host`` from ``path_cache`` when its cached path is still fresh.
+
+    Returns ``None`` when ``host`` needs a full trace, an empty trace when the
+    cache says to skip it, and otherwise the measured last-hop segment.
+    """
+
+    entry = path_cache.lookup(host)
+    if entry is None:
+        return None
+    if path_cache.mode == "skip":
+        return Trace()
+    ttl = entry.last_ttl
+    try:
+        if prober is None:
+            hops = await run_traceroute(
+                host, params.timeout, ttl, logger, first_ttl=ttl
+            )
+        elif prober.supports_first_ttl:
+            hops = await prober.trace(host, params.timeout, ttl, logger, first_ttl=ttl)
+        else:
+            hops = []
+    except Exception as e:
+        logger.debug(f"[trace:{host}] last-hop check failed: {e}")
+        hops = []
+    for hop in hops:
+        if hop[0] == host:
+            return path_cache.confirm(host, entry, hop)
+    # Gone, or further away than before: the path changed.
+    path_cache.invalidate(host)
+    return None
+
+
+async def _join_in_flight(host, inflight, path_cache):
+    """Claim ``host`` in ``inflight``, first waiting out a trace already running.
+
+    Returns ``(covered, sibling)``. ``covered`` is ``True`` when that trace
+    was of ``host`` itself, so it needs no probe of its own. ``sibling`` is
+    ``True`` when a trace of another host in the same /24 ran first and a
+    per-/24 path cache may now confirm ``host`` with one probe; the caller
+    counts it as coalesced only if the cache actually serves it.
+    """
+
+    sibling = False
+    while True:
+        running = inflight.claim(host)
+        if running is None:
+            return False, sibling
+        traced = await asyncio.shield(running)
+        if traced == host:
+            inflight.coalesced += 1
+            return True, sibling
+        # Claim again: with a /24 cache the last-hop check may serve the rest.
+        sibling = path_cache is not None and path_cache.by_prefix
+
+
+async def _ingest(G, hops, graph_lock, metrics=None):
+    if graph_lock is not None:
+        waited = time.perf_counter()
+        async with graph_lock:
+            if metrics is not None:
+                metrics.lock_wait.observe(time.perf_counter() - waited)
+            return add_trace(G, hops)
+    return add_trace(G, hops)
+
+
+def _publish_update(update_queue):
+    if update_queue is None:
+        return
+    payload = {"type": "graph", "timestamp": time.time()}
+    try:
+        update_queue.put_nowait(payload)
+    except QueueFull:
+        try:
+            update_queue.get_nowait()
+        except QueueEmpty:
+            pass
+        try:
+            update_queue.put_nowait(payload)
+        except QueueFull:
+            pass
+
+
+async def _enqueue_discovered(ip, queue, seen_ips, pending_ips, owns=None):
+    if owns is not None and not owns(ip):
+        # Another shard traces this address.
+        return
+    if ip not in seen_ips:
+        seen_ips.add(ip)
+        if ip not in pending_ips:
+            await queue.put(ip)
+            pending_ips.add(ip)
+    elif ip not in pending_ips:
+        # A frontier plans revisits; a plain queue samples them at random.
+        wants_revisit = getattr(queue, "wants_revisit", None)
+        if wants_revisit is not None:
+            revisit = wants_revisit(ip)
+        else:
+            revisit = random.random() < 0.02
+        if revisit:
+            await queue.put(ip)
+            pending_ips.add(ip)
+
+
 async def traceroute_worker(
     worker_id,
     G,
@@ -54,31 +247,95 @@ async def traceroute_worker(
     logger,
     graph_lock=None,
     update_queue=None,
+    prober=None,
+    ttl_windows=None,
+    retire_event=None,
+    scan_stats=None,
+    refresh=None,
+    owns=None,
+    trace_sink=None,
+    path_cache=None,
+    inflight=None,
+    metrics=None,
+    writer=None,
 ):
     pps = max(0.001, float(params.pps))
     delay_between = 1.0 / pps
-    while not stop_event.is_set():
-        try:
-            host = await asyncio.wait_for(queue.get(), timeout=1.0)
-        except asyncio.TimeoutError:
-            continue
-        if host is None:
-            queue.task_done()
-            break
+    # A global probe budget paces packets itself; no per-worker pause needed.
+    if getattr(params, "probe_rate", None):
+        delay_between = 0.0
+    streaming = bool(getattr(params, "stream", False))
+    record_yield = getattr(queue, "record_yield", None)
+    new_edges = 0
+
+    async def merge(hops):
+        if writer is not None:
+            return await writer.add(hops)
+        return await _ingest(G, hops, graph_lock, metrics)
+
+    async def on_segment(segment):
+        nonlocal new_edges
+        new_edges += await merge(segment) or 0
+        _publish_update(update_queue)
+        await _enqueue_discovered(segment[-1][0], queue, seen_ips, pending_ips, owns)
+
+    def count(key, started):
+        if scan_stats is not None:
+            scan_stats[key] = scan_stats.get(key, 0) + 1
+        if metrics is not None:
+            metrics.trace_seconds.observe(time.perf_counter() - started)
+            getattr(metrics, key).inc()
+
+    async def handle(host, sibling=False):
+        """Trace ``host`` and ingest the result; return the pause before the next."""
+
+        nonlocal new_edges
+        new_edges = 0
+        if path_cache is not None:
+            cached = await _cached_path(host, path_cache, params, prober, logger)
+            if cached is not None:
+                if sibling:
+                    inflight.coalesced += 1
+                if cached:
+                    await merge(cached)
+                    _publish_update(update_queue)
+                    if refresh is not None:
+                        refresh.observe(host, False)
+                    if trace_sink is not None:
+                        trace_sink(host, cached)
+                pending_ips.discard(host)
+                queue.task_done()
+                return delay_between if cached else 0.0
+        started = time.perf_counter()
         try:
-            hops = await run_traceroute(host, params.timeout, params.max_hops, logger)
+            with span("trace"):
+                if streaming:
+                    hops = await _stream_host(
+                        host, params, prober, ttl_windows, logger, on_segment
+                    )
+                else:
+                    hops = await _probe_host(host, params, prober, ttl_windows, logger)
         except Exception as e:
             logger.warning(f"[worker-{worker_id}] traceroute error {host}: {e}")
+            count("errors", started)
             queue.task_done()
-            await asyncio.sleep(delay_between)
-            continue
+            return delay_between
+        count("traces" if hops else "empty_traces", started)
         total_now = None
         if hops:
-            if graph_lock is not None:
-                async with graph_lock:
-                    add_trace(G, hops)
-            else:
-                add_trace(G, hops)
+            if not streaming:
+                new_edges = await merge(hops) or 0
+            if record_yield is not None:
+                record_yield(host, new_edges)
+            if path_cache is not None:
+                path_cache.store(host, hops)
+            if refresh is not None:
+                for ip, _ in hops:
+                    if ip != host:
+                        refresh.touch(ip)
+                refresh.observe(host, new_edges > 0)
+            if trace_sink is not None:
+                trace_sink(host, hops)
             total_now = None
             limit_reached = False
             async with counter_lock:
@@ -95,28 +352,35 @@ async def traceroute_worker(
                 stop_event.set()
             if "notify" in success_counter:
                 success_counter["notify"]()
-            if update_queue is not None:
-                payload = {"type": "graph", "timestamp": time.time()}
-                try:
-                    update_queue.put_nowait(payload)
-                except QueueFull:
-                    try:
-                        update_queue.get_nowait()
-                    except QueueEmpty:
-                        pass
-                    try:
-                        update_queue.put_nowait(payload)
-                    except QueueFull:
-                        pass
-            for ip, _ in hops:
-                if ip not in seen_ips:
-                    seen_ips.add(ip)
-                    if ip not in pending_ips:
-                        await queue.put(ip)
-                        pending_ips.add(ip)
-                elif ip not in pending_ips and random.random() < 0.02:
-                    await queue.put(ip)
-                    pending_ips.add(ip)
+            if not streaming:
+                _publish_update(update_queue)
+                for ip, _ in hops:
+                    await _enqueue_discovered(ip, queue, seen_ips, pending_ips, owns)
         pending_ips.discard(host)
         queue.task_done()
-        await asyncio.sleep(delay_between * (0.8 + 0.4 * random.random()))
+        return delay_between * (0.8 + 0.4 * random.random())
+
+    while not stop_event.is_set():
+        if retire_event is not None and retire_event.is_set():
+            break
+        try:
+            host = await asyncio.wait_for(queue.get(), timeout=1.0)
+        except asyncio.TimeoutError:
+            continue
+        if host is None:
+            queue.task_done()
+            break
+        sibling = False
+        if inflight is not None:
+            covered, sibling = await _join_in_flight(host, inflight, path_cache)
+            if covered:
+                pending_ips.discard(host)
+                queue.task_done()
+                continue
+        try:
+            pause = await handle(host, sibling)
+        finally:
+            # Release before pausing so waiting workers are not held up.
+            if inflight is not None:
+                inflight.release(host)
+        await asyncio.sleep(pause)
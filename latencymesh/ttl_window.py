@@ -0,0 +1,106 @@
+"""Per-prefix TTL windows learned from completed traces.
+
+Traces towards one /24 share most of their path. Once a prefix has enough
+samples, later traces start at the first hop that differs between them and
+stop a few hops past the usual destination distance instead of always probing
+``1..max_hops``.
+"""
+
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from .graph_ops import Hop
+from .iptools import ip_prefix
+
+
+@dataclass
+class PrefixWindow:
+    samples: int = 0
+    distance: Optional[float] = None
+    # Hops shared by every trace towards the prefix, indexed by ``ttl - 1``.
+    shared: List[Hop] = field(default_factory=list)
+
+
+class TTLWindows:
+    """Learn ``(first_ttl, max_ttl)`` per destination prefix.
+
+    ``distance`` is an exponentially weighted average of the TTL at which the
+    destination (or the last responsive hop) answered. The window opens at the
+    first hop past the shared prefix path and closes ``margin`` hops past the
+    average distance. A trace that runs into the end of its window resets the
+    prefix so the next one probes the full range again.
+    """
+
+    def __init__(self, margin: int = 2, min_samples: int = 2, alpha: float = 0.25):
+        self.margin = margin
+        self.min_samples = min_samples
+        self.alpha = alpha
+        self._prefixes: Dict[str, PrefixWindow] = {}
+
+    def window(self, host: str, max_hops: int) -> Tuple[int, int, Optional[Hop]]:
+        """Return ``(first_ttl, max_ttl, anchor)`` for the next trace to ``host``.
+
+        ``anchor`` is the last shared hop, to be prepended to the probed hops
+        so the new path segment stays attached to the known one.
+        """
+
+        state = self._prefixes.get(ip_prefix(host))
+        if state is None or state.samples < self.min_samples:
+            return 1, max_hops, None
+        max_ttl = min(max_hops, int(state.distance + 0.5) + self.margin)
+        first_ttl = min(len(state.shared) + 1, max_ttl)
+        anchor = state.shared[first_ttl - 2] if first_ttl > 1 else None
+        return first_ttl, max_ttl, anchor
+
+    def observe(self, host: str, hops: List[Hop], first_ttl: int, max_ttl: int):
+        """Fold a finished trace probed over ``first_ttl..max_ttl`` into its prefix."""
+
+        if not hops:
+            return
+        ttls = getattr(hops, "ttls", None) or range(first_ttl, first_ttl + len(hops))
+        by_ttl = dict(zip(ttls, hops))
+        prefix = ip_prefix(host)
+        state = self._prefixes.setdefault(prefix, PrefixWindow())
+        last_ttl = max(by_ttl)
+        reached = by_ttl[last_ttl][0] == host
+        if not reached and last_ttl >= max_ttl and state.samples >= self.min_samples:
+            # The path may be longer than the window; start over.
+            self._prefixes[prefix] = PrefixWindow()
+            return
+        if state.distance is None:
+            state.distance = float(last_ttl)
+        else:
+            state.distance += self.alpha * (last_ttl - state.distance)
+        if state.samples == 0:
+            state.shared = self._contiguous(by_ttl, 1, last_ttl)
+        else:
+            keep = first_ttl - 1
+            for ttl in range(first_ttl, len(state.shared) + 1):
+                hop = by_ttl.get(ttl)
+                if hop is None or hop[0] != state.shared[ttl - 1][0]:
+                    break
+                keep = ttl
+            state.shared = state.shared[:keep]
+        # The destination itself is never part of the shared path.
+        if state.shared and state.shared[-1][0] == host:
+            state.shared.pop()
+        state.samples += 1
+
+    @staticmethod
+    def _contiguous(by_ttl: Dict[int, Hop], first: int, last: int) -> List[Hop]:
+        hops: List[Hop] = []
+        for ttl in range(first, last + 1):
+            if ttl not in by_ttl:
+                break
+            hops.append(by_ttl[ttl])
+        return hops
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "prefixes": len(self._prefixes),
+            "learned": sum(
+                1
+                for state in self._prefixes.values()
+                if state.samples >= self.min_samples
+            ),
+        }
@@ -1,4 +1,6 @@
 import asyncio
+import threading
+
 from .viz import draw_map
 
 
@@ -11,8 +13,35 @@ async def ui_manager(
     success_counter,
     counter_lock,
     graph_lock=None,
+    writer=None,
 ):
+    """Redraw the map as traces arrive, and once more when stopped.
+
+    With a :class:`~latencymesh.writer.GraphWriter` the map is drawn from its
+    read-only views in a worker thread, one draw at a time, and the task runs
+    until it is cancelled, which the scan does only after draining the writer.
+    """
+
     event = asyncio.Event()
+    layout = getattr(params, "layout", "radial")
+    # A draw left running in a thread by a cancelled redraw still owns ``ax``.
+    drawing = threading.Lock()
+
+    def draw_view(view):
+        with drawing:
+            draw_map(view.graph, save_base, ax, layout=layout)
+
+    async def redraw():
+        if writer is not None:
+            # Draw the writer's read-only view in a thread; ingestion carries on
+            # meanwhile.
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, draw_view, writer.view())
+        elif graph_lock is not None:
+            async with graph_lock:
+                draw_map(G, save_base, ax, layout=layout)
+        else:
+            draw_map(G, save_base, ax, layout=layout)
 
     def notify():
         event.set()
@@ -28,21 +57,7 @@ async def ui_manager(
                     )
                     break
                 except asyncio.TimeoutError:
-                    if graph_lock is not None:
-                        async with graph_lock:
-                            draw_map(
-                                G,
-                                save_base,
-                                ax,
-                                layout=getattr(params, "layout", "radial"),
-                            )
-                    else:
-                        draw_map(
-                            G,
-                            save_base,
-                            ax,
-                            layout=getattr(params, "layout", "radial"),
-                        )
+                    await redraw()
                     async with counter_lock:
                         success_counter["since_last_draw"] = 0
             else:
@@ -51,36 +66,14 @@ async def ui_manager(
                 async with counter_lock:
                     count = success_counter.get("since_last_draw", 0)
                 if count >= max(1, int(params.update_count)):
-                    if graph_lock is not None:
-                        async with graph_lock:
-                            draw_map(
-                                G,
-                                save_base,
-                                ax,
-                                layout=getattr(params, "layout", "radial"),
-                            )
-                    else:
-                        draw_map(
-                            G,
-                            save_base,
-                            ax,
-                            layout=getattr(params, "layout", "radial"),
-                        )
+                    await redraw()
                     async with counter_lock:
                         success_counter["since_last_draw"] = 0
+        if writer is not None:
+            # The scan cancels this task once the writer is drained, so the
+            # last image includes the traces its workers left queued.
+            await asyncio.get_running_loop().create_future()
     finally:
-        if graph_lock is not None:
-            async with graph_lock:
-                draw_map(
-                    G,
-                    save_base,
-                    ax,
-                    layout=getattr(params, "layout", "radial"),
-                )
-        else:
-            draw_map(
-                G,
-                save_base,
-                ax,
-                layout=getattr(params, "layout", "radial"),
-            )
+        if writer is not None:
+            await writer.sync()
+        await redraw()
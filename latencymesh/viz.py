@@ -6,6 +6,7 @@ import matplotlib.pyplot as plt
 import networkx as nx
 
 from .graph_ops import compute_positions
+from .profiling import profiled
 
 
 def _layout_positions(G: nx.Graph, layout: str):
@@ -19,6 +20,7 @@ def _layout_positions(G: nx.Graph, layout: str):
     return compute_positions(G)
 
 
+@profiled("draw_map")
 def draw_map(
     G, save_base, ax, *, layout: str = "radial", output_path: Optional[str] = None
 ):
@@ -3,16 +3,27 @@
 from __future__ import annotations
 
 import asyncio
+import gzip
 import json
+import time
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Iterable, Optional
 
 import networkx as nx
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import (
+    FileResponse,
+    JSONResponse,
+    PlainTextResponse,
+    Response,
+    StreamingResponse,
+)
 from fastapi.staticfiles import StaticFiles
 
+from .metrics import CONTENT_TYPE, ScanMetrics
+from .profiling import span
+
 STATIC_DIR = Path(__file__).with_name("webapp").joinpath("static")
 
 
@@ -53,40 +64,105 @@ def _safe_value(value: Any) -> Any:
     return str(value)
 
 
-async def _graph_snapshot(
-    graph: nx.Graph, graph_lock: asyncio.Lock, version: int
-) -> Dict[str, Any]:
-    async with graph_lock:
-        nodes = [
-            {"id": str(node), **{k: _safe_value(v) for k, v in data.items()}}
-            for node, data in graph.nodes(data=True)
-        ]
-        edges = [
-            {
-                "source": str(u),
-                "target": str(v),
-                **{k: _safe_value(val) for k, val in attributes.items()},
-            }
-            for u, v, attributes in graph.edges(data=True)
-        ]
+def _graph_elements(graph: nx.Graph) -> Dict[str, Any]:
+    return _elements(graph.nodes(data=True), graph.edges(data=True))
+
+
+def _elements(node_items: Iterable, edge_items: Iterable) -> Dict[str, Any]:
+    nodes = [
+        {"id": str(node), **{k: _safe_value(v) for k, v in data.items()}}
+        for node, data in node_items
+    ]
+    edges = [
+        {
+            "source": str(u),
+            "target": str(v),
+            **{k: _safe_value(val) for k, val in attributes.items()},
+        }
+        for u, v, attributes in edge_items
+    ]
+    return {"nodes": nodes, "links": edges}
+
+
+def _snapshot_payload(version: int, elements: Dict[str, Any]) -> Dict[str, Any]:
     return {
         "version": version,
         "generated_at": datetime.utcnow().isoformat() + "Z",
-        "nodes": nodes,
-        "links": edges,
+        **elements,
     }
 
 
-async def _graph_stats(graph: nx.Graph, graph_lock: asyncio.Lock) -> Dict[str, Any]:
+async def _graph_snapshot(
+    graph: nx.Graph, graph_lock: asyncio.Lock, version: int
+) -> Dict[str, Any]:
     async with graph_lock:
-        num_nodes = graph.number_of_nodes()
-        num_edges = graph.number_of_edges()
-        degrees = list(dict(graph.degree()).values()) if num_nodes else []
-        latencies = [
-            data.get("rtt")
-            for _, data in graph.nodes(data=True)
-            if data.get("rtt") is not None
-        ]
+        elements = _graph_elements(graph)
+    return _snapshot_payload(version, elements)
+
+
+async def _serialized_snapshot(
+    graph: nx.Graph, graph_lock: asyncio.Lock, version: int, metrics: ScanMetrics
+) -> str:
+    """:func:`_graph_snapshot` as JSON text, timed apart from the lock wait."""
+
+    waited = time.perf_counter()
+    async with graph_lock:
+        started = time.perf_counter()
+        metrics.lock_wait.observe(started - waited)
+        with span("snapshot"):
+            elements = _graph_elements(graph)
+    with span("snapshot_json"):
+        body = json.dumps(_snapshot_payload(version, elements))
+    metrics.snapshot_seconds.observe(time.perf_counter() - started)
+    return body
+
+
+def _encode_snapshot(view, version: int) -> str:
+    with span("snapshot"):
+        elements = _elements(view.nodes, view.edges)
+    with span("snapshot_json"):
+        return json.dumps(_snapshot_payload(version, elements))
+
+
+class _ViewSnapshots:
+    """Snapshots of a writer's read-only views, encoded off the event loop.
+
+    Each (view, broadcast version) pair is encoded once in a worker thread and
+    shared by every request and stream subscriber asking for it meanwhile.
+    """
+
+    def __init__(self, writer, metrics: ScanMetrics) -> None:
+        self.writer = writer
+        self.metrics = metrics
+        self._key: Optional[tuple] = None
+        self._body: Optional[asyncio.Future] = None
+
+    async def get(self, version: int) -> str:
+        view = self.writer.view()
+        key = (view.version, version)
+        if key != self._key:
+            started = time.perf_counter()
+            loop = asyncio.get_running_loop()
+            body = loop.run_in_executor(None, _encode_snapshot, view, version)
+            body.add_done_callback(
+                lambda _body: self.metrics.snapshot_seconds.observe(
+                    time.perf_counter() - started
+                )
+            )
+            self._key, self._body = key, body
+        # One subscriber going away must not cancel the others' snapshot.
+        return await asyncio.shield(self._body)
+
+
+def _graph_summary(graph: nx.Graph) -> Dict[str, Any]:
+    num_nodes = graph.number_of_nodes()
+    num_edges = graph.number_of_edges()
+    degrees = list(dict(graph.degree()).values()) if num_nodes else []
+    latencies = [
+        data.get("rtt")
+        for _, data in graph.nodes(data=True)
+        if data.get("rtt") is not None
+    ]
     return {
         "nodes": num_nodes,
         "edges": num_edges,
@@ -95,13 +171,40 @@ async def _graph_stats(graph: nx.Graph, graph_lock: asyncio.Lock) -> Dict[str, A
     }
 
 
-def _format_sse(payload: Dict[str, Any]) -> str:
-    return f"data: {json.dumps(payload)}\n\n"
+async def _graph_stats(graph: nx.Graph, graph_lock: asyncio.Lock) -> Dict[str, Any]:
+    async with graph_lock:
+        return _graph_summary(graph)
+
+
+def _resolve_scan_stats(scan_stats: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        key: value() if callable(value) else value for key, value in scan_stats.items()
+    }
+
+
+def _format_sse(payload: Any) -> str:
+    if not isinstance(payload, str):
+        payload = json.dumps(payload)
+    return f"data: {payload}\n\n"
 
 
 def create_app(
-    graph: nx.Graph, graph_lock: asyncio.Lock, broadcast: GraphBroadcast
+    graph: nx.Graph,
+    graph_lock: asyncio.Lock,
+    broadcast: GraphBroadcast,
+    scan_stats: Optional[Dict[str, Any]] = None,
+    collector: Optional[Any] = None,
+    coordinator: Optional[Any] = None,
+    metrics: Optional[ScanMetrics] = None,
+    writer: Optional[Any] = None,
 ) -> FastAPI:
+    """The dashboard and API over ``graph``.
+
+    Readers take ``graph_lock``, unless a
+    :class:`~latencymesh.writer.GraphWriter` owns the graph: then they read its
+    versioned views and never wait for, or hold up, ingestion.
+    """
+
     if not STATIC_DIR.exists():
         raise RuntimeError(
             "Static assets missing. Expected directory at "
@@ -113,6 +216,13 @@ def create_app(
     app.state.graph = graph
     app.state.graph_lock = graph_lock
     app.state.broadcast = broadcast
+    app.state.scan_stats = scan_stats
+    if metrics is None:
+        metrics = ScanMetrics()
+        metrics.bind(graph=graph)
+    app.state.metrics = metrics
+    app.state.writer = writer
+    views = _ViewSnapshots(writer, metrics) if writer is not None else None
 
     @app.get("/", response_class=FileResponse)
     async def index() -> FileResponse:
@@ -121,45 +231,95 @@ def create_app(
             raise HTTPException(status_code=500, detail="index.html missing")
         return FileResponse(index_path)
 
-    @app.get("/api/graph")
-    async def api_graph() -> JSONResponse:
-        snapshot = await _graph_snapshot(
-            app.state.graph, app.state.graph_lock, broadcast.version
+    async def snapshot(version: int) -> str:
+        if views is not None:
+            return await views.get(version)
+        return await _serialized_snapshot(
+            app.state.graph, app.state.graph_lock, version, metrics
         )
-        return JSONResponse(snapshot)
+
+    @app.get("/api/graph")
+    async def api_graph() -> Response:
+        body = await snapshot(broadcast.version)
+        return Response(body, media_type="application/json")
 
     @app.get("/api/stats")
     async def api_stats() -> JSONResponse:
-        stats = await _graph_stats(app.state.graph, app.state.graph_lock)
+        if writer is not None:
+            stats = writer.summary()
+        else:
+            stats = await _graph_stats(app.state.graph, app.state.graph_lock)
         stats["version"] = broadcast.version
+        if app.state.scan_stats is not None:
+            stats["scan"] = _resolve_scan_stats(app.state.scan_stats)
         return JSONResponse(stats)
 
+    @app.get("/metrics")
+    async def api_metrics() -> PlainTextResponse:
+        return PlainTextResponse(
+            metrics.render(app.state.scan_stats), media_type=CONTENT_TYPE
+        )
+
     @app.get("/api/stream")
     async def api_stream() -> StreamingResponse:
         async def event_generator():
-            version = broadcast.version
-            snapshot = await _graph_snapshot(
-                app.state.graph, app.state.graph_lock, version
-            )
-            yield _format_sse(snapshot)
-            heartbeat = 15.0
-            while True:
-                try:
-                    next_version = await asyncio.wait_for(
-                        broadcast.wait_for(version), timeout=heartbeat
-                    )
-                except asyncio.TimeoutError:
-                    yield ": heartbeat\n\n"
-                    continue
-                if next_version is None:
-                    yield "event: shutdown\n\n"
-                    break
-                version = next_version
-                snapshot = await _graph_snapshot(
-                    app.state.graph, app.state.graph_lock, version
-                )
-                yield _format_sse(snapshot)
+            metrics.sse_clients.inc()
+            try:
+                version = broadcast.version
+                yield _format_sse(await snapshot(version))
+                heartbeat = 15.0
+                while True:
+                    try:
+                        next_version = await asyncio.wait_for(
+                            broadcast.wait_for(version), timeout=heartbeat
+                        )
+                    except asyncio.TimeoutError:
+                        yield ": heartbeat\n\n"
+                        continue
+                    if next_version is None:
+                        yield "event: shutdown\n\n"
+                        break
+                    version = next_version
+                    yield _format_sse(await snapshot(version))
+            finally:
+                metrics.sse_clients.dec()
 
         return StreamingResponse(event_generator(), media_type="text/event-stream")
 
+    if collector is not None:
+
+        @app.post("/api/collect")
+        async def api_collect(request: Request) -> JSONResponse:
+            body = await request.body()
+            try:
+                if request.headers.get("content-encoding") == "gzip":
+                    body = gzip.decompress(body)
+                accepted = await collector.ingest(json.loads(body))
+            except (OSError, ValueError) as exc:
+                raise HTTPException(status_code=400, detail=str(exc))
+            return JSONResponse({"accepted": accepted})
+
+    if coordinator is not None:
+
+        @app.post("/api/lease")
+        async def api_lease(request: Request) -> Response:
+            try:
+                payload = await request.json()
+            except ValueError:
+                payload = None
+            if not isinstance(payload, dict):
+                payload = {}
+            client = request.client.host if request.client else "unknown"
+            agent = str(payload.get("agent") or client)
+            lease = coordinator.lease(agent)
+            if lease is None:
+                return Response(status_code=204)
+            return JSONResponse(lease)
+
+        @app.post("/api/lease/{lease_id}/complete")
+        async def api_lease_complete(lease_id: int) -> JSONResponse:
+            if not coordinator.complete(lease_id):
+                raise HTTPException(status_code=404, detail="unknown lease")
+            return JSONResponse({"completed": lease_id})
+
     return app
@@ -0,0 +1,342 @@
+"""Single-writer ownership of the live graph.
+
+A :class:`GraphWriter` task is the only code that mutates the graph. Workers,
+the collector and the sharded consumer submit traces (or small mutation
+functions) to its inbox; it applies everything queued in one step, with one
+shared timestamp, and bumps its version. Readers never touch the live graph:
+:meth:`GraphWriter.view` hands out an immutable snapshot for the current
+version, shared by every reader until the next write. Snapshots are kept up
+to date incrementally (only the nodes and links a step touched are copied
+again), so taking one costs a list copy rather than a graph copy, and a slow
+reader can take its view to a thread while the writer carries on.
+"""
+
+import asyncio
+import time
+from collections import deque
+from functools import cached_property
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Hashable,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+
+import networkx as nx
+
+from .graph_ops import Hop, add_traces
+
+_TRACE, _APPLY = "trace", "apply"
+
+NodeItem = Tuple[Hashable, Dict[str, Any]]
+EdgeItem = Tuple[Hashable, Hashable, Dict[str, Any]]
+
+
+def _edge_key(u, v) -> Tuple[Hashable, Hashable]:
+    return (u, v) if u <= v else (v, u)
+
+
+class GraphView:
+    """The graph as of writer version ``version``, as immutable items.
+
+    ``nodes`` holds ``(node, attributes)`` and ``edges`` ``(u, v, attributes)``
+    pairs; the attribute dicts are private copies that are never modified.
+    :attr:`graph` builds a frozen networkx graph from them on first use,
+    which is safe (and best done) in a worker thread.
+    """
+
+    def __init__(
+        self,
+        nodes: List[NodeItem],
+        edges: List[EdgeItem],
+        version: int,
+        summary: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        self.nodes = nodes
+        self.edges = edges
+        self.version = version
+        self.summary = summary or {}
+        self.created_at = time.time()
+
+    @cached_property
+    def graph(self) -> nx.Graph:
+        graph = nx.Graph()
+        graph.add_nodes_from(self.nodes)
+        graph.add_edges_from(self.edges)
+        return nx.freeze(graph)
+
+
+class GraphWriter:
+    """Own ``graph`` and apply every mutation from one task.
+
+    Each step applies up to ``max_batch`` queued submissions in order;
+    consecutive traces are merged by one :func:`add_traces` call. With
+    ``max_delay`` above ``0`` a step that found a partial batch waits that
+    long for more. Submitters that are cancelled while waiting still have
+    their trace applied; :meth:`close` drains whatever is left.
+
+    Every step records which nodes and links it touched; :meth:`view` and
+    :meth:`summary` re-copy only those into the writer's item mirror. An
+    :meth:`apply` that does not say what it ``touches`` makes the next one
+    rebuild the mirror from the whole graph.
+    """
+
+    def __init__(
+        self,
+        graph: nx.Graph,
+        *,
+        max_batch: int = 32,
+        max_delay: float = 0.0,
+        metrics=None,
+    ) -> None:
+        self.graph = graph
+        self.max_batch = max(1, max_batch)
+        self.max_delay = max_delay
+        self.metrics = metrics
+        self.version = 0
+        self._inbox: Deque[Tuple[str, Any, asyncio.Future]] = deque()
+        self._ready = asyncio.Event()
+        self._full = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self._view: Optional[GraphView] = None
+        self._nodes: Dict[Hashable, NodeItem] = {}
+        self._edges: Dict[Tuple[Hashable, Hashable], EdgeItem] = {}
+        self._rtt_sum = 0.0
+        self._rtt_count = 0
+        self._dirty_nodes: Set[Hashable] = set()
+        self._dirty_edges: Set[Tuple[Hashable, Hashable]] = set()
+        self._stale = True
+        self.batches = 0
+        self.traces = 0
+        self.views = 0
+
+    def _submit(self, kind: str, payload: Any) -> asyncio.Future:
+        if self._closing:
+            raise RuntimeError("graph writer is closed")
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+        future = asyncio.get_running_loop().create_future()
+        self._inbox.append((kind, payload, future))
+        self._ready.set()
+        if len(self._inbox) >= self.max_batch:
+            self._full.set()
+        return future
+
+    async def add(self, hops: List[Hop]) -> int:
+        """Merge ``hops``; return how many new edges they added."""
+
+        return await self._submit(_TRACE, hops)
+
+    def submit(self, hops: List[Hop]) -> asyncio.Future:
+        """Queue ``hops`` without waiting; the future resolves like :meth:`add`."""
+
+        return self._submit(_TRACE, hops)
+
+    async def apply(
+        self,
+        mutate: Callable[[nx.Graph], Any],
+        touches: Optional[Iterable[List[Hop]]] = None,
+    ) -> Any:
+        """Run ``mutate(graph)`` on the writer, in order with queued traces.
+
+        ``touches`` lists the traces whose hops and links ``mutate`` may add
+        or change; ``None`` means it may change anything.
+        """
+
+        return await self._submit(_APPLY, (mutate, touches))
+
+    async def sync(self) -> None:
+        """Wait until everything submitted so far has been applied."""
+
+        if self._inbox:
+            await asyncio.shield(self._submit(_APPLY, (lambda _graph: None, ())))
+
+    def view(self) -> GraphView:
+        """The immutable snapshot for the current version."""
+
+        view = self._view
+        if view is None or view.version != self.version:
+            self._refresh()
+            view = GraphView(
+                list(self._nodes.values()),
+                list(self._edges.values()),
+                self.version,
+                self.summary(),
+            )
+            self._view = view
+            self.views += 1
+        return view
+
+    def summary(self) -> Dict[str, Any]:
+        """Node, edge, degree and latency totals, from the running counters."""
+
+        self._refresh()
+        nodes, edges = len(self._nodes), len(self._edges)
+        return {
+            "nodes": nodes,
+            "edges": edges,
+            "avg_degree": 2 * edges / nodes if nodes else 0.0,
+            "avg_latency": self._rtt_sum / self._rtt_count if self._rtt_count else 0.0,
+        }
+
+    def _touch(self, traces: Iterable[List[Hop]]) -> None:
+        if self._stale:
+            return
+        for hops in traces:
+            prev = None
+            for ip, _ in hops:
+                self._dirty_nodes.add(ip)
+                if prev is not None:
+                    self._dirty_edges.add(_edge_key(prev, ip))
+                prev = ip
+
+    def _refresh(self) -> None:
+        if self._stale:
+            self._rebuild()
+            return
+        graph = self.graph
+        for node in self._dirty_nodes:
+            self._forget_rtt(self._nodes.pop(node, None))
+            if node in graph:
+                item = (node, dict(graph.nodes[node]))
+                self._nodes[node] = item
+                self._count_rtt(item)
+        adjacency = graph.adj
+        for key in self._dirty_edges:
+            u, v = key
+            data = adjacency.get(u, {}).get(v)
+            if data is None:
+                self._edges.pop(key, None)
+            else:
+                self._edges[key] = (u, v, dict(data))
+        self._dirty_nodes.clear()
+        self._dirty_edges.clear()
+
+    def _rebuild(self) -> None:
+        self._nodes = {
+            node: (node, dict(data)) for node, data in self.graph.nodes(data=True)
+        }
+        self._edges = {
+            _edge_key(u, v): (u, v, dict(data))
+            for u, v, data in self.graph.edges(data=True)
+        }
+        self._rtt_sum, self._rtt_count = 0.0, 0
+        for item in self._nodes.values():
+            self._count_rtt(item)
+        self._dirty_nodes.clear()
+        self._dirty_edges.clear()
+        self._stale = False
+
+    def _count_rtt(self, item: NodeItem) -> None:
+        rtt = item[1].get("rtt")
+        if rtt is not None:
+            self._rtt_sum += rtt
+            self._rtt_count += 1
+
+    def _forget_rtt(self, item: Optional[NodeItem]) -> None:
+        rtt = None if item is None else item[1].get("rtt")
+        if rtt is not None:
+            self._rtt_sum -= rtt
+            self._rtt_count -= 1
+
+    async def _run(self) -> None:
+        while True:
+            await self._ready.wait()
+            if (
+                self.max_delay > 0
+                and not self._closing
+                and len(self._inbox) < self.max_batch
+            ):
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.max_delay)
+                except asyncio.TimeoutError:
+                    pass
+            self._step()
+            if not self._inbox:
+                self._ready.clear()
+                if self._closing:
+                    return
+            # Let submitters and readers run between steps.
+            await asyncio.sleep(0)
+
+    def _step(self) -> None:
+        batch = [
+            self._inbox.popleft() for _ in range(min(self.max_batch, len(self._inbox)))
+        ]
+        if len(self._inbox) < self.max_batch:
+            self._full.clear()
+        if not batch:
+            return
+        started = time.perf_counter()
+        index = 0
+        while index < len(batch):
+            kind, payload, future = batch[index]
+            if kind == _APPLY:
+                mutate, touches = payload
+                if touches is None:
+                    self._stale = True
+                else:
+                    self._touch(touches)
+                try:
+                    result = mutate(self.graph)
+                except Exception as exc:
+                    _resolve(future, exception=exc)
+                else:
+                    _resolve(future, result)
+                index += 1
+                continue
+            end = index
+            while end < len(batch) and batch[end][0] == _TRACE:
+                end += 1
+            run = batch[index:end]
+            self._touch(hops for _, hops, _ in run)
+            try:
+                counts = add_traces(self.graph, [hops for _, hops, _ in run])
+            except Exception as exc:
+                for _, _, waiting in run:
+                    _resolve(waiting, exception=exc)
+            else:
+                for (_, _, waiting), count in zip(run, counts):
+                    _resolve(waiting, count)
+                self.traces += len(run)
+            index = end
+        self.version += 1
+        self.batches += 1
+        if self.metrics is not None:
+            self.metrics.write_seconds.observe(time.perf_counter() - started)
+
+    async def close(self) -> None:
+        """Apply everything still queued, then stop the writer task."""
+
+        self._closing = True
+        if self._task is None:
+            return
+        self._ready.set()
+        self._full.set()
+        await asyncio.gather(self._task, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "batches": self.batches,
+            "traces": self.traces,
+            "mean_batch": round(self.traces / self.batches, 1) if self.batches else 0,
+            "queued": len(self._inbox),
+            "views": self.views,
+        }
+
+
+def _resolve(future: asyncio.Future, result: Any = None, exception=None) -> None:
+    if future.done():
+        return
+    if exception is not None:
+        future.set_exception(exception)
+    else:
+        future.set_result(result)
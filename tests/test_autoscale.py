@@ -0,0 +1,162 @@
+import asyncio
+from types import SimpleNamespace
+
+import networkx as nx
+
+from latencymesh import traceroute
+from latencymesh.autoscale import AIMDController, WorkerPool, autoscale_workers
+
+
+class Logger:
+    def __init__(self):
+        self.messages = []
+
+    def debug(self, *_a, **_k):
+        pass
+
+    def info(self, message):
+        self.messages.append(message)
+
+    def warning(self, message):
+        self.messages.append(message)
+
+
+def test_controller_grows_additively_and_backs_off():
+    controller = AIMDController(2, 8, initial=4)
+
+    assert controller.update(10, 0, 0.0, 1.0) == 5
+    assert controller.update(12, 0, 0.0, 1.0) == 6
+    # Mostly timeouts: halve.
+    assert controller.update(1, 9, 0.0, 1.0) == 3
+    # Loop lag: halve, but never below the floor.
+    assert controller.update(10, 0, 0.5, 1.0) == 2
+    # Nothing finished: hold.
+    assert controller.update(0, 0, 0.0, 1.0) == 2
+
+
+def test_controller_backs_off_when_rate_falls_after_increase():
+    controller = AIMDController(1, 10, initial=4)
+
+    assert controller.update(10, 0, 0.0, 1.0) == 5
+    assert controller.update(5, 0, 0.0, 1.0) == 2
+    assert controller.update(5, 0, 0.0, 1.0) == 3
+    for _ in range(20):
+        controller.update(100, 0, 0.0, 1.0)
+    assert controller.target == 10
+
+
+def test_worker_pool_retires_newest_workers():
+    async def runner():
+        created = []
+
+        def factory(worker_id, retire_event):
+            async def work():
+                await retire_event.wait()
+
+            created.append(worker_id)
+            return asyncio.create_task(work())
+
+        pool = WorkerPool(factory)
+        pool.resize(3)
+        first = list(pool.tasks)
+        pool.resize(1)
+        await asyncio.gather(*first[1:])
+        await asyncio.sleep(0)
+        assert not first[0].done() and pool.tasks == first[:1]
+        pool.resize(2)
+        assert created == [0, 1, 2, 3]
+        assert pool.size == 2
+
+        forced = WorkerPool(lambda *_: asyncio.create_task(asyncio.sleep(10)), False)
+        forced.resize(1)
+        retired = forced.tasks[0]
+        forced.resize(0)
+        await asyncio.gather(retired, return_exceptions=True)
+        await asyncio.sleep(0)
+        assert retired.cancelled() and forced.tasks == []
+        for task in pool.tasks:
+            task.cancel()
+        await asyncio.gather(*pool.tasks, return_exceptions=True)
+
+    asyncio.run(runner())
+
+
+def test_autoscale_workers_resizes_from_scan_stats():
+    async def runner():
+        pool = WorkerPool(lambda *_: asyncio.create_task(asyncio.sleep(10)))
+        pool.resize(2)
+        stats = {"traces": 0}
+        stop_event = asyncio.Event()
+        logger = Logger()
+        controller = AIMDController(1, 4, initial=2, lag_threshold=1.0)
+
+        async def drive():
+            for _ in range(2):
+                stats["traces"] += 5
+                await asyncio.sleep(0.03)
+            stop_event.set()
+
+        await asyncio.gather(
+            autoscale_workers(pool, controller, stats, stop_event, 0.02, logger),
+            drive(),
+        )
+        size, reported = pool.size, stats["workers"]()
+        for task in pool.tasks:
+            task.cancel()
+        await asyncio.gather(*pool.tasks, return_exceptions=True)
+        await asyncio.sleep(0)
+        return size, reported, pool, stats, logger
+
+    size, reported, pool, stats, logger = asyncio.run(runner())
+    assert size > 2 and reported == size
+    # Finished workers leave the pool and its count.
+    assert pool.tasks == [] and stats["workers"]() == 0
+    assert "loop_lag_ms" in stats
+    assert any("[autoscale]" in message for message in logger.messages)
+
+
+def test_traceroute_worker_counts_and_retires(monkeypatch):
+    async def fake_run_traceroute(host, *_args):
+        return [] if host == "silent" else [("10.0.0.1", 1.0)]
+
+    monkeypatch.setattr(traceroute, "run_traceroute", fake_run_traceroute)
+    monkeypatch.setattr(traceroute.random, "random", lambda: 1.0)
+    params = SimpleNamespace(pps=1000.0, timeout=1, max_hops=3, max_traces=None)
+
+    async def runner():
+        queue = asyncio.Queue()
+        for host in ("10.0.0.1", "silent"):
+            await queue.put(host)
+        retire_event = asyncio.Event()
+        stats = {}
+        stop_event = asyncio.Event()
+
+        async def retire_when_drained():
+            await queue.join()
+            retire_event.set()
+
+        await asyncio.wait_for(
+            asyncio.gather(
+                traceroute.traceroute_worker(
+                    0,
+                    nx.Graph(),
+                    queue,
+                    params,
+                    {"10.0.0.1"},
+                    set(),
+                    stop_event,
+                    {"since_last_draw": 0, "total": 0},
+                    asyncio.Lock(),
+                    Logger(),
+                    retire_event=retire_event,
+                    scan_stats=stats,
+                ),
+                retire_when_drained(),
+            ),
+            timeout=5,
+        )
+        return stats, stop_event
+
+    stats, stop_event = asyncio.run(runner())
+    assert stats == {"traces": 1, "empty_traces": 1}
+    assert not stop_event.is_set()
@@ -0,0 +1,120 @@
+import json
+import subprocess
+import sys
+
+import pytest
+
+from latencymesh.bench import (
+    BENCHMARKS,
+    compare,
+    graph_memory,
+    ipset_memory,
+    run_benchmarks,
+    synthetic_graph,
+)
+from latencymesh.cli import BENCHMARK_NAMES
+from latencymesh.main import main
+
+
+def test_ipset_memory_reports_savings():
+    results = ipset_memory(2000, networks=("10.0.0.0/8",))
+
+    dense = results["10.0.0.0/8 dense"]
+    assert dense["count"] == 2000
+    assert dense["ipset_bytes"] * 10 < dense["set_bytes"]
+    assert results["10.0.0.0/8 scattered"]["ratio"] > 1
+    assert dense["ipset_lookup_ns"] > 0
+
+
+def test_graph_memory_reports_savings():
+    result = graph_memory((500,))["500"]
+
+    assert result["nodes"] >= 500
+    assert result["compact_bytes"] * 2 < result["networkx_bytes"]
+    assert result["loaded_ratio"] > 1
+    assert result["compact_traces_per_s"] > 0
+
+
+def test_synthetic_graphs_are_repeatable():
+    first, second = synthetic_graph(300, seed=4), synthetic_graph(300, seed=4)
+    assert first.number_of_nodes() >= 300
+    assert sorted(first.edges()) == sorted(second.edges())
+    assert sorted(synthetic_graph(300, seed=5).edges()) != sorted(first.edges())
+
+
+def test_run_benchmarks_reports_throughput_latency_and_memory():
+    results = run_benchmarks(
+        [200],
+        ["add_trace", "view_snapshot", "load_graph", "generate_local_pool"],
+        repeat=3,
+    )
+    assert set(results["results"]) == {
+        "add_trace@200",
+        "view_snapshot@200",
+        "load_graph@200",
+        "generate_local_pool@200",
+    }
+    pool = results["results"]["generate_local_pool@200"]
+    assert pool["unit"] == "addresses" and pool["items"] == 3 * pool["nodes"]
+    for result in results["results"].values():
+        assert result["throughput"] > 0
+        assert 0 < result["p50_ms"] <= result["p99_ms"] <= result["max_ms"]
+        assert result["peak_kib"] > 0
+    with pytest.raises(ValueError):
+        run_benchmarks([200], ["add_trace", "bogus"])
+
+
+def test_compare_flags_regressions_beyond_the_threshold():
+    def run(p50, throughput):
+        return {"results": {"x@1": {"p50_ms": p50, "throughput": throughput}}}
+
+    assert compare(run(1.05, 95), run(1.0, 100))["x@1"]["regressed"] is False
+    assert compare(run(1.2, 100), run(1.0, 100))["x@1"]["regressed"] is True
+    assert compare(run(1.0, 80), run(1.0, 100))["x@1"] == {
+        "p50_change": 0.0,
+        "throughput_change": -0.2,
+        "regressed": True,
+    }
+    assert compare(run(1.0, 80), {"results": {}}) == {}
+
+
+def test_bench_command_compares_with_a_baseline(tmp_path, capsys):
+    output = tmp_path / "bench.json"
+    args = ["bench", "--nodes", "200", "--only", "add_trace", "--repeat", "3"]
+    with pytest.raises(SystemExit) as exit_info:
+        main(args + ["--output", str(output)])
+    assert exit_info.value.code == 0
+    saved = json.loads(output.read_text())
+    assert "add_trace@200" in capsys.readouterr().out
+
+    saved["results"]["add_trace@200"]["throughput"] *= 1000
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(json.dumps(saved))
+    with pytest.raises(SystemExit) as exit_info:
+        main(args + ["--baseline", str(baseline)])
+    assert exit_info.value.code == 1
+    report = json.loads(capsys.readouterr().out)
+    assert report["comparison"]["add_trace@200"]["regressed"]
+
+
+@pytest.mark.parametrize("content", ["{not json", "[]", '{"version": 0}'])
+def test_bench_command_rejects_an_unreadable_baseline(tmp_path, capsys, content):
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(content)
+    args = ["bench", "--nodes", "200", "--only", "add_trace", "--repeat", "1"]
+    with pytest.raises(SystemExit) as exit_info:
+        main(args + ["--baseline", str(baseline)])
+    assert exit_info.value.code == 2
+    assert "[error] cannot use baseline" in capsys.readouterr().err
+
+
+def test_cli_lists_benchmarks_without_importing_them():
+    assert BENCHMARK_NAMES == tuple(BENCHMARKS)
+    code = (
+        "import sys, latencymesh.main; "
+        "print(sorted(m for m in sys.modules if m.endswith(('bench', 'simulate'))))"
+    )
+    loaded = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert loaded.stdout.strip() == "[]"
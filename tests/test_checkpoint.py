@@ -0,0 +1,133 @@
+import asyncio
+import itertools
+import json
+from types import SimpleNamespace
+
+import networkx as nx
+
+from latencymesh import main
+from latencymesh import traceroute as traceroute_mod
+from latencymesh.checkpoint import ScanCheckpoint, checkpoint_path, load_checkpoint
+from latencymesh.frontier import Frontier
+from latencymesh.io_graph import load_graph
+from latencymesh.iptools import LocalPool
+from latencymesh.ipset import IPSet
+from latencymesh.refresh import RefreshScheduler
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_frontier_and_refresh_state_round_trip():
+    clock = FakeClock()
+    frontier = Frontier(clock=clock, revisit_after=100)
+    frontier.put_nowait("10.0.0.1")
+    frontier.get_nowait()
+    frontier.record_yield("10.0.0.1", 3)
+    clock.now += 40
+    state = json.loads(json.dumps(frontier.state()))
+
+    other_clock = FakeClock(5.0)
+    restored = Frontier(clock=other_clock, revisit_after=100)
+    restored.restore(state, elapsed=50)
+    # 40 seconds before the checkpoint plus 50 while stopped.
+    assert not restored.wants_revisit("10.0.0.1")
+    other_clock.now += 10
+    assert restored.wants_revisit("10.0.0.1")
+    assert restored.score("10.0.0.9") > Frontier(clock=other_clock).score("10.0.0.9")
+
+    scheduler = RefreshScheduler(600, clock=clock)
+    scheduler.touch("a")
+    scheduler.observe("b", changed=True)
+    copy = RefreshScheduler(600, clock=clock)
+    copy.restore(json.loads(json.dumps(scheduler.state())))
+    assert copy.state() == scheduler.state()
+    clock.now += 600
+    assert copy.due() == ["b"]
+
+
+def test_checkpoint_save_writes_graph_and_state(tmp_path):
+    base = str(tmp_path / "mesh")
+    graph = nx.Graph()
+    graph.add_edge("10.0.0.1", "10.0.0.2", rtt=1.0)
+    pool = LocalPool(["10.0.0.1"], 28, None)
+    next(iter(pool))
+    queue = Frontier(graph)
+    pending = IPSet(["10.0.0.3"])
+    checkpoint = ScanCheckpoint(base, {"seeds": []}, pool, queue, pending, graph=graph)
+
+    asyncio.run(checkpoint.save())
+
+    state = load_checkpoint(base)
+    assert state["pool"] == {"seeds": [], "cursor": 1}
+    assert state["pending"] == ["10.0.0.3"]
+    assert load_graph(base).number_of_edges() == 1
+    assert checkpoint.stats()["saves"] == 1
+    assert checkpoint_path(base + ".json") == checkpoint.path
+
+
+def test_scan_resumes_where_the_checkpoint_stopped(tmp_path, monkeypatch):
+    processed = []
+
+    async def stub_traceroute(host, *_args, **_kwargs):
+        processed.append(host)
+        return [(host, 1.0)]
+
+    async def fake_sleep(_delay):
+        return None
+
+    async def fake_log_worker(queue, stop_event, level=None):
+        while not stop_event.is_set() or not queue.empty():
+            try:
+                await asyncio.wait_for(queue.get(), timeout=0.05)
+            except asyncio.TimeoutError:
+                continue
+            queue.task_done()
+
+    monkeypatch.setattr(traceroute_mod, "run_traceroute", stub_traceroute)
+    monkeypatch.setattr(traceroute_mod.asyncio, "sleep", fake_sleep)
+    monkeypatch.setattr(main, "log_worker", fake_log_worker)
+
+    def params(**overrides):
+        values = dict(
+            seeds=["10.1.0.1"],
+            extra_seeds=None,
+            max_per_seed=None,
+            prefix=28,
+            no_display=True,
+            workers=1,
+            pps=1.0,
+            timeout=1.0,
+            max_hops=5,
+            save_base=str(tmp_path / "mesh"),
+            duration=None,
+            max_traces=5,
+            pool_window=3,
+            checkpoint_interval=60.0,
+        )
+        values.update(overrides)
+        return SimpleNamespace(**values)
+
+    asyncio.run(main.scan_async(params()))
+    first = list(processed)
+    state = load_checkpoint(params().save_base)
+    assert len(first) == 5
+    # Drawn from the pool = traced + still pending.
+    assert state["pending"]
+    assert state["pool"]["cursor"] == len(first) + len(state["pending"])
+
+    processed.clear()
+    asyncio.run(main.scan_async(params(resume=True, max_traces=9)))
+
+    pool = list(itertools.islice(LocalPool(["10.1.0.1"], 28, None), 14))
+    assert not set(first) & set(processed)
+    assert sorted(first + processed) == sorted(pool)
+
+    processed.clear()
+    asyncio.run(main.scan_async(params(resume=True, seeds=["10.2.0.1"])))
+    assert processed == []
@@ -0,0 +1,226 @@
+import asyncio
+import gzip
+import json
+from types import SimpleNamespace
+
+import networkx as nx
+import pytest
+import uvicorn
+from httpx import ASGITransport, AsyncClient
+
+from latencymesh import traceroute
+from latencymesh.agent import AgentLink, run_agent
+from latencymesh.collector import Collector, Coordinator, parse_batch
+from latencymesh.iptools import LocalPool
+from latencymesh.webapp import GraphBroadcast, create_app
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_coordinator_leases_disjoint_ranges_and_reissues_expired():
+    clock = FakeClock()
+    coordinator = Coordinator(
+        ["192.0.2.1"], 28, None, lease_size=5, lease_timeout=60, clock=clock
+    )
+    assert coordinator.total == 14
+
+    leases = [coordinator.lease("a"), coordinator.lease("b"), coordinator.lease("a")]
+    assert [(l["offset"], l["count"]) for l in leases] == [(0, 5), (5, 5), (10, 4)]
+    assert coordinator.lease("b") is None
+    covered = []
+    for lease in leases:
+        pool = LocalPool(lease["seeds"], lease["prefix"], None, lease["offset"])
+        covered += [next(iter(pool)) for _ in range(1)]
+    assert len(set(covered)) == 3
+
+    assert coordinator.complete(leases[0]["lease"])
+    assert not coordinator.complete(leases[0]["lease"])
+    clock.now = 61
+    again = coordinator.lease("c")
+    assert (again["offset"], again["count"]) == (5, 5)
+    stats = coordinator.stats()
+    assert stats["expired"] == 2
+    assert stats["outstanding"] == 1
+    assert stats["remaining"] == 4
+
+
+def test_parse_batch_rejects_malformed_payloads():
+    assert parse_batch({"vantage": "v", "traces": [["h", [["10.0.0.1", 1]]]]}) == (
+        "v",
+        [[("10.0.0.1", 1.0)]],
+    )
+    for bad in (
+        [],
+        {"traces": []},
+        {"vantage": "a,b", "traces": []},
+        {"vantage": "v", "traces": {}},
+        {"vantage": "v", "traces": [["h", [["10.0.0.1"]]]]},
+    ):
+        with pytest.raises(ValueError):
+            parse_batch(bad)
+
+
+@pytest.mark.asyncio
+async def test_collect_and_lease_endpoints():
+    graph = nx.Graph()
+    lock = asyncio.Lock()
+    broadcast = GraphBroadcast()
+    collector = Collector(graph, lock, broadcast.notify)
+    coordinator = Coordinator(["192.0.2.1"], 30, None, lease_size=1)
+    app = create_app(graph, lock, broadcast, {}, collector, coordinator)
+
+    batch = {
+        "vantage": "east",
+        "traces": [["10.0.0.3", [["10.0.0.1", 1.0], ["10.0.0.3", 4.0]]]],
+    }
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.post(
+            "/api/collect",
+            content=gzip.compress(json.dumps(batch).encode()),
+            headers={"Content-Encoding": "gzip"},
+        )
+        assert response.json() == {"accepted": 1}
+        batch["vantage"] = "west"
+        await client.post("/api/collect", json=batch)
+        bad = await client.post("/api/collect", content=b"{not json")
+        assert bad.status_code == 400
+
+        first = (await client.post("/api/lease", json={"agent": "east"})).json()
+        second = await client.post("/api/lease")
+        assert second.status_code == 200
+        assert (await client.post("/api/lease")).status_code == 204
+        done = await client.post(f"/api/lease/{first['lease']}/complete")
+        assert done.json() == {"completed": first["lease"]}
+        missing = await client.post("/api/lease/999/complete")
+        assert missing.status_code == 404
+
+    assert graph.nodes["10.0.0.1"]["vantages"] == "east,west"
+    assert graph.edges["10.0.0.1", "10.0.0.3"]["vantages"] == "east,west"
+    assert collector.stats()["vantages"] == {"east": 1, "west": 1}
+    assert broadcast.version == 2
+
+
+def test_agents_report_to_localhost_collector(monkeypatch):
+    traced = []
+
+    async def fake_run_traceroute(host, *_args, **_kwargs):
+        traced.append(host)
+        await asyncio.sleep(0.001)
+        return [("10.9.9.1", 1.0), (host, 3.0)]
+
+    monkeypatch.setattr(traceroute, "run_traceroute", fake_run_traceroute)
+
+    async def runner():
+        graph = nx.Graph()
+        lock = asyncio.Lock()
+        broadcast = GraphBroadcast()
+        collector = Collector(graph, lock, broadcast.notify)
+        coordinator = Coordinator(["192.0.2.1"], 28, None, lease_size=4)
+        app = create_app(graph, lock, broadcast, {}, collector, coordinator)
+        server = uvicorn.Server(
+            uvicorn.Config(app, host="127.0.0.1", port=0, log_level="error")
+        )
+        server_task = asyncio.create_task(server.serve())
+        while not server.started:
+            await asyncio.sleep(0.01)
+        port = server.servers[0].sockets[0].getsockname()[1]
+        url = f"http://127.0.0.1:{port}"
+
+        def agent_params():
+            return SimpleNamespace(
+                seeds=["198.51.100.1"],
+                extra_seeds=None,
+                prefix=30,
+                max_per_seed=None,
+                workers=2,
+                pps=1000.0,
+                timeout=1.0,
+                max_hops=5,
+                save_base="unused",
+                duration=None,
+                max_traces=7,
+            )
+
+        links = [AgentLink(url, name, batch_size=2) for name in ("east", "west")]
+        await asyncio.wait_for(
+            asyncio.gather(*(run_agent(agent_params(), link) for link in links)),
+            timeout=20,
+        )
+        server.should_exit = True
+        await server_task
+        return graph, collector, coordinator, links
+
+    graph, collector, coordinator, links = asyncio.run(runner())
+    targets = [host for host in traced if host.startswith("192.0.2.")]
+    # Leases are disjoint, so no pool address was traced by both agents.
+    assert targets and len(targets) == len(set(targets))
+    sent = sum(link.stats["sent"] for link in links)
+    assert 0 < sent <= len(traced)
+    assert collector.stats()["traces"] == sent
+    # A trace still in flight when the agent stops is never uploaded.
+    reported = {node for node in graph.nodes if node.startswith("192.0.2.")}
+    assert reported and reported <= set(targets)
+    assert graph.nodes["10.9.9.1"]["vantages"] == "east,west"
+    assert coordinator.stats()["completed"] >= 1
+
+
+class FakeCollector:
+    """Answers an agent's requests from a local coordinator."""
+
+    def __init__(self, coordinator):
+        self.coordinator = coordinator
+        self.paths = []
+
+    async def __call__(self, path, payload, compress=False):
+        self.paths.append(path)
+        if path == "/api/lease":
+            lease = self.coordinator.lease(payload["agent"])
+            return (200, lease) if lease else (204, None)
+        if path.endswith("/complete"):
+            self.coordinator.complete(int(path.split("/")[3]))
+        return 200, {}
+
+
+def test_agent_completes_a_lease_only_after_its_targets_are_uploaded():
+    clock = FakeClock()
+    coordinator = Coordinator(
+        ["192.0.2.1"], 28, None, lease_size=4, lease_timeout=60, clock=clock
+    )
+
+    async def draw_and_stop(finished):
+        link = AgentLink("http://collector", "east")
+        link._call = collector = FakeCollector(coordinator)
+        pending = set()
+        link.attach(asyncio.Queue(), set(), pending, asyncio.Event())
+        targets = link.targets(None)
+        drawn = [await targets.__anext__() for _ in range(4)]
+        pending.update(drawn)
+        # One target is traced, the others return no hops.
+        link.send_trace(drawn[0], [("10.9.9.1", 1.0), (drawn[0], 2.0)])
+        pending.difference_update(drawn[:finished])
+        await link._complete_leases()
+        assert coordinator.stats()["completed"] == 0
+        await link.close()
+        return collector.paths
+
+    # The agent stops with two targets of its lease still running.
+    assert asyncio.run(draw_and_stop(2)) == ["/api/lease", "/api/collect"]
+    assert coordinator.stats()["completed"] == 0
+    clock.now += 61
+    again = coordinator.lease("west")
+    assert (again["offset"], again["count"]) == (0, 4)
+
+    # With every target finished, the lease completes after the upload.
+    assert asyncio.run(draw_and_stop(4)) == [
+        "/api/lease",
+        "/api/collect",
+        "/api/lease/3/complete",
+    ]
+    assert coordinator.stats()["completed"] == 1
@@ -0,0 +1,71 @@
+import networkx as nx
+import pytest
+
+from latencymesh import main
+from latencymesh.compact import CompactGraph
+from latencymesh.graph_ops import add_traces
+from latencymesh.io_graph import load_graph, save_graph
+
+TRACES = [
+    [("10.0.0.1", 1.0), ("10.0.1.1", 5.25), ("10.0.2.1", 9.5)],
+    [("10.0.0.1", 0.75), ("10.0.1.1", 4.0), ("10.0.3.1", 4.125)],
+    [("10.0.3.1", 4.125), ("10.0.3.1", 4.625)],
+]
+
+
+def test_ingest_matches_networkx():
+    graph, store = nx.Graph(), CompactGraph()
+
+    assert store.add_traces(TRACES) == add_traces(graph, TRACES) == [2, 1, 1]
+    assert store.add_trace(TRACES[0]) == 0
+    assert store.number_of_edges() == graph.number_of_edges() == 4
+    assert store.rtt.typecode == "f" and store.seen.typecode == "I"
+    assert store.nbytes() == 4 * (2 * len(store) + 3 * store.number_of_edges())
+
+    view = store.view()
+    assert dict(view.nodes(data="rtt")) == dict(graph.nodes(data="rtt"))
+    assert sorted(view.edges(data="weight")) == sorted(graph.edges(data="weight"))
+    assert view.nodes["10.0.1.1"]["last_seen"] == graph.nodes["10.0.1.1"]["last_seen"]
+    # The repeated hop is a self-loop, with networkx's degree semantics.
+    assert dict(view.degree()) == dict(graph.degree())
+    assert set(view["10.0.1.1"]) == {"10.0.0.1", "10.0.2.1", "10.0.3.1"}
+    assert view.has_edge("10.0.3.1", "10.0.1.1")
+    assert not view.has_edge("10.0.0.1", "10.0.2.1")
+
+
+def test_view_is_read_only_and_keeps_extra_attributes():
+    graph = nx.Graph()
+    graph.add_node("a", rtt=1.5, last_seen="2024-05-01T12:00:00", vantages="east")
+    graph.add_node("b", last_seen="yesterday")
+    graph.add_edge("a", "b", weight=0.5, vantages="east,west")
+    graph.add_node("lonely")
+    store = CompactGraph.from_networkx(graph)
+    view = store.view()
+
+    assert dict(view.nodes(data=True)) == dict(graph.nodes(data=True))
+    assert view.edges["a", "b"] == {"weight": 0.5, "vantages": "east,west"}
+    assert nx.number_connected_components(view) == 2
+    with pytest.raises(nx.NetworkXError):
+        view.add_edge("a", "lonely")
+    copy = view.copy()
+    copy.add_edge("a", "lonely")
+    assert store.number_of_edges() == 1
+    assert nx.utils.graphs_equal(store.to_networkx(), graph)
+
+
+def test_show_export_and_stats_on_the_compact_view(tmp_path):
+    graph = nx.Graph()
+    add_traces(graph, TRACES)
+    base = str(tmp_path / "map")
+    save_graph(graph, base)
+
+    view = load_graph(base, compact=True)
+    assert isinstance(view.store, CompactGraph) and len(view) == 4
+    assert main.graph_stats(base, compact=True) == main.graph_stats(base)
+    for fmt in ("csv", "gexf"):
+        target = main.export_graph(base, fmt, str(tmp_path / f"c.{fmt}"), True)
+        expected = main.export_graph(base, fmt, str(tmp_path / f"n.{fmt}"))
+        if fmt == "csv":
+            with open(target) as compact, open(expected) as full:
+                assert compact.read() == full.read()
+    assert main.render_graph(base, "radial", str(tmp_path / "c.svg"), compact=True)
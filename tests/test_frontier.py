@@ -0,0 +1,137 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+import networkx as nx
+
+from latencymesh import traceroute
+from latencymesh.frontier import Frontier
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_frontier_orders_by_novelty_staleness_and_yield():
+    graph = nx.Graph()
+    recent = datetime.utcnow().isoformat(timespec="seconds")
+    old = (datetime.utcnow() - timedelta(minutes=30)).isoformat(timespec="seconds")
+    graph.add_node("10.0.0.1", last_seen=recent)
+    graph.add_node("10.0.1.1", last_seen=old)
+    clock = FakeClock()
+
+    async def runner():
+        frontier = Frontier(graph, clock=clock)
+        frontier.record_yield("10.0.3.9", 5)
+        for host in ("10.0.0.1", "10.0.1.1", "10.0.2.1", "10.0.3.1"):
+            await frontier.put(host)
+        composition = frontier.stats()
+        order = [await frontier.get() for _ in range(4)]
+        return composition, order
+
+    composition, order = asyncio.run(runner())
+    # Unknown targets first (productive prefix wins the tie), then stale, then fresh.
+    assert order == ["10.0.3.1", "10.0.2.1", "10.0.1.1", "10.0.0.1"]
+    assert composition["queued"] == 4
+    assert composition["novel"] == 4
+    assert composition["prefixes"] == 4
+
+
+def test_frontier_keeps_fifo_order_and_sentinels_first():
+    async def runner():
+        frontier = Frontier()
+        for host in ("192.0.2.3", "192.0.2.1", "192.0.2.2"):
+            frontier.put_nowait(host)
+        await frontier.put(None)
+        return [frontier.get_nowait() for _ in range(4)], frontier
+
+    order, frontier = asyncio.run(runner())
+    assert order == [None, "192.0.2.3", "192.0.2.1", "192.0.2.2"]
+    assert frontier.empty()
+    assert frontier.stats()["traced"] == 3
+
+
+def test_frontier_plans_revisits_after_interval():
+    clock = FakeClock()
+
+    async def runner():
+        frontier = Frontier(clock=clock, revisit_after=60)
+        await frontier.put("192.0.2.1")
+        await frontier.get()
+        assert not frontier.wants_revisit("192.0.2.1")
+        clock.now += 61
+        assert frontier.wants_revisit("192.0.2.1")
+        await frontier.put("192.0.2.1")
+        return frontier.stats()
+
+    stats = asyncio.run(runner())
+    assert stats["revisit"] == 1
+    assert stats["revisits_planned"] == 1
+
+
+def test_enqueue_discovered_uses_frontier_instead_of_random(monkeypatch):
+    monkeypatch.setattr(traceroute.random, "random", lambda: 0.0)
+    clock = FakeClock()
+
+    async def runner():
+        frontier = Frontier(clock=clock, revisit_after=60)
+        await frontier.put("192.0.2.1")
+        await frontier.get()
+        pending = set()
+        await traceroute._enqueue_discovered(
+            "192.0.2.1", frontier, {"192.0.2.1"}, pending
+        )
+        return frontier.qsize(), pending
+
+    queued, pending = asyncio.run(runner())
+    assert queued == 0
+    assert pending == set()
+
+
+def test_old_traces_are_forgotten_without_changing_priority():
+    clock = FakeClock()
+
+    async def runner():
+        frontier = Frontier(clock=clock, staleness_horizon=100, revisit_after=60)
+        for host in ("192.0.2.1", "192.0.2.2"):
+            await frontier.put(host)
+            await frontier.get()
+        clock.now += 150
+        before = frontier.score("192.0.2.1")
+        await frontier.put("192.0.2.3")
+        await frontier.get()
+        return frontier, before
+
+    frontier, before = asyncio.run(runner())
+    state = json.loads(json.dumps(frontier.state()))
+    assert list(state["traced"]) == ["192.0.2.3"]
+    assert sorted(state["expired"]) == ["192.0.2.1", "192.0.2.2"]
+    assert frontier.stats()["traced"] == 3
+    assert frontier.score("192.0.2.1") == before < frontier.score("192.0.2.9")
+    assert frontier.wants_revisit("192.0.2.1")
+
+    restored = Frontier(clock=FakeClock(), staleness_horizon=100, revisit_after=60)
+    restored.restore(state)
+    assert restored.score("192.0.2.1") == before
+    assert not restored.wants_revisit("192.0.2.3")
+
+
+def test_faded_prefix_yields_are_dropped():
+    clock = FakeClock()
+
+    async def runner():
+        frontier = Frontier(clock=clock, yield_half_life=10)
+        frontier.record_yield("198.51.100.7", 1)
+        frontier.record_yield("203.0.113.7", 1000)
+        clock.now += 100
+        await frontier.put("192.0.2.1")
+        await frontier.get()
+        return frontier
+
+    frontier = asyncio.run(runner())
+    assert list(frontier.state()["yields"]) == ["203.0.113.0/24"]
+    assert frontier.score("198.51.100.9") == frontier.score("192.0.2.9")
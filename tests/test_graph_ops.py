@@ -2,14 +2,14 @@ import math
 
 import networkx as nx
 
-from latencymesh.graph_ops import add_trace, compute_positions
+from latencymesh.graph_ops import add_trace, add_traces, compute_positions
 
 
 def test_add_trace_updates_graph():
     graph = nx.Graph()
     hops = [("1.1.1.1", 10.0), ("2.2.2.2", 20.0), ("3.3.3.3", 30.0)]
 
-    add_trace(graph, hops)
+    assert add_trace(graph, hops) == 2
 
     assert graph.has_edge("1.1.1.1", "2.2.2.2")
     assert graph.nodes["2.2.2.2"]["rtt"] == 20.0
@@ -17,11 +17,27 @@ def test_add_trace_updates_graph():
 
     # Running the same trace with better RTT updates the stored value and edge weight.
     improved_hops = [("1.1.1.1", 10.0), ("2.2.2.2", 12.0)]
-    add_trace(graph, improved_hops)
+    assert add_trace(graph, improved_hops) == 0
     assert graph.nodes["2.2.2.2"]["rtt"] == 12.0
     assert graph.edges["1.1.1.1", "2.2.2.2"]["weight"] == 2.0
 
 
+def test_add_traces_matches_add_trace_with_one_timestamp():
+    traces = [
+        [("1.1.1.1", 10.0), ("2.2.2.2", 20.0)],
+        [("1.1.1.1", 9.0), ("2.2.2.2", 15.0), ("3.3.3.3", 30.0)],
+        [("2.2.2.2", 15.0), ("3.3.3.3", 30.0)],
+    ]
+    batched, single = nx.Graph(), nx.Graph()
+
+    assert add_traces(batched, traces) == [1, 1, 0]
+    assert [add_trace(single, hops) for hops in traces] == [1, 1, 0]
+
+    assert sorted(batched.edges(data="weight")) == sorted(single.edges(data="weight"))
+    assert dict(batched.nodes(data="rtt")) == dict(single.nodes(data="rtt"))
+    assert len({stamp for _, stamp in batched.nodes(data="last_seen")}) == 1
+
+
 def test_compute_positions_returns_cartesian_coordinates():
     graph = nx.Graph()
     graph.add_node("1.1.1.1", rtt=10.0)
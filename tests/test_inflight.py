@@ -0,0 +1,137 @@
+import asyncio
+from types import SimpleNamespace
+
+import networkx as nx
+
+from latencymesh import traceroute
+from latencymesh.inflight import InFlight
+from latencymesh.pathcache import PathCache
+from latencymesh.probe import Prober
+
+
+class Logger:
+    def debug(self, *_a, **_k):
+        pass
+
+    def warning(self, *_a, **_k):
+        pass
+
+
+def test_claim_returns_running_future_until_released():
+    async def runner():
+        inflight = InFlight(by_prefix=True)
+        assert inflight.claim("10.0.0.1") is None
+        running = inflight.claim("10.0.0.2")
+        assert running is not None and not running.done()
+        inflight.release("10.0.0.1")
+        assert await running == "10.0.0.1"
+        assert inflight.claim("10.0.0.2") is None
+        return inflight.stats()
+
+    assert asyncio.run(runner()) == {
+        "in_flight": 1,
+        "waits": 1,
+        "duplicates_avoided": 0,
+    }
+
+
+class GatedProber(Prober):
+    supports_first_ttl = True
+
+    def __init__(self):
+        self.calls = []
+        self.release = asyncio.Event()
+
+    async def trace(self, host, timeout, max_hops, logger, first_ttl=1):
+        self.calls.append((host, first_ttl))
+        await self.release.wait()
+        path = [("10.9.0.1", 1.0), (host, 2.0)]
+        return path[first_ttl - 1 :]
+
+
+class MovedProber(GatedProber):
+    """The destination no longer answers at its cached distance."""
+
+    async def trace(self, host, timeout, max_hops, logger, first_ttl=1):
+        hops = await super().trace(host, timeout, max_hops, logger, first_ttl)
+        return hops if first_ttl == 1 else []
+
+
+def _run_workers(hosts, inflight, path_cache=None, prober_class=GatedProber):
+    prober_holder = {}
+    # Everything is already seen, so no discovered hop gets queued.
+    seen = {"10.9.0.1", *hosts}
+
+    async def runner():
+        prober = prober_holder["prober"] = prober_class()
+        queue = asyncio.Queue()
+        for host in hosts:
+            queue.put_nowait(host)
+        stop_event = asyncio.Event()
+        workers = [
+            asyncio.create_task(
+                traceroute.traceroute_worker(
+                    worker_id,
+                    nx.Graph(),
+                    queue,
+                    SimpleNamespace(pps=1000, timeout=0.1, max_hops=5),
+                    seen,
+                    set(),
+                    stop_event,
+                    {},
+                    asyncio.Lock(),
+                    Logger(),
+                    prober=prober,
+                    path_cache=path_cache,
+                    inflight=inflight,
+                )
+            )
+            for worker_id in range(len(hosts))
+        ]
+        # Every worker has picked up its host before the first trace ends.
+        while queue.qsize():
+            await asyncio.sleep(0.001)
+        await asyncio.sleep(0.01)
+        prober.release.set()
+        await asyncio.wait_for(queue.join(), timeout=1.0)
+        for _ in workers:
+            queue.put_nowait(None)
+        await asyncio.gather(*workers)
+
+    asyncio.run(runner())
+    return prober_holder["prober"].calls
+
+
+def test_concurrent_duplicates_wait_for_one_trace(monkeypatch):
+    monkeypatch.setattr(traceroute.random, "random", lambda: 1.0)
+    inflight = InFlight()
+    calls = _run_workers(["10.0.1.9", "10.0.1.9", "10.0.1.9"], inflight)
+    assert calls == [("10.0.1.9", 1)]
+    assert inflight.stats()["duplicates_avoided"] == 2
+    assert len(inflight) == 0
+
+
+def test_prefix_coalescing_hands_siblings_to_the_path_cache(monkeypatch):
+    monkeypatch.setattr(traceroute.random, "random", lambda: 1.0)
+    inflight = InFlight(by_prefix=True)
+    cache = PathCache(60, by_prefix=True)
+    calls = _run_workers(["10.0.1.9", "10.0.1.20"], inflight, cache)
+    # The sibling waited for the full trace, then confirmed with one probe.
+    assert calls == [("10.0.1.9", 1), ("10.0.1.20", 2)]
+    assert inflight.stats()["duplicates_avoided"] == 1
+
+    inflight = InFlight(by_prefix=True)
+    calls = _run_workers(["10.0.1.9", "10.0.1.20"], inflight)
+    # Without a /24 cache the sibling still waits its turn, then traces.
+    assert calls == [("10.0.1.9", 1), ("10.0.1.20", 1)]
+    assert inflight.stats()["duplicates_avoided"] == 0
+
+
+def test_sibling_is_not_counted_when_the_cache_check_fails(monkeypatch):
+    monkeypatch.setattr(traceroute.random, "random", lambda: 1.0)
+    inflight = InFlight(by_prefix=True)
+    cache = PathCache(60, by_prefix=True)
+    calls = _run_workers(["10.0.1.9", "10.0.1.20"], inflight, cache, MovedProber)
+    # The last-hop check missed, so the sibling was traced after all.
+    assert calls == [("10.0.1.9", 1), ("10.0.1.20", 2), ("10.0.1.20", 1)]
+    assert inflight.stats()["duplicates_avoided"] == 0
@@ -0,0 +1,57 @@
+import pytest
+
+from latencymesh import ipset
+from latencymesh.ipset import IPSet
+
+
+def test_ipset_behaves_like_a_set_of_strings():
+    members = {"192.0.2.1", "192.0.2.200", "198.51.100.7", "2001:db8::1", "gw"}
+    addresses = IPSet(members)
+
+    assert len(addresses) == 5
+    assert addresses == members
+    assert "192.0.2.1" in addresses
+    assert "2001:DB8:0:0::1" in addresses
+    assert "192.0.2.2" not in addresses
+    assert None not in addresses
+
+    addresses.add("192.0.2.1")
+    addresses.discard("192.0.2.200")
+    addresses.discard("192.0.2.201")
+    addresses.discard("gw")
+    addresses.discard("missing")
+    assert addresses == {"192.0.2.1", "198.51.100.7", "2001:db8::1"}
+    assert repr(addresses) == "IPSet(3 addresses)"
+
+
+def test_chunks_grow_into_bitmaps_and_shrink_back(monkeypatch):
+    monkeypatch.setattr(ipset, "ARRAY_LIMIT", 8)
+    addresses = IPSet(f"10.1.0.{i}" for i in range(1, 21))
+    chunk = addresses._chunks[4][0x0A01]
+    assert chunk.bitmap is not None
+    assert "10.1.0.20" in addresses and "10.1.0.21" not in addresses
+    assert sorted(addresses, key=lambda ip: int(ip.rsplit(".", 1)[1]))[-1] == (
+        "10.1.0.20"
+    )
+
+    for i in range(1, 21):
+        addresses.discard(f"10.1.0.{i}")
+    assert len(addresses) == 0
+    assert not addresses._chunks[4]
+
+
+def test_ipv6_members_within_a_prefix_share_a_chunk():
+    addresses = IPSet(["2001:db8::5", "2001:db8::2", "2001:db8:1::1"])
+    chunks = addresses._chunks[6]
+    assert len(chunks) == 2
+    assert list(addresses) == ["2001:db8::2", "2001:db8::5", "2001:db8:1::1"]
+    addresses.discard("2001:db8::2")
+    addresses.discard("2001:db8:1::1")
+    assert addresses == {"2001:db8::5"}
+
+
+@pytest.mark.parametrize("value", ["1.2.3", "1.2.3.4.5", "::g", ""])
+def test_non_addresses_fall_back_to_plain_strings(value):
+    addresses = IPSet([value])
+    assert value in addresses
+    assert list(addresses) == [value]
@@ -1,4 +1,5 @@
 import ipaddress
+import itertools
 from unittest import mock
 
 import pytest
@@ -72,3 +73,65 @@ class TestGenerateLocalPool:
             iptools.IPAddress("203.0.113.8"),
             iptools.IPAddress("203.0.113.9"),
         ]
+
+
+class TestLocalPool:
+    def test_covers_hosts_in_deterministic_interleaved_order(self):
+        seed_ips = ["not-an-ip", "192.0.2.1", "198.51.100.7", "192.0.2.9"]
+        pool = iptools.LocalPool(seed_ips, prefix_len=24, max_per_seed=None)
+        addresses = list(pool)
+
+        assert len(pool) == 508
+        assert pool.cursor == 508
+        assert len(set(addresses)) == 508
+        assert addresses == list(
+            iptools.LocalPool(seed_ips, prefix_len=24, max_per_seed=None)
+        )
+        assert "192.0.2.0" not in addresses and "192.0.2.255" not in addresses
+        # Seeds alternate instead of one network being exhausted first.
+        assert {ip.rsplit(".", 1)[0] for ip in addresses[:2]} == {
+            "192.0.2",
+            "198.51.100",
+        }
+        assert addresses[:5] != sorted(addresses[:5], key=ipaddress.ip_address)
+
+    def test_resumes_from_offset(self):
+        seed_ips = ["192.0.2.1", "198.51.100.7"]
+        full = list(iptools.LocalPool(seed_ips, prefix_len=28, max_per_seed=5))
+        assert len(full) == 10
+        for offset in (0, 3, 7, 10, 12):
+            resumed = iptools.LocalPool(
+                seed_ips, prefix_len=28, max_per_seed=5, offset=offset
+            )
+            assert list(resumed) == full[offset:]
+
+    def test_first_hosts_respect_max_per_seed(self):
+        pool = iptools.LocalPool(["203.0.113.9"], prefix_len=24, max_per_seed=3)
+        assert sorted(pool, key=ipaddress.ip_address) == [
+            "203.0.113.1",
+            "203.0.113.2",
+            "203.0.113.3",
+        ]
+        small = iptools.LocalPool(["203.0.113.9"], prefix_len=31, max_per_seed=None)
+        assert sorted(small) == ["203.0.113.8", "203.0.113.9"]
+
+    def test_huge_networks_are_lazy(self):
+        pool = iptools.LocalPool(["2001:db8::1"], prefix_len=32, max_per_seed=None)
+        assert pool.total == 2**96 - 1
+        first = list(itertools.islice(pool, 100))
+        assert len(set(first)) == 100
+        assert all(
+            ipaddress.ip_address(ip) in ipaddress.ip_network("2001:db8::/32")
+            for ip in first
+        )
+        assert not iptools.LocalPool(["bogus"], prefix_len=24, max_per_seed=None)
+
+
+class TestIpPrefix:
+    def test_groups_addresses_by_prefix(self):
+        assert iptools.ip_prefix("198.51.100.7") == "198.51.100.0/24"
+        assert iptools.ip_prefix("198.51.100.7", v4_len=16) == "198.51.0.0/16"
+        assert iptools.ip_prefix("2001:db8:1:2::5") == "2001:db8:1::/48"
+
+    def test_passes_through_non_addresses(self):
+        assert iptools.ip_prefix("example.net") == "example.net"
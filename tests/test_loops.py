@@ -0,0 +1,57 @@
+import asyncio
+import sys
+import time
+import types
+
+import pytest
+
+from latencymesh import loops
+
+
+def test_uvloop_falls_back_to_asyncio_when_missing(monkeypatch, capsys):
+    monkeypatch.setitem(sys.modules, "uvloop", None)
+    assert loops.resolve_loop("uvloop") == "asyncio"
+    assert "not installed" in capsys.readouterr().out
+    assert loops.resolve_loop(None) == "asyncio"
+    with pytest.raises(ValueError):
+        loops.resolve_loop("trio")
+
+    async def answer():
+        return 42
+
+    assert loops.run(answer(), "uvloop") == 42
+
+
+def test_run_uses_the_uvloop_factory(monkeypatch):
+    created = []
+
+    def new_event_loop():
+        created.append(asyncio.new_event_loop())
+        return created[-1]
+
+    monkeypatch.setitem(
+        sys.modules, "uvloop", types.SimpleNamespace(new_event_loop=new_event_loop)
+    )
+
+    async def current_loop():
+        return asyncio.get_running_loop()
+
+    assert loops.run(current_loop(), "uvloop") is created[0]
+
+
+def test_lag_monitor_reports_blocked_loop():
+    async def runner():
+        monitor = loops.LoopLagMonitor(interval=0.005)
+        task = monitor.start()
+        await asyncio.sleep(0.02)
+        time.sleep(0.05)
+        await asyncio.sleep(0.02)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return monitor.stats()
+
+    stats = asyncio.run(runner())
+    assert stats["loop"] == "asyncio"
+    assert stats["ticks"] >= 3
+    assert stats["max_ms"] >= 40
+    assert stats["p50_ms"] < stats["max_ms"]
@@ -0,0 +1,134 @@
+import asyncio
+from types import SimpleNamespace
+
+import networkx as nx
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from latencymesh import traceroute
+from latencymesh.metrics import Histogram, ScanMetrics, serve_metrics
+from latencymesh.probe import Prober
+from latencymesh.webapp import GraphBroadcast, create_app
+
+
+class Logger:
+    def debug(self, *_a, **_k):
+        pass
+
+    def warning(self, *_a, **_k):
+        pass
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value)
+    assert histogram.samples() == [
+        ("latency_seconds_bucket", {"le": "0.1"}, 2),
+        ("latency_seconds_bucket", {"le": "1"}, 3),
+        ("latency_seconds_bucket", {"le": "+Inf"}, 4),
+        ("latency_seconds_sum", {}, pytest.approx(3.65)),
+        ("latency_seconds_count", {}, 4),
+    ]
+
+
+def test_render_reads_bound_objects_and_scan_stats():
+    metrics = ScanMetrics()
+    queue = asyncio.Queue()
+    queue.put_nowait("10.0.0.1")
+    prober = SimpleNamespace(stats=lambda: {"probes_sent": 42})
+    metrics.bind(queue=queue, pending={"10.0.0.1", "10.0.0.2"}, prober=prober)
+    metrics.traces.inc(3)
+
+    text = metrics.render(
+        {"traces": 3, "path_cache": lambda: {"hit_rate": 0.5, "mode": "check"}}
+    )
+    lines = text.splitlines()
+    assert "# TYPE latencymesh_traces_total counter" in lines
+    assert "latencymesh_traces_total 3" in lines
+    assert "latencymesh_probes_total 42" in lines
+    assert "latencymesh_queue_depth 1" in lines
+    assert "latencymesh_pending_targets 2" in lines
+    assert 'latencymesh_trace_duration_seconds_bucket{le="+Inf"} 0' in lines
+    assert "latencymesh_scan_traces 3" in lines
+    assert "latencymesh_scan_path_cache_hit_rate 0.5" in lines
+    assert not any("mode" in line for line in lines)
+
+
+def test_headless_listener_serves_metrics():
+    async def runner():
+        metrics = ScanMetrics()
+        metrics.errors.inc()
+        server = await serve_metrics(metrics, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        responses = []
+        for path in ("/metrics", "/other"):
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(f"GET {path} HTTP/1.1\r\nHost: x\r\n\r\n".encode())
+            await writer.drain()
+            responses.append((await reader.read()).decode())
+            writer.close()
+        server.close()
+        await server.wait_closed()
+        return responses
+
+    found, missing = asyncio.run(runner())
+    assert found.startswith("HTTP/1.1 200 OK")
+    assert "latencymesh_trace_errors_total 1" in found
+    assert missing.startswith("HTTP/1.1 404")
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint_times_snapshots():
+    graph = nx.Graph()
+    graph.add_edge("1.1.1.1", "8.8.8.8")
+    app = create_app(graph, asyncio.Lock(), GraphBroadcast(), {"workers": 5})
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        assert (await client.get("/api/graph")).json()["links"]
+        response = await client.get("/metrics")
+    assert response.headers["content-type"].startswith("text/plain")
+    lines = response.text.splitlines()
+    assert "latencymesh_snapshot_seconds_count 1" in lines
+    assert "latencymesh_graph_lock_wait_seconds_count 1" in lines
+    assert "latencymesh_graph_nodes 2" in lines
+    assert "latencymesh_sse_clients 0" in lines
+    assert "latencymesh_scan_workers 5" in lines
+
+
+class FixedProber(Prober):
+    async def trace(self, host, timeout, max_hops, logger, first_ttl=1):
+        if host == "10.0.0.9":
+            raise RuntimeError("unreachable")
+        return [("10.9.0.1", 1.0), (host, 2.0)]
+
+
+def test_worker_records_trace_outcomes(monkeypatch):
+    monkeypatch.setattr(traceroute.random, "random", lambda: 1.0)
+    metrics = ScanMetrics()
+
+    async def runner():
+        queue = asyncio.Queue()
+        for host in ("10.0.0.1", "10.0.0.9", None):
+            queue.put_nowait(host)
+        await traceroute.traceroute_worker(
+            0,
+            nx.Graph(),
+            queue,
+            SimpleNamespace(pps=1000, timeout=0.1, max_hops=5),
+            {"10.9.0.1", "10.0.0.1", "10.0.0.9"},
+            set(),
+            asyncio.Event(),
+            {},
+            asyncio.Lock(),
+            Logger(),
+            graph_lock=asyncio.Lock(),
+            prober=FixedProber(),
+            metrics=metrics,
+        )
+
+    asyncio.run(runner())
+    assert (metrics.traces.value, metrics.errors.value) == (1, 1)
+    assert metrics.trace_seconds.count == 2
+    assert metrics.lock_wait.count == 1
@@ -0,0 +1,149 @@
+import asyncio
+from types import SimpleNamespace
+
+import networkx as nx
+import pytest
+
+from latencymesh import traceroute
+from latencymesh.graph_ops import Trace
+from latencymesh.pathcache import PathCache
+from latencymesh.probe import Prober
+
+
+class Logger:
+    def debug(self, *_a, **_k):
+        pass
+
+    def warning(self, *_a, **_k):
+        pass
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _trace(*ips):
+    return Trace([(ip, float(ttl)) for ttl, ip in enumerate(ips, 1)], range(1, 4))
+
+
+def test_cache_expires_and_counts_hit_rate():
+    clock = FakeClock()
+    cache = PathCache(60, clock=clock, max_entries=2)
+    cache.store("10.0.1.9", _trace("10.0.0.1", "10.0.0.2", "10.0.1.9"))
+    # Traces that never reached the destination are not cached.
+    cache.store("10.0.2.9", _trace("10.0.0.1", "10.0.0.2"))
+
+    entry = cache.lookup("10.0.1.9")
+    assert entry.last_ttl == 3
+    assert cache.lookup("10.0.2.9") is None
+    clock.now = 61
+    assert cache.lookup("10.0.1.9") is None
+    assert cache.stats() == {
+        "entries": 0,
+        "hits": 1,
+        "misses": 2,
+        "hit_rate": 0.333,
+        "checks_failed": 0,
+    }
+
+    for last in ("1", "2", "3"):
+        cache.store(f"10.0.3.{last}", _trace("10.0.0.1", f"10.0.3.{last}"))
+    assert cache.stats()["entries"] == 2
+    assert cache.lookup("10.0.3.1") is None
+
+    with pytest.raises(ValueError):
+        PathCache(60, mode="maybe")
+
+
+def test_prefix_cache_confirms_sibling_with_last_hop():
+    cache = PathCache(60, by_prefix=True, clock=FakeClock())
+    cache.store("10.0.1.9", _trace("10.0.0.1", "10.0.0.2", "10.0.1.9"))
+    entry = cache.lookup("10.0.1.20")
+    segment = cache.confirm("10.0.1.20", entry, ("10.0.1.20", 4.0))
+    assert list(segment) == [("10.0.0.2", 2.0), ("10.0.1.20", 4.0)]
+    assert segment.ttls == [2, 3]
+    # The shared entry still describes the destination it was measured for.
+    assert entry.hops[-1] == ("10.0.1.9", 3.0)
+
+
+class RecordingProber(Prober):
+    supports_first_ttl = True
+
+    def __init__(self, answers):
+        self.answers = answers
+        self.calls = []
+
+    async def trace(self, host, timeout, max_hops, logger, first_ttl=1):
+        self.calls.append((host, first_ttl, max_hops))
+        path = self.answers(host, first_ttl)
+        return Trace(path, range(first_ttl, first_ttl + len(path)))
+
+
+def _run_worker(hosts, cache, prober, graph=None):
+    graph = graph if graph is not None else nx.Graph()
+
+    async def runner():
+        queue = asyncio.Queue()
+        for host in hosts:
+            queue.put_nowait(host)
+        queue.put_nowait(None)
+        await traceroute.traceroute_worker(
+            0,
+            graph,
+            queue,
+            SimpleNamespace(pps=1000, timeout=0.1, max_hops=5),
+            set(),
+            set(),
+            asyncio.Event(),
+            {},
+            asyncio.Lock(),
+            Logger(),
+            prober=prober,
+            path_cache=cache,
+        )
+
+    asyncio.run(runner())
+    return graph
+
+
+def test_worker_checks_cached_destination_with_one_probe():
+    def answers(host, first_ttl):
+        path = [("10.0.0.1", 1.0), ("10.0.0.2", 2.0), (host, 5.0)]
+        return path[first_ttl - 1 :]
+
+    prober = RecordingProber(answers)
+    cache = PathCache(60)
+    graph = _run_worker(["10.0.1.9", "10.0.1.9"], cache, prober)
+
+    assert prober.calls == [("10.0.1.9", 1, 5), ("10.0.1.9", 3, 3)]
+    assert graph.has_edge("10.0.0.2", "10.0.1.9")
+    assert cache.stats()["hit_rate"] == 0.5
+
+
+def test_worker_retraces_when_the_check_fails_and_skips_in_skip_mode():
+    paths = iter(
+        [
+            [("10.0.0.1", 1.0), ("10.0.1.9", 3.0)],
+            # The check at TTL 2 now hits a new router instead.
+            [("10.0.0.7", 2.0)],
+            [("10.0.0.1", 1.0), ("10.0.0.7", 2.0), ("10.0.1.9", 4.0)],
+        ]
+    )
+    prober = RecordingProber(lambda host, first_ttl: next(paths))
+    cache = PathCache(60)
+    graph = _run_worker(["10.0.1.9", "10.0.1.9"], cache, prober)
+
+    assert [call[1:] for call in prober.calls] == [(1, 5), (2, 2), (1, 5)]
+    assert graph.has_edge("10.0.0.7", "10.0.1.9")
+    assert cache.stats()["checks_failed"] == 1
+    assert cache.stats()["hits"] == 0
+
+    prober = RecordingProber(lambda host, first_ttl: [(host, 1.0)])
+    cache = PathCache(60, mode="skip")
+    _run_worker(["10.0.1.9"] * 3, cache, prober)
+    assert len(prober.calls) == 1
+    assert cache.stats()["hits"] == 2
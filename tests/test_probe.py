@@ -0,0 +1,392 @@
+import asyncio
+import socket
+import struct
+from types import SimpleNamespace
+
+import networkx as nx
+import pytest
+
+from latencymesh import probe, traceroute
+from latencymesh.graph_ops import Trace
+from latencymesh.ratelimit import ProbeLimiter
+from latencymesh.rto import AdaptiveTimeouts
+from latencymesh.stopsets import StopSets
+
+LOCAL_IP = "192.0.2.10"
+
+
+def _icmp_reply(responder: str, icmp_type: int, dst: str, dport: int) -> bytes:
+    outer = struct.pack(
+        "!BBHHHBBH4s4s",
+        0x45,
+        0,
+        56,
+        0,
+        0,
+        64,
+        socket.IPPROTO_ICMP,
+        0,
+        socket.inet_aton(responder),
+        socket.inet_aton(LOCAL_IP),
+    )
+    icmp = struct.pack("!BBHI", icmp_type, 0, 0, 0)
+    inner = struct.pack(
+        "!BBHHHBBH4s4s",
+        0x45,
+        0,
+        39,
+        0,
+        0,
+        1,
+        socket.IPPROTO_UDP,
+        0,
+        socket.inet_aton(LOCAL_IP),
+        socket.inet_aton(dst),
+    )
+    udp = struct.pack("!HHHH", 40000, dport, 19, 0)
+    return outer + icmp + inner + udp
+
+
+class FakeResponder:
+    """UDP send socket that answers probes through a socketpair."""
+
+    def __init__(self, path, silent=()):
+        self.paths = path if isinstance(path, dict) else None
+        self.path = path
+        self.silent = set(silent)
+        self.ttl = None
+        self.sent = []
+        self.wire, self.recv_sock = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+
+    def setblocking(self, _flag):
+        pass
+
+    def setsockopt(self, level, option, value):
+        assert (level, option) == (socket.IPPROTO_IP, socket.IP_TTL)
+        self.ttl = value
+
+    def sendto(self, payload, address):
+        host, port = address
+        self.sent.append((host, self.ttl))
+        if self.ttl in self.silent:
+            return len(payload)
+        path = self.paths[host] if self.paths is not None else self.path
+        if self.ttl >= len(path):
+            reply = _icmp_reply(host, probe.ICMP_DEST_UNREACH, host, port)
+        else:
+            reply = _icmp_reply(
+                path[self.ttl - 1], probe.ICMP_TIME_EXCEEDED, host, port
+            )
+        self.wire.send(reply)
+        return len(payload)
+
+    def close(self):
+        self.wire.close()
+
+
+class Logger:
+    def debug(self, *_a, **_k):
+        pass
+
+    def warning(self, *_a, **_k):
+        pass
+
+
+def test_parse_icmp_reply_extracts_probe_identity():
+    packet = _icmp_reply("10.0.0.1", probe.ICMP_TIME_EXCEEDED, "8.8.8.8", 33440)
+    assert probe.parse_icmp_reply(packet) == (
+        "10.0.0.1",
+        probe.ICMP_TIME_EXCEEDED,
+        "8.8.8.8",
+        33440,
+    )
+    echo = bytearray(packet)
+    echo[20] = 0
+    assert probe.parse_icmp_reply(bytes(echo)) is None
+    assert probe.parse_icmp_reply(b"short") is None
+
+
+def test_socket_prober_traces_against_fake_responder():
+    responder = FakeResponder(["10.0.0.1", "10.0.0.2", "8.8.8.8"], silent={2})
+
+    async def runner():
+        engine = probe.ProbeEngine(responder, responder.recv_sock)
+        prober = await probe.create_prober("socket", Logger(), engine=engine)
+        assert isinstance(prober, probe.SocketProber)
+        hops = await prober.trace("8.8.8.8", 0.05, 10, Logger())
+        await prober.close()
+        return hops, engine.probes_sent
+
+    hops, sent = asyncio.run(runner())
+    assert [ip for ip, _ in hops] == ["10.0.0.1", "8.8.8.8"]
+    assert all(rtt >= 0 for _, rtt in hops)
+    assert sent == 3
+    assert responder.sent == [("8.8.8.8", 1), ("8.8.8.8", 2), ("8.8.8.8", 3)]
+
+
+def test_socket_prober_streams_hops_as_they_settle():
+    path = ["10.0.0.1", "10.0.0.2", "10.0.0.3", "8.8.8.8"]
+    responder = FakeResponder(path, silent={2})
+
+    async def runner():
+        loop = asyncio.get_running_loop()
+        engine = probe.ProbeEngine(responder, responder.recv_sock)
+        prober = await probe.create_prober("socket", Logger(), engine=engine)
+        started = loop.time()
+        streamed = []
+        async for ttl, hop in prober.stream("8.8.8.8", 0.2, 10, Logger()):
+            streamed.append((ttl, hop[0], loop.time() - started))
+        traced = await prober.trace("8.8.8.8", 0.2, 10, Logger())
+        await prober.close()
+        return streamed, traced
+
+    streamed, traced = asyncio.run(runner())
+    assert [(ttl, ip) for ttl, ip, _ in streamed] == [
+        (1, "10.0.0.1"),
+        (3, "10.0.0.3"),
+        (4, "8.8.8.8"),
+    ]
+    assert [ip for _, ip, _ in streamed] == [ip for ip, _ in traced]
+    # The first hop arrives before the silent second one times out.
+    assert streamed[0][2] < 0.1 and streamed[-1][2] >= 0.2
+
+
+def test_socket_prober_delegates_ipv6_to_fallback():
+    calls = []
+
+    class Fallback(probe.Prober):
+        async def trace(self, host, timeout, max_hops, logger, first_ttl=1):
+            calls.append(host)
+            return [(host, 1.0)]
+
+    async def runner():
+        prober = probe.SocketProber(probe.ProbeEngine(), fallback=Fallback())
+        return await prober.trace("2001:db8::1", 0.1, 5, Logger())
+
+    assert asyncio.run(runner()) == [("2001:db8::1", 1.0)]
+    assert calls == ["2001:db8::1"]
+
+
+def test_create_prober_falls_back_without_privileges(monkeypatch):
+    warnings = []
+
+    class Log(Logger):
+        def warning(self, msg):
+            warnings.append(msg)
+
+    async def denied(self):
+        raise PermissionError("operation not permitted")
+
+    monkeypatch.setattr(probe.ProbeEngine, "start", denied)
+    prober = asyncio.run(probe.create_prober("socket", Log()))
+    assert isinstance(prober, probe.SubprocessProber)
+    assert warnings
+    with pytest.raises(ValueError):
+        asyncio.run(probe.create_prober("carrier-pigeon", Log()))
+
+
+def test_worker_uses_supplied_prober(monkeypatch):
+    class StubProber(probe.Prober):
+        def __init__(self):
+            self.hosts = []
+
+        async def trace(self, host, timeout, max_hops, logger, first_ttl=1):
+            self.hosts.append(host)
+            return [("10.0.0.1", 1.0), (host, 2.0)]
+
+    async def fail_run(*_a, **_k):
+        raise AssertionError("subprocess backend should not run")
+
+    monkeypatch.setattr(traceroute, "run_traceroute", fail_run)
+
+    async def runner():
+        queue = asyncio.Queue()
+        await queue.put("8.8.8.8")
+        await queue.put(None)
+        stub = StubProber()
+        graph = nx.Graph()
+        await traceroute.traceroute_worker(
+            0,
+            graph,
+            queue,
+            SimpleNamespace(pps=1000, timeout=0.1, max_hops=5),
+            set(),
+            set(),
+            asyncio.Event(),
+            {},
+            asyncio.Lock(),
+            Logger(),
+            prober=stub,
+        )
+        return stub.hosts, graph
+
+    hosts, graph = asyncio.run(runner())
+    assert hosts == ["8.8.8.8"]
+    assert graph.has_edge("10.0.0.1", "8.8.8.8")
+
+
+def test_parallel_window_costs_one_timeout():
+    path = ["10.0.0.1", "10.0.0.2", "10.0.0.3", "10.0.0.4", "8.8.8.8"]
+    responder = FakeResponder(path, silent={1, 2, 3})
+
+    async def runner():
+        loop = asyncio.get_running_loop()
+        engine = probe.ProbeEngine(responder, responder.recv_sock)
+        prober = await probe.create_prober("socket", Logger(), engine=engine, window=0)
+        started = loop.time()
+        hops = await prober.trace("8.8.8.8", 0.1, 30, Logger())
+        elapsed = loop.time() - started
+        await prober.close()
+        return hops, elapsed
+
+    hops, elapsed = asyncio.run(runner())
+    assert [ip for ip, _ in hops] == ["10.0.0.4", "8.8.8.8"]
+    # Three silent hops walked sequentially would cost three timeouts.
+    assert elapsed < 0.25
+    assert max(ttl for _, ttl in responder.sent) == 30
+
+
+def test_subprocess_prober_passes_window_to_traceroute(monkeypatch):
+    commands = []
+
+    async def fake_run(host, timeout, max_hops, logger, squeries=None):
+        commands.append(squeries)
+        return []
+
+    monkeypatch.setattr(traceroute, "run_traceroute", fake_run)
+
+    async def runner():
+        await probe.SubprocessProber().trace("1.1.1.1", 1.0, 12, Logger())
+        await probe.SubprocessProber(4).trace("1.1.1.1", 1.0, 12, Logger())
+        await probe.SubprocessProber(0).trace("1.1.1.1", 1.0, 12, Logger())
+
+    asyncio.run(runner())
+    assert commands == [None, 4, 12]
+
+
+def test_doubletree_stops_at_known_hops():
+    shared = ["10.0.0.1", "10.0.0.2", "10.0.0.3", "10.0.0.4"]
+    responder = FakeResponder(
+        {
+            "8.8.8.8": shared + ["10.0.1.5", "8.8.8.8"],
+            "8.8.4.4": shared + ["10.0.2.5", "8.8.4.4"],
+            "8.8.8.9": shared + ["10.0.1.5", "8.8.8.9"],
+        }
+    )
+    stop_sets = StopSets(start_ttl=3)
+
+    async def runner():
+        engine = probe.ProbeEngine(responder, responder.recv_sock)
+        prober = await probe.create_prober(
+            "socket", Logger(), engine=engine, stop_sets=stop_sets
+        )
+        traces = []
+        for host in ("8.8.8.8", "8.8.4.4", "8.8.8.9"):
+            traces.append(
+                [ip for ip, _ in await prober.trace(host, 0.05, 30, Logger())]
+            )
+        stats = prober.stats()
+        await prober.close()
+        return traces, stats
+
+    traces, stats = asyncio.run(runner())
+    assert traces[0] == shared + ["10.0.1.5", "8.8.8.8"]
+    # Backwards probing stops at the hop already seen at TTL 2.
+    assert traces[1] == ["10.0.0.2", "10.0.0.3", "10.0.0.4", "10.0.2.5", "8.8.4.4"]
+    # Forwards probing stops at the first hop known to lead to 8.8.8.0/24.
+    assert traces[2] == ["10.0.0.2", "10.0.0.3"]
+    assert stats["probes_sent"] == 6 + 5 + 2
+    assert stats["probes_saved"] == 0 + 1 + 4
+    assert stats["local_stop_set"] == len(shared) + 4
+
+
+def test_engine_charges_every_packet():
+    responder = FakeResponder(["10.0.0.1", "10.0.0.2", "8.8.8.8"])
+    limiter = ProbeLimiter(rate=50, burst=1)
+
+    async def runner():
+        loop = asyncio.get_running_loop()
+        engine = probe.ProbeEngine(responder, responder.recv_sock)
+        prober = await probe.create_prober(
+            "socket", Logger(), engine=engine, limiter=limiter
+        )
+        start = loop.time()
+        await asyncio.gather(
+            prober.trace("8.8.8.8", 0.5, 10, Logger()),
+            prober.trace("8.8.4.4", 0.5, 10, Logger()),
+        )
+        elapsed = loop.time() - start
+        await prober.close()
+        return elapsed
+
+    elapsed = asyncio.run(runner())
+    assert limiter.granted == 6
+    assert elapsed >= 0.09
+
+
+def test_socket_prober_waits_less_on_silent_hops_once_warmed_up():
+    responder = FakeResponder(["10.0.0.1", "10.0.0.2", "8.8.8.8"], silent={2})
+    timeouts = AdaptiveTimeouts(0.02, 0.3, min_samples=2)
+
+    async def runner():
+        loop = asyncio.get_running_loop()
+        engine = probe.ProbeEngine(responder, responder.recv_sock)
+        prober = await probe.create_prober(
+            "socket", Logger(), engine=engine, timeouts=timeouts
+        )
+        elapsed = []
+        for _ in range(3):
+            started = loop.time()
+            hops = await prober.trace("8.8.8.8", 0.3, 10, Logger())
+            elapsed.append(loop.time() - started)
+        await prober.close()
+        return hops, elapsed
+
+    hops, elapsed = asyncio.run(runner())
+    assert [ip for ip, _ in hops] == ["10.0.0.1", "8.8.8.8"]
+    assert elapsed[0] >= 0.3
+    assert elapsed[-1] < 0.2
+    stats = timeouts.stats()
+    assert stats["timed_out"] == 3
+    assert stats["wait_saved_seconds"] > 0.2
+
+
+def test_subprocess_prober_sets_wait_from_estimates(monkeypatch):
+    waits = []
+
+    async def fake_run(host, timeout, max_hops, logger, **_kwargs):
+        waits.append(timeout)
+        return Trace([("10.0.0.1", 2.0), (host, 4.0)], [1, 3])
+
+    monkeypatch.setattr(traceroute, "run_traceroute", fake_run)
+    timeouts = AdaptiveTimeouts(0.01, 1.0, min_samples=1)
+
+    async def runner():
+        prober = probe.SubprocessProber(timeouts=timeouts)
+        for _ in range(2):
+            await prober.trace("8.8.8.8", 1.0, 5, Logger())
+
+    asyncio.run(runner())
+    assert waits[0] == 1.0
+    assert waits[1] < 1.0
+    # TTL 2 stayed silent; TTLs past the destination are not counted.
+    assert timeouts.stats()["timed_out"] == 2
+    assert timeouts.stats()["probes"] == 6
+
+
+def test_subprocess_prober_counts_probes_up_to_the_destination(monkeypatch):
+    answers = {"8.8.8.8": [("10.0.0.1", 1.0), ("8.8.8.8", 2.0)], "8.8.4.4": []}
+
+    async def fake_run(host, *_args, **_kwargs):
+        return answers[host]
+
+    monkeypatch.setattr(traceroute, "run_traceroute", fake_run)
+
+    async def runner():
+        prober = probe.SubprocessProber()
+        await prober.trace("8.8.8.8", 1.0, 12, Logger())
+        await prober.trace("8.8.4.4", 1.0, 12, Logger())
+        return prober.stats()
+
+    # Two TTLs to reach 8.8.8.8; all twelve for the silent 8.8.4.4.
+    assert asyncio.run(runner()) == {"probes_sent": 2 + 12}
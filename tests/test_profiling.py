@@ -0,0 +1,91 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import networkx as nx
+
+from latencymesh import profiling, traceroute
+from latencymesh.graph_ops import add_trace
+
+
+class Logger:
+    def debug(self, *_a, **_k):
+        pass
+
+
+def test_spans_are_free_without_an_active_profiler():
+    assert profiling.active() is None
+    assert profiling.span("trace") is profiling.span("parse")
+    assert profiling.start_profile(SimpleNamespace()) is None
+
+
+def test_nested_spans_report_self_time(monkeypatch):
+    clock = iter([0.0, 1.0, 1.25, 2.0, 3.0, 3.5])
+    monkeypatch.setattr(profiling.time, "perf_counter", lambda: next(clock))
+    profiler = profiling.Profiler()  # 0.0
+    with profiler.span("trace"):  # 1.0 .. 3.0
+        with profiler.span("spawn"):  # 1.25 .. 2.0
+            pass
+    report = profiler.report()  # 3.5
+    assert report["wall_seconds"] == 3.5
+    assert report["stacks"]["trace"]["self_s"] == 1.25
+    assert report["stacks"]["trace;spawn"]["total_s"] == 0.75
+    assert list(report["stages"]) == ["trace", "spawn"]
+    assert profiler.collapsed() == ["trace 1250000", "trace;spawn 750000"]
+
+
+def test_profile_covers_spawn_parse_and_add_trace(monkeypatch, tmp_path):
+    class Stream:
+        def __init__(self):
+            self.lines = [b" 1 10.0.0.1 1.0 ms\n", b" 2 8.8.8.8 2.0 ms\n"]
+
+        def __aiter__(self):
+            return self
+
+        async def __anext__(self):
+            if not self.lines:
+                raise StopAsyncIteration
+            return self.lines.pop(0)
+
+    class Process:
+        returncode = 0
+        stdout = Stream()
+
+        async def wait(self):
+            return 0
+
+    async def fake_exec(*_args, **_kwargs):
+        return Process()
+
+    monkeypatch.setattr(asyncio, "create_subprocess_exec", fake_exec)
+    params = SimpleNamespace(profile=True, profile_capture="memory")
+
+    async def runner():
+        profiler = profiling.start_profile(params)
+        # Nested runs (a scan under `lm serve`) reuse the running profiler.
+        assert profiling.start_profile(params) is None
+        with profiling.span("trace"):
+            hops = await traceroute.run_traceroute("8.8.8.8", 1.0, 5, Logger())
+        add_trace(nx.Graph(), hops)
+        return profiler
+
+    profiler = asyncio.run(runner())
+    paths = profiling.finish_profile(profiler, str(tmp_path / "map"))
+    assert profiling.active() is None
+    assert paths == [
+        str(tmp_path / "map.profile.json"),
+        str(tmp_path / "map.profile.folded"),
+    ]
+
+    report = json.loads((tmp_path / "map.profile.json").read_text())
+    assert report["stacks"]["trace;spawn"]["count"] == 1
+    assert report["stacks"]["trace;parse"]["count"] == 2
+    assert report["stacks"]["add_trace"]["count"] == 1
+    assert report["memory"]["peak_kib"] > 0
+    folded = (tmp_path / "map.profile.folded").read_text().splitlines()
+    assert [line.split()[0] for line in folded] == [
+        "add_trace",
+        "trace",
+        "trace;parse",
+        "trace;spawn",
+    ]
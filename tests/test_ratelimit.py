@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+from latencymesh import probe, traceroute
+from latencymesh.graph_ops import Trace
+from latencymesh.ratelimit import ProbeLimiter, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class Logger:
+    def debug(self, *_a, **_k):
+        pass
+
+
+def test_token_bucket_reserves_burst_then_paces():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=10, burst=5, clock=clock)
+
+    assert [bucket.reserve() for _ in range(5)] == [0.0] * 5
+    assert bucket.reserve() == pytest.approx(0.1)
+    assert bucket.reserve(2) == pytest.approx(0.3)
+
+    clock.now += 1.0
+    assert bucket.reserve() == 0.0
+    bucket.refund(100)
+    assert bucket.idle
+
+    with pytest.raises(ValueError):
+        TokenBucket(rate=0)
+
+
+def test_limiter_paces_per_prefix_without_starving_others():
+    limiter = ProbeLimiter(rate=1000, burst=10, prefix_rate=20, prefix_burst=1)
+
+    async def runner():
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await limiter.acquire("198.51.100.1")
+        await limiter.acquire("203.0.113.1")
+        other_prefix = loop.time() - start
+        await limiter.acquire("198.51.100.2")
+        await limiter.acquire("198.51.100.3")
+        return other_prefix, loop.time() - start
+
+    other_prefix, same_prefix = asyncio.run(runner())
+    assert other_prefix < 0.04
+    assert same_prefix >= 0.09
+    stats = limiter.stats()
+    assert stats["probes_granted"] == 4
+    assert stats["prefix_buckets"] == 2
+    assert stats["wait_seconds"] > 0
+
+
+def test_subprocess_prober_refunds_ttls_past_destination(monkeypatch):
+    async def fake_run(host, timeout, max_hops, logger, **_kwargs):
+        return Trace([("10.0.0.1", 1.0), (host, 4.0)], [1, 4])
+
+    monkeypatch.setattr(traceroute, "run_traceroute", fake_run)
+    limiter = ProbeLimiter(rate=1000, burst=100)
+    prober = probe.SubprocessProber(limiter=limiter)
+
+    asyncio.run(prober.trace("8.8.8.8", 1.0, 30, Logger()))
+    assert limiter.granted == 4
@@ -0,0 +1,131 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import networkx as nx
+import pytest
+
+from latencymesh.refresh import RefreshScheduler, refresh_loop
+from latencymesh.shard import shard_of
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = datetime(2024, 1, 1, tzinfo=timezone.utc).timestamp()
+
+    def __call__(self):
+        return self.now
+
+
+def _iso(epoch):
+    return (
+        datetime.fromtimestamp(epoch, tz=timezone.utc)
+        .replace(tzinfo=None)
+        .isoformat(timespec="seconds")
+    )
+
+
+def test_load_schedules_from_last_seen_and_spreads_unknown_nodes():
+    clock = FakeClock()
+    graph = nx.Graph()
+    graph.add_node("10.0.0.1", last_seen=_iso(clock.now - 7200))
+    graph.add_node("10.0.0.2", last_seen=_iso(clock.now - 60))
+    for i in range(20):
+        graph.add_node(f"10.0.1.{i}")
+    scheduler = RefreshScheduler(3600, clock=clock)
+    scheduler.load(graph)
+
+    stats = scheduler.stats()
+    assert stats["tracked"] == 22
+    assert stats["overdue"] == 1
+    assert stats["lag_seconds"] == pytest.approx(3600)
+    assert scheduler.due() == ["10.0.0.1"]
+
+    # Unknown nodes come due spread over the window, not all at once.
+    clock.now += 1800
+    overdue = scheduler.stats()["overdue"]
+    assert 0 < overdue < 20
+
+
+def test_due_is_paced_and_rearms():
+    clock = FakeClock()
+    scheduler = RefreshScheduler(100, clock=clock, pace=1.0)
+    for i in range(10):
+        scheduler.touch(f"10.0.0.{i}")
+    clock.now += 200
+    assert len(scheduler.due()) == 1
+    clock.now += 10
+    assert len(scheduler.due()) == 1
+    # A long pause does not turn into a burst.
+    clock.now += 50
+    assert len(scheduler.due()) == 1
+    assert scheduler.stats()["refreshed"] == 3
+    # Released nodes are re-armed a full interval ahead.
+    assert scheduler.stats()["tracked"] == 10
+
+
+def test_volatile_nodes_refresh_more_often():
+    clock = FakeClock()
+    scheduler = RefreshScheduler(6 * 3600, 600, clock=clock)
+    scheduler.observe("10.0.0.1", changed=True)
+    scheduler.observe("10.0.0.1", changed=True)
+    scheduler.observe("10.0.0.2", changed=False)
+
+    clock.now += 3 * 3600
+    assert scheduler.due() == ["10.0.0.1"]
+
+    for _ in range(10):
+        scheduler.observe("10.0.0.1", changed=True)
+    assert scheduler.stats()["mean_interval"] == pytest.approx((600 + 6 * 3600) / 2)
+
+    with pytest.raises(ValueError):
+        RefreshScheduler(0)
+
+
+def test_refresh_loop_enqueues_due_nodes():
+    clock = FakeClock()
+    scheduler = RefreshScheduler(60, clock=clock)
+    scheduler.touch("10.0.0.1")
+    scheduler.touch("10.0.0.2")
+    clock.now += 120
+
+    async def runner():
+        queue = asyncio.Queue()
+        pending = {"10.0.0.2"}
+        stop_event = asyncio.Event()
+        task = asyncio.create_task(
+            refresh_loop(scheduler, queue, pending, stop_event, interval=0.01)
+        )
+        await asyncio.sleep(0.05)
+        stop_event.set()
+        await task
+        return [queue.get_nowait() for _ in range(queue.qsize())], pending
+
+    queued, pending = asyncio.run(runner())
+    assert queued == ["10.0.0.1"]
+    assert pending == {"10.0.0.1", "10.0.0.2"}
+
+
+def test_shards_release_each_refresh_target_once():
+    clock = FakeClock()
+    graph = nx.Graph()
+    graph.add_nodes_from(f"10.0.{i}.1" for i in range(40))
+    schedulers = [
+        RefreshScheduler(
+            60, clock=clock, pace=20, owns=lambda ip, i=i: shard_of(ip, 2) == i
+        )
+        for i in range(2)
+    ]
+    for scheduler in schedulers:
+        scheduler.load(graph)
+        # Every shard sees the same hops on its traces.
+        scheduler.touch("10.0.99.1")
+    clock.now += 120
+
+    released = [[], []]
+    for _ in range(10):
+        clock.now += 1
+        for index, scheduler in enumerate(schedulers):
+            released[index].extend(scheduler.due())
+    assert sorted(released[0] + released[1]) == sorted([*graph, "10.0.99.1"])
+    assert all(shard_of(ip, 2) == 0 for ip in released[0]) and released[1]
+    assert sum(len(scheduler) for scheduler in schedulers) == 41
@@ -0,0 +1,36 @@
+import pytest
+
+from latencymesh.rto import AdaptiveTimeouts, RTTEstimate
+
+
+def test_estimate_follows_rfc6298():
+    estimate = RTTEstimate()
+    estimate.observe(0.1)
+    assert (estimate.srtt, estimate.rttvar) == (0.1, 0.05)
+    estimate.observe(0.2)
+    assert estimate.rttvar == pytest.approx(0.0625)
+    assert estimate.srtt == pytest.approx(0.1125)
+    assert estimate.rto(0.01) == pytest.approx(0.1125 + 4 * 0.0625)
+
+
+def test_timeouts_fall_back_from_hop_to_prefix_to_overall():
+    timeouts = AdaptiveTimeouts(0.05, 1.0, min_samples=2)
+    assert timeouts.timeout("10.0.1.9", 3) == 1.0
+    for _ in range(2):
+        timeouts.observe("10.0.1.9", 3, 0.2)
+    hop = timeouts.timeout("10.0.1.9", 3)
+    assert 0.2 < hop < 1.0
+    # Unseen TTL in the same /24 uses the prefix; another /24 the overall one.
+    assert timeouts.timeout("10.0.1.77", 5) == hop
+    assert timeouts.timeout("10.9.9.9", 1) == hop
+    # Operator bounds and the caller's ceiling always win.
+    assert timeouts.timeout("10.0.1.9", 3, ceiling=0.1) == 0.1
+    for _ in range(10):
+        timeouts.observe("10.0.2.1", 1, 0.0001)
+    assert timeouts.timeout("10.0.2.1", 1) == 0.05
+
+    timeouts.expire("10.0.1.9", 3, hop)
+    assert timeouts.timeout("10.0.1.9", 3) == pytest.approx(min(1.0, 2 * hop))
+    assert timeouts.stats()["wait_saved_seconds"] == pytest.approx(1.0 - hop, 1e-3)
+    timeouts.observe("10.0.1.9", 3, 0.2)
+    assert timeouts.timeout("10.0.1.9", 3) < 2 * hop
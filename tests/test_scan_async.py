@@ -28,7 +28,7 @@ def _build_params():
 def test_scan_async_controls_workers(monkeypatch):
     params = _build_params()
 
-    monkeypatch.setattr(main, "generate_local_pool", lambda *a: ["1.1.1.1"])
+    monkeypatch.setattr(main, "LocalPool", lambda *a, **k: ["1.1.1.1"])
     monkeypatch.setattr(main, "load_graph", lambda *_: nx.Graph())
 
     async def fake_log_worker(queue, stop_event, level=None):
@@ -83,11 +83,11 @@ def test_scan_async_controls_workers(monkeypatch):
     params.extra_seeds = ["9.9.9.9"]
     if hasattr(params, "layout"):
         delattr(params, "layout")
-    monkeypatch.setattr(main, "generate_local_pool", lambda *a: [])
+    monkeypatch.setattr(main, "LocalPool", lambda *a, **k: [])
     asyncio.run(main.scan_async(params))
 
     params.no_display = False
-    monkeypatch.setattr(main, "generate_local_pool", lambda *a: ["1.1.1.1"])
+    monkeypatch.setattr(main, "LocalPool", lambda *a, **k: ["1.1.1.1"])
     monkeypatch.setattr(main.plt, "ion", lambda: None)
     monkeypatch.setattr(main.plt, "ioff", lambda: None)
     monkeypatch.setattr(main.plt, "close", lambda *_: None)
@@ -98,7 +98,7 @@ def test_scan_async_controls_workers(monkeypatch):
 def test_scan_async_signal_handler_fallback(monkeypatch):
     params = _build_params()
 
-    monkeypatch.setattr(main, "generate_local_pool", lambda *a: ["1.1.1.1"])
+    monkeypatch.setattr(main, "LocalPool", lambda *a, **k: ["1.1.1.1"])
     monkeypatch.setattr(main, "load_graph", lambda *_: nx.Graph())
 
     async def fake_log_worker(queue, stop_event, level=None):
@@ -173,7 +173,7 @@ def test_scan_async_processes_full_pool(monkeypatch):
 
     pool = [f"10.0.0.{i}" for i in range(1, 301)]
 
-    monkeypatch.setattr(main, "generate_local_pool", lambda *a: pool)
+    monkeypatch.setattr(main, "LocalPool", lambda *a, **k: pool)
     monkeypatch.setattr(main, "load_graph", lambda *_: nx.Graph())
 
     async def fake_log_worker(queue, stop_event, level=None):
@@ -234,7 +234,7 @@ def test_scan_async_honors_duration_limit(monkeypatch):
 
     pool = ["1.1.1.1", "1.1.1.2"]
 
-    monkeypatch.setattr(main, "generate_local_pool", lambda *a: pool)
+    monkeypatch.setattr(main, "LocalPool", lambda *a, **k: pool)
     monkeypatch.setattr(main, "load_graph", lambda *_: nx.Graph())
 
     async def fake_log_worker(queue, stop_event, level=None):
@@ -332,7 +332,7 @@ def test_scan_async_honors_max_traces(monkeypatch):
 
     pool = [f"10.0.0.{i}" for i in range(1, 5)]
 
-    monkeypatch.setattr(main, "generate_local_pool", lambda *a: pool)
+    monkeypatch.setattr(main, "LocalPool", lambda *a, **k: pool)
     monkeypatch.setattr(main, "load_graph", lambda *_: nx.Graph())
 
     async def fake_log_worker(queue, stop_event, level=None):
@@ -368,3 +368,26 @@ def test_scan_async_honors_max_traces(monkeypatch):
     asyncio.run(main.scan_async(params))
 
     assert processed == pool[: params.max_traces]
+
+
+def test_feed_pool_tops_up_frontier_as_it_drains():
+    async def runner():
+        queue = asyncio.Queue()
+        pending = {"10.0.0.2"}
+        stop_event = asyncio.Event()
+        targets = iter(["10.0.0.1", "10.0.0.2", "10.0.0.3", "10.0.0.4"])
+        feeder = asyncio.create_task(
+            main._feed_pool(targets, queue, pending, stop_event, window=2)
+        )
+        await asyncio.sleep(0.01)
+        assert queue.qsize() == 2
+        drained = [queue.get_nowait()]
+        await asyncio.sleep(0.1)
+        await feeder
+        drained += [queue.get_nowait() for _ in range(queue.qsize())]
+        return drained, pending
+
+    drained, pending = asyncio.run(runner())
+    # Already-pending targets are skipped.
+    assert drained == ["10.0.0.1", "10.0.0.3", "10.0.0.4"]
+    assert pending == {"10.0.0.1", "10.0.0.2", "10.0.0.3", "10.0.0.4"}
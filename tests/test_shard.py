@@ -0,0 +1,100 @@
+import asyncio
+import multiprocessing
+from types import SimpleNamespace
+
+import networkx as nx
+
+from latencymesh import shard, traceroute
+from latencymesh.io_graph import load_graph
+from latencymesh.iptools import LocalPool
+from latencymesh.writer import GraphWriter
+
+
+def test_shards_partition_the_pool():
+    pool = list(LocalPool(["192.0.2.1"], prefix_len=26, max_per_seed=None))
+    parts = [list(shard.ShardedPool(pool, index, 3)) for index in range(3)]
+
+    assert sorted(sum(parts, [])) == sorted(pool)
+    assert all(parts)
+    for index, part in enumerate(parts):
+        assert all(shard.shard_of(ip, 3) == index for ip in part)
+
+    wrapped = shard.ShardedPool(LocalPool(["192.0.2.1"], 30, None), 0, 2)
+    assert wrapped and wrapped.total == 2 and wrapped.cursor == 0
+
+
+def _sharded_params(tmp_path, name):
+    return SimpleNamespace(
+        seeds=["192.0.2.1"],
+        extra_seeds=None,
+        prefix=29,
+        max_per_seed=None,
+        no_display=True,
+        workers=2,
+        pps=1000.0,
+        timeout=1.0,
+        max_hops=5,
+        save_base=str(tmp_path / name),
+        duration=None,
+        max_traces=4,
+        processes=2,
+    )
+
+
+def test_scan_sharded_merges_children_into_one_graph(monkeypatch, tmp_path):
+    async def fake_run_traceroute(host, *_args, **_kwargs):
+        await asyncio.sleep(0.01)
+        return [("10.9.9.1", 1.0), (host, 5.0)]
+
+    # Children are forked, so they inherit the patched prober.
+    monkeypatch.setattr(traceroute, "run_traceroute", fake_run_traceroute)
+    params = _sharded_params(tmp_path, "sharded")
+    scan_stats = {}
+
+    asyncio.run(
+        shard.scan_sharded(
+            params,
+            scan_stats=scan_stats,
+            context=multiprocessing.get_context("fork"),
+        )
+    )
+
+    graph = load_graph(params.save_base)
+    stats = scan_stats["shards"]()
+    assert stats["processes"] == 2
+    assert stats["traces"] >= 4
+    assert graph.has_node("10.9.9.1")
+    traced = [node for node in graph.nodes if node.startswith("192.0.2.")]
+    assert len(traced) >= 4
+    assert all(graph.has_edge("10.9.9.1", node) for node in traced)
+
+
+def test_scan_sharded_queues_traces_on_the_writer(monkeypatch, tmp_path):
+    async def fake_run_traceroute(host, *_args, **_kwargs):
+        return [("10.9.9.1", 1.0), (host, 5.0)]
+
+    monkeypatch.setattr(traceroute, "run_traceroute", fake_run_traceroute)
+    params = _sharded_params(tmp_path, "written")
+    scan_stats = {}
+
+    async def runner():
+        writer = GraphWriter(nx.Graph())
+        await shard.scan_sharded(
+            params,
+            graph=writer.graph,
+            scan_stats=scan_stats,
+            context=multiprocessing.get_context("fork"),
+            writer=writer,
+        )
+        # Every queued trace was applied before the graph was saved.
+        stats = writer.stats()
+        await writer.close()
+        return stats
+
+    stats = asyncio.run(runner())
+    assert stats["queued"] == 0
+    assert stats["traces"] == scan_stats["shards"]()["traces"] >= 4
+    graph = load_graph(params.save_base)
+    assert graph.number_of_nodes() == 1 + len(
+        [node for node in graph if node.startswith("192.0.2.")]
+    )
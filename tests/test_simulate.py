@@ -0,0 +1,152 @@
+import asyncio
+from types import SimpleNamespace
+
+import networkx as nx
+import pytest
+
+from latencymesh import probe, traceroute
+from latencymesh.graph_ops import add_trace
+from latencymesh.simulate import GATEWAY, SimulatedNetwork, SimulatedProber
+
+
+class Logger:
+    def debug(self, *_a, **_k):
+        pass
+
+    def warning(self, *_a, **_k):
+        pass
+
+
+def _alive_and_dead(network):
+    hosts = [f"10.1.{i}.20" for i in range(64)]
+    alive = next(host for host in hosts if network.is_alive(host))
+    dead = next(host for host in hosts if not network.is_alive(host))
+    return alive, dead
+
+
+def test_topology_is_a_function_of_the_seed():
+    assert SimulatedNetwork(7).levels("10.1.2.3") == SimulatedNetwork(7).levels(
+        "10.1.2.3"
+    )
+    assert SimulatedNetwork(7).levels("10.1.2.3") != SimulatedNetwork(8).levels(
+        "10.1.2.3"
+    )
+
+    network = SimulatedNetwork(7, tiers=(2, 3, 2), ecmp=2)
+    alive, dead = _alive_and_dead(network)
+    levels, reachable = network.levels(alive)
+    assert reachable
+    # Gateway, 2 access, 3 core, 2 aggregation, edge router, destination.
+    assert len(levels) == 10
+    assert levels[0][0] == (GATEWAY,)
+    assert all(len(levels[ttl][0]) == 2 for ttl in range(1, 6))
+    assert levels[-2][0] == ("10.1." + alive.split(".")[2] + ".1",)
+    assert levels[-1][0] == (alive,)
+    rtts = [rtt for _, rtt in levels]
+    assert rtts == sorted(rtts)
+
+    levels, reachable = network.levels(dead)
+    assert not reachable and len(levels) == 9
+    # Hosts in the same /16 share their core routers.
+    assert network.levels(alive)[0][3] == network.levels(dead)[0][3]
+
+
+def test_prober_answers_like_traceroute():
+    network = SimulatedNetwork(3, silent=0.0, loss=0.0, jitter=0.0)
+    alive, dead = _alive_and_dead(network)
+    prober = SimulatedProber(network, time_scale=0)
+
+    async def runner():
+        reached = await prober.trace(alive, 1.0, 30, Logger())
+        window = await prober.trace(alive, 1.0, 30, Logger(), first_ttl=4)
+        streamed = [
+            ttl async for ttl, _ in prober.stream(dead, 1.0, 30, Logger(), first_ttl=2)
+        ]
+        return reached, window, streamed
+
+    reached, window, streamed = asyncio.run(runner())
+    assert reached[-1][0] == alive and reached.ttls == list(range(1, 11))
+    assert window.ttls == list(range(4, 11))
+    assert reached[-1][1] == pytest.approx(network.levels(alive)[0][-1][1], abs=1e-3)
+    # The dead destination's path goes quiet after its edge router.
+    assert streamed == list(range(2, 10))
+    assert prober.stats() == {"probes_sent": 10 + 7 + 29}
+
+
+def test_silence_and_loss_cost_a_timeout_per_batch():
+    network = SimulatedNetwork(3, silent=0.0, loss=0.0)
+    alive, dead = _alive_and_dead(network)
+    replies, duration = network.schedule(alive, 1.0, 30)
+    assert duration < 0.5 and max(replies)[1][0] == alive
+    # 30 TTLs in batches of 16: two batches, each with unanswered probes.
+    _, duration = network.schedule(dead, 1.0, 30)
+    assert duration == 2.0
+    _, duration = network.schedule(dead, 1.0, 30, window=30)
+    assert duration == 1.0
+
+    lossy = SimulatedNetwork(3, silent=0.0, loss=1.0)
+    assert lossy.schedule(alive, 0.5, 10) == ([], 0.5)
+
+
+def test_a_lost_destination_reply_is_answered_at_the_next_ttl():
+    class LosesFirstDestinationReply(SimulatedNetwork):
+        lost = False
+
+        def answer(self, siblings, rtt):
+            if alive in siblings and not self.lost:
+                self.lost = True
+                return None
+            return super().answer(siblings, rtt)
+
+    network = LosesFirstDestinationReply(3, silent=0.0, loss=0.0, jitter=0.0)
+    alive, _ = _alive_and_dead(network)
+    for window in (1, 16):
+        network.lost = False
+        replies, duration = network.schedule(alive, 1.0, 30, window=window)
+        assert [ttl for ttl, _, _ in replies] == [*range(1, 10), 11]
+        assert replies[-1][1][0] == alive
+        assert 1.0 <= duration < 2.0
+
+
+def test_ecmp_reveals_parallel_routers():
+    network = SimulatedNetwork(5, silent=0.0, loss=0.0, ecmp=3)
+    alive, _ = _alive_and_dead(network)
+    seen = {network.schedule(alive, 1.0, 30)[0][4][1][0] for _ in range(50)}
+    assert len(seen) == 3
+
+
+def test_create_prober_builds_the_simulator():
+    network = SimulatedNetwork(1)
+    prober = asyncio.run(
+        probe.create_prober("simulate", Logger(), network=network, time_scale=0.5)
+    )
+    assert isinstance(prober, SimulatedProber)
+    assert prober.network is network and prober.time_scale == 0.5
+
+
+def test_streamed_hops_follow_ttl_order():
+    hosts = [f"10.{i % 7}.{i}.20" for i in range(60)]
+    params = SimpleNamespace(timeout=1.0, max_hops=30)
+
+    async def runner():
+        traced, streamed = nx.Graph(), nx.Graph()
+        # Same seed, same hosts: both probers see the same replies.
+        plain = SimulatedProber(SimulatedNetwork(11), time_scale=0)
+        live = SimulatedProber(SimulatedNetwork(11), time_scale=0)
+
+        async def on_segment(segment):
+            add_trace(streamed, segment)
+
+        for host in hosts:
+            hops = await plain.trace(host, 1.0, 30, Logger())
+            add_trace(traced, hops)
+            trace = await traceroute._stream_host(
+                host, params, live, None, Logger(), on_segment
+            )
+            assert trace.ttls == hops.ttls
+        return traced, streamed, plain.stats(), live.stats()
+
+    traced, streamed, plain_stats, live_stats = asyncio.run(runner())
+    assert sorted(map(sorted, streamed.edges())) == sorted(map(sorted, traced.edges()))
+    # The limiter refund and probe count see the same last TTL.
+    assert plain_stats == live_stats
@@ -0,0 +1,34 @@
+from latencymesh.stopsets import StopSets
+
+
+def test_record_populates_local_and_global_sets():
+    stop_sets = StopSets(start_ttl=0)
+    assert stop_sets.start_ttl == 1
+
+    stop_sets.record("8.8.8.8", {1: "10.0.0.1", 2: "10.0.0.2", 4: "8.8.8.8"}, True)
+
+    assert stop_sets.stops_backward("10.0.0.2", 2)
+    assert not stop_sets.stops_backward("10.0.0.2", 3)
+    assert stop_sets.stops_forward("10.0.0.1", "8.8.8.200")
+    assert not stop_sets.stops_forward("10.0.0.1", "9.9.9.9")
+    assert stop_sets.remaining("10.0.0.1", "8.8.8.1") == 3
+    assert stop_sets.remaining("10.0.0.1", "9.9.9.9") == 0
+
+
+def test_unreached_traces_do_not_claim_distance():
+    stop_sets = StopSets()
+    stop_sets.record("8.8.8.8", {1: "10.0.0.1", 2: "10.0.0.2"}, False)
+    assert stop_sets.stops_forward("10.0.0.1", "8.8.8.8")
+    assert stop_sets.remaining("10.0.0.1", "8.8.8.8") == 0
+
+
+def test_account_reports_savings():
+    stop_sets = StopSets()
+    stop_sets.account(sent=4, saved=6)
+    stop_sets.account(sent=10, saved=-2)
+    assert stop_sets.stats() == {
+        "probes_sent": 14,
+        "probes_saved": 6,
+        "local_stop_set": 0,
+        "global_stop_set": 0,
+    }
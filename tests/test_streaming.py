@@ -0,0 +1,109 @@
+import asyncio
+from types import SimpleNamespace
+
+import networkx as nx
+
+from latencymesh import traceroute
+from latencymesh.probe import Prober
+
+
+class Logger:
+    def debug(self, *_a, **_k):
+        pass
+
+    def warning(self, *_a, **_k):
+        pass
+
+
+def test_worker_streams_hops_into_graph_and_queue():
+    graph = nx.Graph()
+    observed = []
+
+    async def runner():
+        queue = asyncio.Queue()
+        update_queue = asyncio.Queue(maxsize=1)
+        first_hop_seen = asyncio.Event()
+        release = asyncio.Event()
+
+        class SlowProber(Prober):
+            async def stream(self, host, timeout, max_hops, logger, first_ttl=1):
+                yield 1, ("10.0.0.1", 1.0)
+                yield 2, ("10.0.0.2", 3.0)
+                first_hop_seen.set()
+                await release.wait()
+                yield 3, (host, 7.0)
+
+        await queue.put("8.8.8.8")
+        worker = asyncio.create_task(
+            traceroute.traceroute_worker(
+                0,
+                graph,
+                queue,
+                SimpleNamespace(pps=1000, timeout=0.1, max_hops=5, stream=True),
+                set(),
+                set(),
+                asyncio.Event(),
+                {},
+                asyncio.Lock(),
+                Logger(),
+                update_queue=update_queue,
+                prober=SlowProber(),
+            )
+        )
+        await asyncio.wait_for(first_hop_seen.wait(), timeout=1.0)
+        # The trace is still running, yet its first hops are already visible.
+        observed.append(graph.has_edge("10.0.0.1", "10.0.0.2"))
+        observed.append(update_queue.qsize())
+        observed.append([queue.get_nowait(), queue.get_nowait()])
+        queue.task_done()
+        queue.task_done()
+        release.set()
+        await queue.put(None)
+        await asyncio.wait_for(worker, timeout=1.0)
+
+    asyncio.run(runner())
+    assert observed == [True, 1, ["10.0.0.1", "10.0.0.2"]]
+    assert graph.has_edge("10.0.0.2", "8.8.8.8")
+
+
+def test_stream_traceroute_kills_abandoned_process(monkeypatch):
+    lines = [b" 1 10.0.0.1 1.0 ms\n", b" 2 10.0.0.2 2.0 ms\n"]
+
+    class Stream:
+        def __aiter__(self):
+            return self
+
+        async def __anext__(self):
+            if not lines:
+                raise StopAsyncIteration
+            return lines.pop(0)
+
+    class Process:
+        def __init__(self):
+            self.stdout = Stream()
+            self.returncode = None
+            self.killed = False
+
+        def kill(self):
+            self.killed = True
+
+        async def wait(self):
+            self.returncode = -9 if self.killed else 0
+            return self.returncode
+
+    processes = []
+
+    async def fake_exec(*_args, **_kwargs):
+        processes.append(Process())
+        return processes[-1]
+
+    monkeypatch.setattr(asyncio, "create_subprocess_exec", fake_exec)
+
+    async def runner():
+        stream = traceroute.stream_traceroute("8.8.8.8", 1.0, 5, Logger())
+        first = await stream.__anext__()
+        await stream.aclose()
+        return first
+
+    assert asyncio.run(runner()) == (1, ("10.0.0.1", 1.0))
+    assert processes[0].killed
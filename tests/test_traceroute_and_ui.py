@@ -49,6 +49,46 @@ def test_run_traceroute_parses_output(monkeypatch):
         ("8.8.8.8", 34.5),
         ("2001:4860:4860::8888", 56.7),
     ]
+    assert result.ttls == [1, 4, 5]
+
+
+def test_run_traceroute_passes_first_ttl_and_squeries(monkeypatch):
+    commands = []
+
+    class EmptyProcess:
+        stdout = []
+
+        async def wait(self):
+            return 0
+
+    class EmptyStream:
+        def __aiter__(self):
+            return self
+
+        async def __anext__(self):
+            raise StopAsyncIteration
+
+    async def fake_create_subprocess_exec(*args, **_kwargs):
+        commands.append(args)
+        process = EmptyProcess()
+        process.stdout = EmptyStream()
+        return process
+
+    monkeypatch.setattr(asyncio, "create_subprocess_exec", fake_create_subprocess_exec)
+
+    class DummyLogger:
+        def debug(self, *_a, **_k):
+            pass
+
+    asyncio.run(
+        traceroute.run_traceroute(
+            "8.8.8.8", 1.0, 9, DummyLogger(), squeries=9, first_ttl=4
+        )
+    )
+    cmd = commands[0]
+    assert cmd[cmd.index("-N") + 1] == "9"
+    assert cmd[cmd.index("-f") + 1] == "4"
+    assert cmd[-1] == "8.8.8.8"
 
 
 def test_traceroute_worker_timeout_and_notify(monkeypatch):
@@ -0,0 +1,102 @@
+import asyncio
+from types import SimpleNamespace
+
+import networkx as nx
+
+from latencymesh import traceroute
+from latencymesh.graph_ops import Trace
+from latencymesh.probe import Prober
+from latencymesh.ttl_window import TTLWindows
+
+SHARED = [("192.168.1.1", 1.0), ("10.0.0.1", 5.0), ("10.0.0.2", 9.0)]
+
+
+def _trace(*tail):
+    hops = SHARED + list(tail)
+    return Trace(hops, range(1, len(hops) + 1))
+
+
+def test_window_needs_samples_before_narrowing():
+    windows = TTLWindows()
+    assert windows.window("198.51.100.7", 30) == (1, 30, None)
+
+    windows.observe("198.51.100.7", _trace(("198.51.100.7", 12.0)), 1, 30)
+    assert windows.window("198.51.100.9", 30) == (1, 30, None)
+
+    windows.observe(
+        "198.51.100.8", _trace(("10.0.9.9", 11.0), ("198.51.100.8", 12.0)), 1, 30
+    )
+    first_ttl, max_ttl, anchor = windows.window("198.51.100.9", 30)
+    assert first_ttl == len(SHARED) + 1
+    assert anchor == SHARED[-1]
+    # Distances 4 and 5 average to ~4.25; two hops of margin on top.
+    assert max_ttl == 6
+    assert windows.window("203.0.113.1", 30) == (1, 30, None)
+    assert windows.stats() == {"prefixes": 1, "learned": 1}
+
+
+def test_divergent_paths_shrink_shared_prefix():
+    windows = TTLWindows(min_samples=1)
+    windows.observe("198.51.100.7", _trace(("198.51.100.7", 12.0)), 1, 30)
+    other = Trace([("192.168.1.1", 1.0), ("10.9.9.9", 4.0), ("198.51.100.8", 8.0)])
+    windows.observe("198.51.100.8", other, 1, 30)
+    first_ttl, _, anchor = windows.window("198.51.100.9", 30)
+    assert (first_ttl, anchor) == (2, SHARED[0])
+
+
+def test_window_resets_when_path_outgrows_it():
+    windows = TTLWindows(min_samples=1, margin=1)
+    windows.observe("198.51.100.7", _trace(("198.51.100.7", 12.0)), 1, 30)
+    first_ttl, max_ttl, _ = windows.window("198.51.100.8", 30)
+    assert max_ttl == 5
+    windows.observe(
+        "198.51.100.8",
+        Trace([("10.0.5.5", 13.0)], [max_ttl]),
+        first_ttl,
+        max_ttl,
+    )
+    assert windows.window("198.51.100.8", 30) == (1, 30, None)
+
+
+def test_worker_probes_inside_learned_window():
+    calls = []
+
+    class WindowProber(Prober):
+        supports_first_ttl = True
+
+        async def trace(self, host, timeout, max_hops, logger, first_ttl=1):
+            calls.append((host, first_ttl, max_hops))
+            hops = [("192.168.1.1", 1.0), ("10.0.0.1", 5.0), (host, 9.0)]
+            return Trace(hops[first_ttl - 1 :], range(first_ttl, len(hops) + 1))
+
+    class Logger:
+        def debug(self, *_a, **_k):
+            pass
+
+    windows = TTLWindows(margin=1)
+    graph = nx.Graph()
+
+    async def runner():
+        queue = asyncio.Queue()
+        for host in ("198.51.100.1", "198.51.100.2", "198.51.100.3", None):
+            await queue.put(host)
+        await traceroute.traceroute_worker(
+            0,
+            graph,
+            queue,
+            SimpleNamespace(pps=1000, timeout=0.1, max_hops=30),
+            set(),
+            set(),
+            asyncio.Event(),
+            {},
+            asyncio.Lock(),
+            Logger(),
+            prober=WindowProber(),
+            ttl_windows=windows,
+        )
+
+    asyncio.run(runner())
+    assert calls[:2] == [("198.51.100.1", 1, 30), ("198.51.100.2", 1, 30)]
+    assert calls[2] == ("198.51.100.3", 3, 4)
+    # The anchor hop keeps the windowed trace attached to the shared path.
+    assert graph.has_edge("10.0.0.1", "198.51.100.3")
@@ -1,9 +1,12 @@
 import asyncio
+import threading
 from types import SimpleNamespace
 
+import networkx as nx
 import pytest
 
 from latencymesh import ui
+from latencymesh.writer import GraphWriter
 
 
 async def _set_event_after_yield(event: asyncio.Event):
@@ -201,3 +204,41 @@ async def test_ui_manager_event_mode_without_graph_lock(monkeypatch):
     assert len(draw_calls) == 2
     assert all(layout == "planar" for layout in draw_calls)
     assert success_counter["since_last_draw"] == 0
+
+
+@pytest.mark.asyncio
+async def test_ui_manager_draws_writer_views_in_a_thread_after_draining(monkeypatch):
+    stop_event = asyncio.Event()
+    writer = GraphWriter(nx.Graph())
+    draws = []
+
+    def fake_draw(G, save_base, ax, layout):
+        draws.append((threading.current_thread(), G.number_of_nodes()))
+
+    monkeypatch.setattr(ui, "draw_map", fake_draw)
+
+    params = SimpleNamespace(update_mode="fixed", update_interval=60)
+    task = asyncio.create_task(
+        ui.ui_manager(
+            G=writer.graph,
+            save_base="base",
+            ax="axes",
+            params=params,
+            stop_event=stop_event,
+            success_counter={},
+            counter_lock=asyncio.Lock(),
+            writer=writer,
+        )
+    )
+    stop_event.set()
+    await asyncio.sleep(0.01)
+    # Stopping alone does not draw: the writer may still hold queued traces.
+    assert draws == [] and not task.done()
+    queued = asyncio.ensure_future(writer.add([("10.0.0.1", 1.0), ("10.0.0.2", 2.0)]))
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    await queued
+    await writer.close()
+
+    assert draws == [(draws[0][0], 2)]
+    assert draws[0][0] is not threading.main_thread()
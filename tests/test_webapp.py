@@ -219,3 +219,17 @@ async def test_stream_generator_emits_heartbeat_and_shutdown(monkeypatch):
 
             shutdown = await next_nonempty()
             assert shutdown == "event: shutdown"
+
+
+@pytest.mark.asyncio
+async def test_api_stats_includes_scan_stats():
+    graph = nx.Graph()
+    lock = asyncio.Lock()
+    broadcast = GraphBroadcast()
+    scan_stats = {"probes": lambda: {"probes_sent": 7, "probes_saved": 3}}
+    app = create_app(graph, lock, broadcast, scan_stats)
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.get("/api/stats")
+    assert response.json()["scan"] == {"probes": {"probes_sent": 7, "probes_saved": 3}}
@@ -0,0 +1,144 @@
+import asyncio
+
+import networkx as nx
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from latencymesh.collector import Collector
+from latencymesh.webapp import GraphBroadcast, create_app
+from latencymesh.writer import GraphWriter
+
+
+def _trace(i):
+    return [("10.0.0.1", 1.0), (f"10.0.1.{i}", 2.0)]
+
+
+def test_queued_traces_are_applied_in_one_step():
+    graph = nx.Graph()
+
+    async def runner():
+        writer = GraphWriter(graph, max_batch=8)
+        counts = await asyncio.gather(*(writer.add(_trace(i % 3)) for i in range(6)))
+        stats = writer.stats()
+        await writer.close()
+        return counts, stats
+
+    counts, stats = asyncio.run(runner())
+    assert sorted(counts) == [0, 0, 0, 1, 1, 1]
+    assert stats == {
+        "version": 1,
+        "batches": 1,
+        "traces": 6,
+        "mean_batch": 6.0,
+        "queued": 0,
+        "views": 0,
+    }
+    assert len({stamp for _, stamp in graph.nodes(data="last_seen")}) == 1
+
+
+def test_views_are_frozen_and_shared_until_the_next_write():
+    graph = nx.Graph()
+
+    async def runner():
+        writer = GraphWriter(graph)
+        await writer.add(_trace(1))
+        first = writer.view()
+        assert writer.view() is first
+        await writer.add(_trace(2))
+        second = writer.view()
+        # A failing mutation reaches only its own caller.
+        with pytest.raises(KeyError):
+            await writer.apply(lambda g: g.nodes["missing"])
+        assert await writer.apply(lambda g: g.number_of_nodes()) == 3
+        await writer.close()
+        return first, second
+
+    first, second = asyncio.run(runner())
+    assert (first.version, second.version) == (1, 2)
+    assert first.graph.number_of_nodes() == 2 and graph.number_of_nodes() == 3
+    with pytest.raises(nx.NetworkXError):
+        first.graph.add_node("10.9.9.9")
+
+
+def test_views_and_summary_follow_the_graph_incrementally():
+    graph = nx.Graph()
+    graph.add_edge("10.0.0.9", "10.0.0.1", weight=3.0)
+
+    def summary(g):
+        rtts = [rtt for _, rtt in g.nodes(data="rtt") if rtt is not None]
+        return {
+            "nodes": g.number_of_nodes(),
+            "edges": g.number_of_edges(),
+            "avg_degree": 2 * g.number_of_edges() / g.number_of_nodes(),
+            "avg_latency": sum(rtts) / len(rtts),
+        }
+
+    def drop(g):
+        g.remove_node("10.0.0.9")
+
+    async def runner():
+        writer = GraphWriter(graph)
+        await writer.add(_trace(1))
+        first = writer.view()
+        await writer.add([("10.0.0.1", 0.5), ("10.0.1.1", 1.5), ("10.0.1.7", 4.0)])
+        await writer.apply(lambda g: None, touches=[[("10.0.1.7", 0.0)]])
+        assert writer.summary() == summary(graph)
+        second = writer.view()
+        await writer.apply(drop)
+        assert writer.summary() == summary(graph)
+        third = writer.view()
+        version = writer.version
+        await writer.close()
+        return first, second, third, version, writer.version
+
+    first, second, third, version, closed = asyncio.run(runner())
+    assert closed == version
+    assert first.graph.nodes["10.0.0.1"]["rtt"] == 1.0
+    assert second.graph.nodes["10.0.0.1"]["rtt"] == 0.5
+    assert first.graph.number_of_edges() == 2
+    assert second.summary["edges"] == 3
+    assert "10.0.0.9" in second.graph and "10.0.0.9" not in third.graph
+    assert sorted(map(sorted, third.graph.edges())) == sorted(
+        map(sorted, graph.edges())
+    )
+    assert dict(third.graph.nodes(data=True)) == dict(graph.nodes(data=True))
+
+
+def test_cancelled_submitters_are_applied_on_close():
+    graph = nx.Graph()
+
+    async def runner():
+        writer = GraphWriter(graph, max_batch=100, max_delay=60)
+        waiter = asyncio.ensure_future(writer.add(_trace(1)))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await writer.close()
+        with pytest.raises(RuntimeError):
+            await writer.add(_trace(2))
+
+    asyncio.run(runner())
+    assert graph.has_edge("10.0.0.1", "10.0.1.1")
+
+
+@pytest.mark.asyncio
+async def test_readers_use_views_while_the_writer_owns_the_graph():
+    graph = nx.Graph()
+    lock = asyncio.Lock()
+    broadcast = GraphBroadcast()
+    writer = GraphWriter(graph)
+    collector = Collector(graph, lock, broadcast.notify, writer=writer)
+    app = create_app(graph, lock, broadcast, {}, collector, writer=writer)
+
+    batch = {"vantage": "east", "traces": [["10.0.0.3", [["10.0.0.1", 1.0]]]]}
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        # Readers never wait for the lock once a writer owns the graph.
+        async with lock:
+            await client.post("/api/collect", json=batch)
+            snapshot = (await client.get("/api/graph")).json()
+            stats = (await client.get("/api/stats")).json()
+    await writer.close()
+
+    assert [node["id"] for node in snapshot["nodes"]] == ["10.0.0.1"]
+    assert snapshot["nodes"][0]["vantages"] == "east"
+    assert stats["nodes"] == 1